@@ -1,21 +1,38 @@
+import math
+import os
 from typing import Optional
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Header, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from app.services import llm_guard, metrics, profiler
 from app.services.chatbot import chatbot_step
+from app.services.compact import compact_turn, dumps as compact_dumps, etag
+from app.services.llm import get_rag
 from app.services.session import load_session
 
 router = APIRouter()
 
+# Time budget of one /chat request for all LLM calls it makes; a client (or proxy) with a
+# shorter timeout sends X-Request-Deadline-Ms so the server stops waiting when it does
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "90"))
+# Chunks only change when the RAG index is rebuilt; the ETag catches that on revalidation
+SOURCE_MAX_AGE_S = 3600
+
 class ChatBody(BaseModel):
     session_id: str
     message: str
+    compact: bool = False
 
 @router.post("/chat")
 def chat(
+    response: Response,
     session_id: Optional[str] = None,
     message: Optional[str] = None,
     body: Optional[ChatBody] = Body(default=None),
+    x_request_deadline_ms: Optional[float] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+    compact: bool = False,
 ):
     # Accept either:
     # 1) /chat?session_id=...&message=...   (your current frontend)
@@ -23,12 +40,64 @@ def chat(
     if body is not None:
         session_id = body.session_id
         message = body.message
+        compact = compact or body.compact
 
     if not session_id or not message:
         return {"error": "Missing session_id or message"}
 
-    return chatbot_step(session_id, message)
+    budget = CHAT_DEADLINE_S
+    if x_request_deadline_ms is not None:
+        budget = min(budget, x_request_deadline_ms / 1000.0)
+
+    # X-Profile: <PROFILE_TOKEN> (or PROFILE_SAMPLE_RATE) captures a stack profile; see /admin/profiles
+    with profiler.profile("chat", requested=x_profile) as prof:
+        if prof is not None:
+            response.headers["X-Profile-Id"] = prof.id
+        try:
+            with llm_guard.deadline(budget), metrics.stage("chat"):
+                if not compact:
+                    return chatbot_step(session_id, message)
+                # Only the changes of this turn, ids for schemes and sources (see compact.py)
+                before = load_session(session_id) or {}
+                result = compact_turn(before, chatbot_step(session_id, message))
+                return Response(compact_dumps(result), media_type="application/json", headers=dict(response.headers))
+        except llm_guard.ProviderUnavailable as e:
+            # Nothing to degrade to (e.g. a follow-up question): fail fast, the client retries
+            headers = {"Retry-After": str(math.ceil(e.retry_after))}
+            if prof is not None:
+                prof.status = 503
+                headers["X-Profile-Id"] = prof.id
+            return JSONResponse(
+                status_code=503,
+                content={"error": "The assistant is busy, please try again shortly.", "detail": str(e)},
+                headers=headers,
+            )
 
 @router.get("/session/{session_id}")
 def get_session(session_id: str):
     return load_session(session_id)
+
+
+def _cached_json(obj, if_none_match: Optional[str], cache_control: str) -> Response:
+    body = compact_dumps(obj)
+    tag = etag(body)
+    headers = {"ETag": tag, "Cache-Control": cache_control}
+    if if_none_match and tag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/session/{session_id}/schemes")
+def get_session_schemes(session_id: str, if_none_match: Optional[str] = Header(default=None)):
+    # The ranked programs behind a compact turn's scheme_ids; they change once per session
+    schemes = (load_session(session_id) or {}).get("_ranked_subsidies", [])
+    return _cached_json({"schemes": schemes}, if_none_match, "private, no-cache")
+
+
+@router.get("/sources/{chunk_id:path}")
+def get_source(chunk_id: str, if_none_match: Optional[str] = Header(default=None)):
+    # One RAG chunk behind a compact turn's source_ids; stable until the index is rebuilt
+    chunk = get_rag().chunk(chunk_id)
+    if chunk is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown source"})
+    return _cached_json(chunk, if_none_match, f"public, max-age={SOURCE_MAX_AGE_S}")
@@ -1,32 +1,82 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 from pathlib import Path
 
-DATA_DIR = Path("pages")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+from app.services.crawler import CrawlConfig, crawl
+from app.services.html_text import extract_text
+from app.services.page_cache import PageCache, write_change_manifest, MANIFEST_NAME
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR / "pages"
+SOURCES_PATH = BASE_DIR / "sources.txt"
+STATE_PATH = BASE_DIR / "fetch_state.json"
+CACHE_DIR = BASE_DIR / "page_cache"
+MANIFEST_PATH = DATA_DIR / MANIFEST_NAME
 
 def clean_html(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
+    return extract_text(html)
 
-    for tag in soup(["script", "style", "nav", "footer", "header"]):
-        tag.decompose()
+def page_path(url: str) -> Path:
+    fname = url.replace("https://", "").replace("/", "_")
+    return DATA_DIR / f"{fname}.txt"
 
-    text = soup.get_text(separator=" ")
-    return " ".join(text.split())
+def parse_and_store(url: str, html: str) -> str:
+    # Runs in the crawler's process pool
+    path = page_path(url)
+    path.write_text(clean_html(html), encoding="utf-8")
+    return path.name
 
-def fetch_all():
-    with open("sources.txt") as f:
+def fetch_all(
+    config: CrawlConfig = None,
+    sources_path: Path = SOURCES_PATH,
+    state_path: Path = STATE_PATH,
+    use_cache: bool = True,
+):
+    """
+    Fetches all sources, re-parsing only pages whose content changed, and writes
+    pages/changes.json listing changed / unchanged / failed URLs for the index builders.
+    """
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(sources_path) as f:
         urls = [u.strip() for u in f if u.strip()]
 
-    for url in urls:
-        print(f"Fetching {url}")
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
+    cache = PageCache(CACHE_DIR) if use_cache else None
+    if cache is not None:
+        # A cached page whose text file is gone must be parsed again
+        for url in [u for u in cache.entries if not page_path(u).exists()]:
+            del cache.entries[url]
 
-        text = clean_html(r.text)
+    stats = crawl(urls, parse_and_store, state_path=state_path, config=config, cache=cache)
+    print(
+        f"Fetched {stats.done} changed pages, {stats.unchanged} unchanged ({stats.skipped} resumed, "
+        f"{stats.failed} failed, {stats.retries} retries) in {stats.elapsed_s:.1f}s"
+    )
 
-        fname = url.replace("https://", "").replace("/", "_")
-        Path(DATA_DIR / f"{fname}.txt").write_text(text, encoding="utf-8")
+    changed, unchanged, failed, files = [], [], [], {}
+    for url, job in stats.jobs.items():
+        if job["status"] != "done":
+            failed.append(url)
+        elif job["result"]["changed"]:
+            changed.append(url)
+            files[url] = job["result"]["output"]
+        else:
+            unchanged.append(url)
+    write_change_manifest(MANIFEST_PATH, changed, unchanged, failed, files)
+    print(f"Change manifest: {len(changed)} changed, {len(unchanged)} unchanged -> {MANIFEST_PATH}")
+    # The job state marks this run complete (failed URLs included): the next refresh
+    # fetches every URL again, only an interrupted run is resumed
+    return stats
 
 if __name__ == "__main__":
-    fetch_all()
+    parser = argparse.ArgumentParser(description="Fetch all regulation pages in sources.txt into pages/")
+    parser.add_argument("--base-url", help="replay against a local stand-in server, e.g. http://127.0.0.1:8765")
+    parser.add_argument("--per-host", type=int, default=CrawlConfig.per_host_concurrency)
+    parser.add_argument("--interval", type=float, default=CrawlConfig.per_host_interval_s)
+    parser.add_argument("--record", type=Path, help="also store raw HTML here")
+    parser.add_argument("--no-cache", action="store_true", help="re-download and re-parse everything")
+    args = parser.parse_args()
+    fetch_all(CrawlConfig(
+        base_url=args.base_url,
+        per_host_concurrency=args.per_host,
+        per_host_interval_s=args.interval,
+        record_dir=args.record,
+    ), use_cache=not args.no_cache)
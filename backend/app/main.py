@@ -1,6 +1,11 @@
-from fastapi import FastAPI
+import os
+from typing import Optional
+
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.chat import router
+from app.services import metrics, profiler, resources
 
 app = FastAPI(title="Hulpwijzer API")
 
@@ -19,3 +24,58 @@ app.add_middleware(
 )
 
 app.include_router(router)
+
+
+@app.on_event("startup")
+def warm_resources():
+    # Load the LLM client, RAG index/model and catalog in the background so workers
+    # accept connections immediately; WARMUP=0 leaves everything to first use
+    if os.getenv("WARMUP", "1") != "0":
+        resources.warm(background=True)
+
+
+@app.get("/ready")
+def ready():
+    ok = resources.is_ready()
+    return JSONResponse(
+        status_code=200 if ok else 503,
+        content={"ready": ok, "resources": resources.status()},
+    )
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Stage latency histograms, token counts and cache/coalescing counters of this worker
+    if not metrics.METRICS:
+        return PlainTextResponse("metrics disabled (METRICS=0)\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _profile_admin_denied(token: Optional[str]) -> Optional[JSONResponse]:
+    if profiler.PROFILE_TOKEN is None:
+        return JSONResponse(status_code=404, content={"error": "Profiling admin disabled (PROFILE_TOKEN not set)"})
+    if not profiler.authorized(token):
+        return JSONResponse(status_code=403, content={"error": "Invalid profile token"})
+    return None
+
+
+@app.get("/admin/profiles")
+def list_profiles(limit: int = 50, x_profile_token: Optional[str] = Header(default=None)):
+    # Request profiles captured on this worker (X-Profile header or PROFILE_SAMPLE_RATE);
+    # needs X-Profile-Token: <PROFILE_TOKEN>
+    denied = _profile_admin_denied(x_profile_token)
+    if denied is not None:
+        return denied
+    return {"profiles": profiler.list_profiles(limit)}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(default=None)):
+    # Collapsed stacks: pipe into flamegraph.pl or open in speedscope
+    denied = _profile_admin_denied(x_profile_token)
+    if denied is not None:
+        return denied
+    folded = profiler.read_folded(profile_id)
+    if folded is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown profile"})
+    return PlainTextResponse(folded)
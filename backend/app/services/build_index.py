@@ -1,22 +1,196 @@
+"""
+build_index.py
+
+Builds the knowledge index over the scraped pages in app/data/pages: an inverted BM25 term
+index (same memory-mappable posting-list format as the RAG chunk index, see rag_lexical.py)
+plus per-document statistics.
+
+  knowledge_index/
+    bm25/          terms.json, offsets.npy, postings_*.npy, doc_len.npy, stats.json
+    docs.json      {build_id, docs: [{source, cvdr_id, length, tokens, size, mtime}]} (doc id =
+                   position); written last, build_id matches bm25/stats.json
+    terms.jsonl    cached {term: tf} per page, so unchanged pages are not re-tokenised
+
+Incremental: a page whose size and mtime match the previous build reuses its cached term
+counts; only new or changed pages are read. The posting lists themselves are rewritten
+from the counts, which is cheap compared to reading and tokenising the pages.
+
+Rebuilding while the app runs is safe: workers have the files memory-mapped, so every file
+is replaced (os.replace), never overwritten, and get_knowledge_index reloads once docs.json
+changes.
+
+Read at runtime through KnowledgeIndex: prefilter_candidates uses it for keyword lookups
+over full page text, and RAGRetriever as page-level lexical fallback.
+"""
+
 import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services import resources
+from app.services.rag_lexical import BM25Index, build_bm25_from_counts, tokenize
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+PAGES_DIR = DATA_DIR / "pages"
+OUT_DIR = DATA_DIR / "knowledge_index"
+
+_CVDR_RE = re.compile(r"CVDR(\d+)", re.IGNORECASE)
+
+
+def _load_cached_counts(out_dir: Path) -> Dict[str, Tuple[Dict[str, Any], Dict[str, int]]]:
+    """
+    source -> (doc stats, term counts) from the previous build.
+    """
+    docs_path, terms_path = out_dir / "docs.json", out_dir / "terms.jsonl"
+    if not docs_path.exists() or not terms_path.exists():
+        return {}
+    docs = _read_docs(docs_path)[1]
+    out = {}
+    with terms_path.open(encoding="utf-8") as f:
+        for doc, line in zip(docs, f):
+            out[doc["source"]] = (doc, json.loads(line))
+    return out
+
+
+def build_index(pages_dir: Path = PAGES_DIR, out_dir: Path = OUT_DIR, full: bool = False) -> Dict[str, Any]:
+    cached = {} if full else _load_cached_counts(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    docs: List[Dict[str, Any]] = []
+    n_read = 0
+    terms_tmp = out_dir / "terms.jsonl.tmp"
+    with terms_tmp.open("w", encoding="utf-8") as terms_f:
+        for f in sorted(pages_dir.glob("*.txt")):
+            st = f.stat()
+            prev = cached.get(f.name)
+            if prev is not None and prev[0]["size"] == st.st_size and prev[0]["mtime"] == st.st_mtime:
+                doc, counts = prev
+            else:
+                text = f.read_text(encoding="utf-8")
+                counts = dict(Counter(tokenize(text)))
+                m = _CVDR_RE.search(f.name)
+                doc = {
+                    "source": f.name,
+                    "cvdr_id": m.group(1) if m else None,
+                    "length": len(text),
+                    "tokens": sum(counts.values()),
+                    "size": st.st_size,
+                    "mtime": st.st_mtime,
+                }
+                n_read += 1
+            docs.append(doc)
+            terms_f.write(json.dumps(counts, ensure_ascii=False) + "\n")
+
+    def iter_counts() -> Iterable[Dict[str, int]]:
+        with terms_tmp.open(encoding="utf-8") as fh:
+            for line in fh:
+                yield json.loads(line)
 
-PAGES_DIR = Path("app/data/pages")
-OUT = Path("app/data/knowledge_index.json")
+    build_id = uuid.uuid4().hex
+    stats = build_bm25_from_counts(iter_counts(), out_dir / "bm25", build_id=build_id)
+    os.replace(terms_tmp, out_dir / "terms.jsonl")
+    docs_tmp = out_dir / "docs.json.tmp"
+    docs_tmp.write_text(json.dumps({"build_id": build_id, "docs": docs}, ensure_ascii=False), encoding="utf-8")
+    os.replace(docs_tmp, out_dir / "docs.json")
 
-def build_index():
-    index = []
+    print(f"Knowledge index: {len(docs)} pages ({n_read} read, {len(docs) - n_read} cached) -> {out_dir}")
+    return stats
 
-    for f in PAGES_DIR.glob("*.txt"):
-        text = f.read_text(encoding="utf-8").lower()
-        index.append({
-            "source": f.name,
-            "path": str(f),
-            "length": len(text),
-            "preview": text[:500]  # for debugging
-        })
 
-    OUT.write_text(json.dumps(index, indent=2), encoding="utf-8")
+# ----------------------------
+# Runtime access
+# ----------------------------
+def _read_docs(path: Path) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    # Indexes built before the build id was added hold the bare list
+    if isinstance(data, list):
+        return None, data
+    return data.get("build_id"), data["docs"]
+
+
+def index_stamp(out_dir: Path = OUT_DIR) -> Optional[int]:
+    """
+    Changes with every build (docs.json is replaced last); None when not built.
+    """
+    try:
+        return (out_dir / "docs.json").stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class KnowledgeIndex:
+    def __init__(self, out_dir: Path = OUT_DIR):
+        # The BM25 files and docs.json of one build carry the same build_id; a rebuild
+        # running right now can leave them apart for a moment
+        for _ in range(5):
+            self.stamp = index_stamp(out_dir)
+            self.bm25 = BM25Index(out_dir / "bm25")
+            build_id, self.docs = _read_docs(out_dir / "docs.json")
+            if build_id is None or build_id == self.bm25.build_id:
+                break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError(f"Knowledge index in {out_dir} kept changing while loading")
+        self.cvdr_ids = np.array([d.get("cvdr_id") or "" for d in self.docs], dtype=object)
+
+    @classmethod
+    def exists(cls, out_dir: Path = OUT_DIR) -> bool:
+        return (out_dir / "docs.json").exists() and BM25Index.exists(out_dir / "bm25")
+
+    def search(self, query: str, top_k: int = 10, cvdr_ids: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 over whole pages, optionally restricted to the given CVDR ids.
+        """
+        allowed = None
+        if cvdr_ids is not None:
+            allowed = np.flatnonzero(np.isin(self.cvdr_ids, list(cvdr_ids)))
+        return [
+            {**self.docs[i], "score": score}
+            for i, score in self.bm25.search(query, top_k, allowed=allowed)
+        ]
+
+    def cvdr_ids_with_prefixes(self, prefixes: Iterable[str], min_tf: int = 1, min_share: float = 0.0) -> Set[str]:
+        """
+        CVDR ids of pages containing words starting with one of the prefixes; min_tf and
+        min_share (of the page's tokens) leave out pages that only mention them in passing.
+        """
+        ids = self.bm25.docs_matching_prefixes(prefixes, min_tf=min_tf, min_share=min_share)
+        return {c for c in self.cvdr_ids[ids].tolist() if c}
+
+
+_knowledge: Dict[str, Optional[KnowledgeIndex]] = {}
+
+
+def get_knowledge_index() -> Optional[KnowledgeIndex]:
+    """
+    Process-wide KnowledgeIndex, or None when build_index has not been run. Reloaded when
+    a rebuild replaced the files.
+    """
+    stamp = index_stamp()
+    current = _knowledge.get("index")
+    if "index" in _knowledge and (current.stamp if current is not None else None) == stamp:
+        return current
+    try:
+        _knowledge["index"] = KnowledgeIndex() if KnowledgeIndex.exists() else None
+    except Exception as e:  # half-swapped files: keep serving the loaded index
+        print(f"Knowledge index reload failed: {e}")
+        _knowledge.setdefault("index", None)
+    return _knowledge["index"]
+
+
+resources.register("knowledge_index", get_knowledge_index, required=False)
+
 
 if __name__ == "__main__":
-    build_index()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the knowledge index over app/data/pages")
+    parser.add_argument("--full", action="store_true", help="re-read every page")
+    build_index(full=parser.parse_args().full)
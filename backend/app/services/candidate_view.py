@@ -0,0 +1,133 @@
+"""
+candidate_view.py
+
+Materialised prefilter results per municipality.
+
+prefilter_candidates used to redo the municipality match, single-parent mask, children regex
+and the per-row quick_relevance_score over the whole catalog for every user. For a single
+parent all of that depends only on (municipality, children > 0), and there are a few hundred
+municipalities, so it is computed once per catalog load:
+
+    view[municipality][has_children] -> catalog positions, sorted by prefilter score
+
+A request then costs a dict lookup, the income filter (the only profile-dependent step) on
+that short list, and the top-N cut.
+
+Rebuilt when get_subsidy_df reloads the catalog; municipalities whose rows did not change
+(same rows in the same order) keep their previous entry, so only changed rows are re-scored.
+child_mask also reads the knowledge index (build_index.py), so its stamp is part of every
+fingerprint: after a rebuild of that index all entries are scored again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.subsidy_ranker import (
+    UserProfile,
+    _norm,
+    _safe_col,
+    child_mask,
+    filter_by_income,
+    quick_relevance_score,
+    single_parent_mask,
+)
+
+
+@dataclass
+class _Entry:
+    # Hash of the municipality's row hashes in catalog order (`order` holds positions
+    # relative to those rows, so a reordered catalog must not match) and the knowledge index stamp
+    fingerprint: bytes
+    # has_children -> (positions within the municipality's rows, scores), best first
+    order: Dict[bool, Tuple[np.ndarray, np.ndarray]]
+
+
+def _municipality_keys(df: pd.DataFrame) -> pd.Series:
+    # Same normalisation as filter_by_municipality's exact match
+    return _safe_col(df, "municipality", "").fillna("").map(lambda x: _norm(str(x)).replace("gemeente ", ""))
+
+
+def _score_rows(rows: pd.DataFrame) -> Dict[bool, Tuple[np.ndarray, np.ndarray]]:
+    """
+    has_children -> (eligible mask, prefilter scores) for rows of any municipalities.
+    """
+    sp = single_parent_mask(rows).to_numpy()
+    kids = child_mask(rows).to_numpy()
+    out = {}
+    for has_children in (False, True):
+        profile = UserProfile(is_single_parent=True, children_u18=int(has_children))
+        # Scored as a user of the row's own municipality, as prefilter_candidates would
+        scores = rows.apply(
+            lambda r: quick_relevance_score(r, replace(profile, municipality=str(r.get("municipality") or ""))), axis=1
+        ).to_numpy(dtype=float)
+        out[has_children] = (sp & kids if has_children else sp, scores)
+    return out
+
+
+class CandidateView:
+    def __init__(self, df: pd.DataFrame, previous: Optional["CandidateView"] = None):
+        self.df = df
+        keys = _municipality_keys(df)
+        self.positions: Dict[str, np.ndarray] = {
+            k: np.asarray(v, dtype=np.int64) for k, v in keys.groupby(keys, sort=False).indices.items() if k
+        }
+        row_hash = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+        from app.services.build_index import index_stamp
+
+        knowledge = str(index_stamp()).encode("ascii")
+
+        self.entries: Dict[str, _Entry] = {}
+        todo: Dict[str, bytes] = {}
+        for muni, pos in self.positions.items():
+            h = hashlib.blake2b(row_hash[pos].tobytes(), digest_size=16)
+            h.update(knowledge)
+            fp = h.digest()
+            prev = previous.entries.get(muni) if previous is not None else None
+            if prev is not None and prev.fingerprint == fp:
+                self.entries[muni] = prev
+            else:
+                todo[muni] = fp
+        self.rebuilt = len(todo)
+        if not todo:
+            return
+
+        # Score all changed rows in one pass, then split per municipality
+        changed = np.concatenate([self.positions[m] for m in todo])
+        scored = _score_rows(df.iloc[changed])
+        start = 0
+        for muni, fp in todo.items():
+            n = len(self.positions[muni])
+            order = {}
+            for has_children, (mask, scores) in scored.items():
+                keep = np.flatnonzero(mask[start:start + n])
+                s = scores[start:start + n][keep]
+                # Stable, like prefilter_candidates, so ties keep catalog order
+                idx = np.argsort(-s, kind="stable")
+                order[has_children] = (keep[idx], s[idx])
+            self.entries[muni] = _Entry(fp, order)
+            start += n
+
+    def lookup(self, profile: UserProfile, max_candidates: int) -> Optional[pd.DataFrame]:
+        """
+        prefilter_candidates' result for an exact municipality match, or None when the
+        view cannot answer (no exact match, not a single parent).
+        """
+        if not profile.is_single_parent:
+            return None
+        muni = _norm(profile.municipality).replace("gemeente ", "")
+        entry = self.entries.get(muni)
+        if entry is None:
+            return None
+        rel, scores = entry.order[bool(profile.children_u18 and profile.children_u18 > 0)]
+        base = self.df.iloc[self.positions[muni][rel]].copy()
+        base["_prefilter_score"] = scores
+        for col in ("single_parent_relevant", "mentions_single_parent_explicitly"):
+            if col not in base.columns:
+                base[col] = False
+        return filter_by_income(base, profile.net_income_monthly_eur).head(max_candidates).copy()
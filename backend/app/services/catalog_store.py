@@ -0,0 +1,146 @@
+"""
+catalog_store.py
+
+Build-time conversion of the subsidy catalog CSV into a columnar layout:
+
+  catalog/filters.parquet      every short column (+ structured eligibility fields, + _row_id)
+  catalog/snippets.bin         eligibility/application snippets, UTF-8, back to back
+  catalog/snippet_offsets.npy  int64[n_rows * 2 + 1]; snippet (row, col) is bytes
+                               [offsets[row * 2 + col], offsets[row * 2 + col + 1])
+  catalog/meta.json            source CSV size/mtime and structured Parquet mtime, to
+                               detect a stale build
+
+The snippets are most of the catalog's bytes but are only needed for the final <=60 LLM
+candidates, so at runtime only filters.parquet is loaded; snippets are read on demand by
+row id from the memory-mapped blob (shared page cache across workers).
+
+Run from backend/:
+    python -m app.services.catalog_store
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.structured_eligibility import OUT_PATH as STRUCTURED_PATH, load_structured
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+CSV_PATH = DATA_DIR / "single_parent_support_subsidies.csv"
+CATALOG_DIR = DATA_DIR / "catalog"
+SNIPPET_COLUMNS = ("eligibility_snippet", "application_snippet")
+ROW_ID = "_row_id"
+
+
+def join_structured(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the structured eligibility columns (structured_eligibility.py) when that build step has run.
+    """
+    structured = load_structured()
+    if structured is None:
+        return df
+    key = df["cvdr_id"].map(lambda x: str(int(x)) if pd.notna(x) else None).astype("string")
+    structured = structured.drop(columns=["source"]).drop_duplicates("cvdr_id").set_index("cvdr_id")
+    return df.join(structured, on=key)
+
+
+def _source_stamp(csv_path: Path) -> Dict[str, Optional[float]]:
+    st = csv_path.stat()
+    # The structured fields are joined in at build time, so a rebuilt Parquet makes the catalog stale
+    structured = STRUCTURED_PATH.stat().st_mtime if STRUCTURED_PATH.exists() else None
+    return {"size": st.st_size, "mtime": st.st_mtime, "structured_mtime": structured}
+
+
+def _replace_with(path: Path, write) -> None:
+    # Readers (another worker reloading) must never see a half-written file
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def build_catalog(csv_path: Path = CSV_PATH, out_dir: Path = CATALOG_DIR) -> Path:
+    df = join_structured(pd.read_csv(csv_path))
+    df[ROW_ID] = np.arange(len(df), dtype=np.int64)
+
+    offsets = np.zeros(len(df) * len(SNIPPET_COLUMNS) + 1, dtype=np.int64)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    blob_tmp = out_dir / "snippets.bin.tmp"
+    pos = 0
+    with blob_tmp.open("wb") as f:
+        cols = [df[c] if c in df.columns else pd.Series([None] * len(df)) for c in SNIPPET_COLUMNS]
+        for i, values in enumerate(zip(*cols)):
+            for j, v in enumerate(values):
+                b = v.encode("utf-8") if isinstance(v, str) else b""
+                f.write(b)
+                pos += len(b)
+                offsets[i * len(SNIPPET_COLUMNS) + j + 1] = pos
+
+    filters = df.drop(columns=[c for c in SNIPPET_COLUMNS if c in df.columns])
+    _replace_with(out_dir / "filters.parquet", lambda f: filters.to_parquet(f, index=False))
+    _replace_with(out_dir / "snippet_offsets.npy", lambda f: np.save(f, offsets))
+    os.replace(blob_tmp, out_dir / "snippets.bin")
+    # Written last: its mtime is what get_subsidy_df watches for a reload
+    meta = {"source": _source_stamp(csv_path), "rows": len(df), "snippet_columns": list(SNIPPET_COLUMNS)}
+    _replace_with(out_dir / "meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+    print(f"Catalog: {len(df)} rows, {pos / 1e6:.1f} MB snippets -> {out_dir}")
+    return out_dir
+
+
+def catalog_is_fresh(csv_path: Path = CSV_PATH, out_dir: Path = CATALOG_DIR) -> bool:
+    meta_path = out_dir / "meta.json"
+    if not meta_path.exists() or not (out_dir / "filters.parquet").exists():
+        return False
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return not csv_path.exists() or meta.get("source") == _source_stamp(csv_path)
+
+
+def load_filter_columns(out_dir: Path = CATALOG_DIR) -> pd.DataFrame:
+    return pd.read_parquet(out_dir / "filters.parquet")
+
+
+class SnippetStore:
+    def __init__(self, out_dir: Path = CATALOG_DIR):
+        self.offsets = np.load(out_dir / "snippet_offsets.npy", mmap_mode="r")
+        blob = out_dir / "snippets.bin"
+        # np.memmap refuses empty files
+        self.blob = np.memmap(blob, dtype=np.uint8, mode="r") if blob.stat().st_size else np.empty(0, dtype=np.uint8)
+        self.n_cols = len(SNIPPET_COLUMNS)
+
+    def get(self, row_id: int, column: str) -> Optional[str]:
+        i = int(row_id) * self.n_cols + SNIPPET_COLUMNS.index(column)
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        if lo == hi:
+            return None
+        return self.blob[lo:hi].tobytes().decode("utf-8")
+
+    def get_rows(self, row_ids: Iterable[int]) -> List[Dict[str, Optional[str]]]:
+        return [{c: self.get(r, c) for c in SNIPPET_COLUMNS} for r in row_ids]
+
+
+_store: Optional[SnippetStore] = None
+
+
+def get_snippet_store() -> SnippetStore:
+    global _store
+    if _store is None:
+        _store = SnippetStore()
+    return _store
+
+
+def reset_snippet_store() -> None:
+    """
+    Drops the open blob/offsets; called when the catalog is reloaded, since row ids of the
+    new filters.parquet index into the new files.
+    """
+    global _store
+    _store = None
+
+
+if __name__ == "__main__":
+    build_catalog()
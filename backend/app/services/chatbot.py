@@ -5,10 +5,12 @@ from typing import Dict, Any
 from app.services.extractor import extract_user_info
 from app.services.session import load_session, save_session
 from app.services.fields import FIELDS
-from app.services.llm import answer_with_rag
+from app.services.llm import DEFAULT_MODEL, GREENPT_BASE_URL, answer_with_rag
+from app.services.llm_guard import ProviderUnavailable
 
 # Subsidy ranking
-from app.services.subsidy_ranker import UserProfile, filter_then_rank
+from app.services import speculative
+from app.services.subsidy_ranker import UserProfile, filter_then_rank, rank_candidates
 from app.services.subsidy_loader import get_subsidy_df
 
 
@@ -54,6 +56,43 @@ INTAKE_ORDER = [
 ]
 
 
+# Fields that decide the prefilter; once known, ranking starts in the background
+SPECULATIVE_FIELDS = ("municipality", "children")
+MAX_CANDIDATES = 60
+
+
+def _ranker_profile(profile: Dict[str, Any]) -> UserProfile:
+    return UserProfile(
+        is_single_parent=True,
+        children_u18=profile.get("children"),
+        net_income_monthly_eur=profile.get("monthly_income"),
+        municipality=profile.get("municipality", ""),
+    )
+
+
+def _rank(ranker_profile: UserProfile) -> Dict[str, Any]:
+    return filter_then_rank(
+        get_subsidy_df(),
+        ranker_profile,
+        model=DEFAULT_MODEL,
+        api_key=os.getenv("GREENPT_API_KEY"),
+        base_url=GREENPT_BASE_URL,
+        max_candidates=MAX_CANDIDATES,
+        top_k=10,
+    )
+
+
+def _rerank(candidates_df, ranker_profile: UserProfile) -> Dict[str, Any]:
+    return rank_candidates(
+        candidates_df,
+        ranker_profile,
+        model=DEFAULT_MODEL,
+        api_key=os.getenv("GREENPT_API_KEY"),
+        base_url=GREENPT_BASE_URL,
+        top_k=10,
+    )
+
+
 # -------------------------
 # Main entry point
 # -------------------------
@@ -75,16 +114,19 @@ def chatbot_step(session_id: str, user_message: str) -> Dict[str, Any]:
     # -------------------------
     # INTAKE MODE
     # -------------------------
-    extracted = extract_user_info(user_message)
+    extracted = extract_user_info(user_message, asked=profile.get("_asked"))
     for k, v in extracted.items():
         if v is not None:
             profile[k] = v
 
+    # Ask next missing field; remembered so a bare answer ("1800", "2") is read as that field
+    profile["_asked"] = next((f for f in INTAKE_ORDER if profile.get(f) is None), None)
     save_session(session_id, profile)
 
-    # Ask next missing field
     for field in INTAKE_ORDER:
         if profile.get(field) is None:
+            if all(profile.get(f) is not None for f in SPECULATIVE_FIELDS):
+                speculative.start(session_id, _ranker_profile(profile), _rank)
             return {
                 "reply": FIELDS[field]["question"],
                 "profile": profile,
@@ -98,22 +140,10 @@ def chatbot_step(session_id: str, user_message: str) -> Dict[str, Any]:
     # INTAKE COMPLETE → RANK
     # -------------------------
 
-    ranker_profile = UserProfile(
-        is_single_parent=True,
-        children_u18=profile.get("children"),
-        net_income_monthly_eur=profile.get("monthly_income"),
-        municipality=profile.get("municipality", ""),
-    )
-
-    df = get_subsidy_df()
-
-    rank_result = filter_then_rank(
-        df,
-        ranker_profile,
-        model="green-l",
-        api_key=os.getenv("GREENPT_API_KEY"),
-        base_url="https://api.greenpt.ai/v1/",
-        top_k=10,
+    # Usually already ranked in the background while the user answered the last questions;
+    # then only its top entries are re-ranked with the income
+    rank_result = speculative.finish(
+        session_id, _ranker_profile(profile), _rank, max_candidates=MAX_CANDIDATES, rerank=_rerank
     )
 
     ranked = rank_result.get("ranked", [])
@@ -150,11 +180,16 @@ Explain:
 - what the user should do next
 """.strip()
 
-    explanation, hits = answer_with_rag(
-        user_question=explanation_prompt,
-        system_prompt=system_prompt,
-        top_k=5,
-    )
+    try:
+        explanation, hits = answer_with_rag(
+            user_question=explanation_prompt,
+            system_prompt=system_prompt,
+            top_k=5,
+            filters={"municipality": profile.get("municipality")},
+        )
+    except ProviderUnavailable as e:
+        print(f"Explanation unavailable ({e}); answering with the local summary")
+        explanation, hits = _local_explanation(programs, profile["_lang"]), []
 
     # Persist results
     profile["_ranked_subsidies"] = programs
@@ -173,6 +208,20 @@ Explain:
     }
 
 
+def _local_explanation(programs, lang: str) -> str:
+    # Degraded results text while the LLM is unavailable (llm_guard.py)
+    if lang == "en":
+        head = "Our assistant is busy right now. Based on your answers, these schemes look most relevant:"
+        empty = "Our assistant is busy right now and no matching schemes were found. Please try again later."
+    else:
+        head = "Onze assistent is nu erg druk. Op basis van je antwoorden lijken deze regelingen het meest relevant:"
+        empty = "Onze assistent is nu erg druk en er zijn geen passende regelingen gevonden. Probeer het later opnieuw."
+    if not programs:
+        return empty
+    lines = [head] + [f"- {p['title']}" + (f" ({p['url']})" if p.get("url") else "") for p in programs]
+    return "\n".join(lines)
+
+
 # -------------------------
 # FOLLOW-UP HANDLER
 # -------------------------
@@ -209,10 +258,13 @@ User follow-up question:
 {user_message}
 """.strip()
 
+    # Profile plus a free-text question: personal, and never asked twice in the same words
     answer, hits = answer_with_rag(
         user_question=context,
         system_prompt=system_prompt,
         top_k=5,
+        filters={"municipality": profile.get("municipality")},
+        cache=False,
     )
 
     return {
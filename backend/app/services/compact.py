@@ -0,0 +1,82 @@
+"""
+compact.py
+
+Compact /chat responses: only what changed this turn, with ids instead of objects.
+
+The full response repeats the whole profile every turn, including _ranked_subsidies and
+the _explanation, plus the complete chunk text of every source, so payloads grow with the
+conversation. A compact turn is
+
+    {
+      "reply": "...",
+      "mode": "intake" | "results",
+      "profile": {...},          # only the fields that changed this turn
+      "missing_fields": [...],   # intake turns
+      "scheme_ids": [...],       # only when the ranked schemes changed
+      "source_ids": [...]        # chunk ids of this answer's sources, in rank order
+    }
+
+and the objects behind the ids come from cacheable GETs (ETag / If-None-Match):
+    GET /session/{session_id}/schemes    the session's ranked programs
+    GET /sources/{chunk_id}              one RAG chunk (text, source, municipality, ...)
+
+dumps() uses orjson when it is installed (several times faster than json for these
+payloads) and the standard library otherwise.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+# Profile fields the compact view never sends: they are the schemes and the reply
+HEAVY_FIELDS = ("_ranked_subsidies", "_explanation")
+
+
+def _default(obj: Any) -> Any:
+    # numpy scalars and the like from the catalog
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _scheme_ids(programs: List[Dict[str, Any]]) -> List[Any]:
+    return [p.get("id") for p in programs or []]
+
+
+def compact_turn(before: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The compact form of a chatbot_step() result, given the session profile from before the turn.
+    """
+    profile = result.get("profile") or {}
+    out: Dict[str, Any] = {
+        "reply": result.get("reply", ""),
+        "mode": result.get("mode"),
+        "profile": {
+            k: v for k, v in profile.items()
+            if k not in HEAVY_FIELDS and (k not in before or before[k] != v)
+        },
+    }
+    if "missing_fields" in result:
+        out["missing_fields"] = result["missing_fields"]
+    schemes = _scheme_ids(result.get("schemes"))
+    if schemes != _scheme_ids(before.get("_ranked_subsidies")):
+        out["scheme_ids"] = schemes
+    out["source_ids"] = [h.get("chunk_id") for h in result.get("sources") or []]
+    return out
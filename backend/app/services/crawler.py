@@ -0,0 +1,311 @@
+"""
+crawler.py
+
+Async, polite crawler for the regulation pages in data/sources.txt.
+
+- one shared HTTP client (keep-alive connection reuse)
+- global + per-host concurrency limits and a minimum interval between requests per host
+- retries with exponential backoff + jitter on connection errors, 429 and 5xx (honours Retry-After)
+- HTML parsing runs in a process pool so the event loop only does I/O
+- resumable: per-URL status is kept in a JSON job-state file together with a run marker. An
+  interrupted run resumes and skips URLs that are done, or that failed after all retries
+  (final for that run); once a run got through every URL it is complete, and the next
+  crawl starts a new run that fetches everything again
+- optional PageCache: conditional requests (If-None-Match / If-Modified-Since); pages that come
+  back 304 or with an unchanged content hash are not parsed again
+
+`base_url` rewrites scheme+host of every URL, so a crawl can be pointed at a local
+stand-in server that replays recorded pages (see benchmarks/page_server.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, quote
+
+import httpx
+
+from app.services.page_cache import PageCache
+
+USER_AGENT = "Mozilla/5.0 (compatible; HulpwijzerBot/1.0; +https://singlesupermom.nl)"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class CrawlConfig:
+    global_concurrency: int = 32
+    per_host_concurrency: int = 4
+    per_host_interval_s: float = 0.25  # min seconds between request starts to one host
+    timeout_s: float = 15.0
+    max_retries: int = 4
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 30.0
+    parse_workers: int = max(1, (os.cpu_count() or 2) - 1)
+    user_agent: str = USER_AGENT
+    base_url: Optional[str] = None
+    record_dir: Optional[Path] = None  # keep raw HTML, replayable by the stand-in server
+    state_flush_every: int = 25
+
+
+@dataclass
+class CrawlStats:
+    total: int = 0
+    skipped: int = 0
+    done: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed_s: float = 0.0
+    errors: Dict[str, str] = field(default_factory=dict)
+    # Final job state (including URLs resumed from an earlier run)
+    jobs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+# -----------------------------
+# Job state
+# -----------------------------
+class JobState:
+    """
+    {"run": {"id", "started", "complete"}, "jobs": {url -> job}}, with
+    job = {"status": "done" | "failed", "attempts": int, "error": str | None, "result": Any}.
+    Written atomically; a crash loses at most `flush_every` finished URLs.
+
+    Loading an incomplete run resumes it; a complete run (or a file without run marker,
+    from before there was one) starts a new run with no jobs.
+    """
+
+    def __init__(self, path: Optional[Path], flush_every: int = 25):
+        self.path = path
+        self.flush_every = flush_every
+        self._dirty = 0
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.run: Dict[str, Any] = {}
+        self.resumed = False
+        if path is not None and path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            run = data.get("run") if isinstance(data.get("run"), dict) else None
+            if run is not None and not run.get("complete"):
+                self.run, self.jobs, self.resumed = run, data.get("jobs") or {}, True
+        if not self.resumed:
+            self.run = {"id": uuid.uuid4().hex, "started": time.time(), "complete": False}
+            self._dirty = 1
+
+    def is_final(self, url: str) -> bool:
+        # Failed URLs already used up their retries in this run
+        return self.jobs.get(url, {}).get("status") in ("done", "failed")
+
+    def complete(self):
+        self.run["complete"] = True
+        self._dirty += 1
+        self.flush()
+
+    def record(self, url: str, status: str, attempts: int, error: Optional[str] = None, result: Any = None):
+        self.jobs[url] = {"status": status, "attempts": attempts, "error": error, "result": result}
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"run": self.run, "jobs": self.jobs}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+
+# -----------------------------
+# Politeness
+# -----------------------------
+class HostLimiter:
+    def __init__(self, concurrency: int, interval_s: float):
+        self.sem = asyncio.Semaphore(concurrency)
+        self.interval_s = interval_s
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.sem.acquire()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval_s
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.sem.release()
+
+
+def rewrite_url(url: str, base_url: Optional[str]) -> str:
+    if not base_url:
+        return url
+    b = urlsplit(base_url)
+    u = urlsplit(url)
+    return urlunsplit((b.scheme, b.netloc, u.path, u.query, u.fragment))
+
+
+def record_name(url: str) -> str:
+    """
+    File name for a recorded page: the URL path, so the stand-in server can map requests back.
+    """
+    u = urlsplit(url)
+    return quote(u.path + (("?" + u.query) if u.query else ""), safe="") + ".html"
+
+
+def _retry_after_s(resp: httpx.Response) -> Optional[float]:
+    v = resp.headers.get("Retry-After")
+    try:
+        return float(v) if v is not None else None
+    except ValueError:
+        return None
+
+
+# -----------------------------
+# Crawl
+# -----------------------------
+async def _fetch(
+    client: httpx.AsyncClient,
+    limiter: HostLimiter,
+    url: str,
+    cfg: CrawlConfig,
+    stats: CrawlStats,
+    headers: Optional[Dict[str, str]] = None,
+) -> tuple:
+    """
+    Returns (response | None, attempts, error | None).
+    """
+    target = rewrite_url(url, cfg.base_url)
+    error: Optional[str] = None
+    for attempt in range(1, cfg.max_retries + 2):
+        delay: Optional[float] = None
+        try:
+            async with limiter:
+                resp = await client.get(target, headers=headers)
+            if resp.status_code < 400 or resp.status_code == 304:
+                return resp, attempt, None
+            error = f"HTTP {resp.status_code}"
+            if resp.status_code not in RETRY_STATUS:
+                return None, attempt, error
+            delay = _retry_after_s(resp)
+        except httpx.TransportError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt > cfg.max_retries:
+            break
+        stats.retries += 1
+        if delay is None:
+            delay = min(cfg.backoff_max_s, cfg.backoff_base_s * (2 ** (attempt - 1)))
+            delay *= 0.5 + random.random()
+        await asyncio.sleep(delay)
+    return None, cfg.max_retries + 1, error
+
+
+async def crawl_async(
+    urls: Iterable[str],
+    parse: Callable[[str, str], Any],
+    *,
+    state_path: Optional[Path] = None,
+    config: Optional[CrawlConfig] = None,
+    cache: Optional[PageCache] = None,
+) -> CrawlStats:
+    """
+    Fetches every URL not yet finished in the job state's run and runs parse(url, html) in the
+    worker pool.
+    parse must be a picklable module-level function; its return value is stored in the job state
+    (keep it small, e.g. an output path) as {"changed": bool, "output": ...}. With a cache,
+    unchanged pages are recorded as done with changed=False and parse is not called.
+    """
+    cfg = config or CrawlConfig()
+    state = JobState(state_path, cfg.state_flush_every)
+    stats = CrawlStats()
+    t0 = time.perf_counter()
+
+    todo: List[str] = []
+    for url in dict.fromkeys(u.strip() for u in urls if u.strip()):
+        stats.total += 1
+        if state.is_final(url):
+            stats.skipped += 1
+        else:
+            todo.append(url)
+
+    if cfg.record_dir is not None:
+        cfg.record_dir.mkdir(parents=True, exist_ok=True)
+
+    limiters: Dict[str, HostLimiter] = {}
+    global_sem = asyncio.Semaphore(cfg.global_concurrency)
+    loop = asyncio.get_running_loop()
+    limits = httpx.Limits(max_connections=cfg.global_concurrency, max_keepalive_connections=cfg.global_concurrency)
+
+    with ProcessPoolExecutor(max_workers=cfg.parse_workers) as pool:
+        async with httpx.AsyncClient(
+            headers={"User-Agent": cfg.user_agent},
+            timeout=cfg.timeout_s,
+            limits=limits,
+            follow_redirects=True,
+        ) as client:
+
+            async def one(url: str):
+                host = urlsplit(rewrite_url(url, cfg.base_url)).netloc
+                limiter = limiters.setdefault(host, HostLimiter(cfg.per_host_concurrency, cfg.per_host_interval_s))
+                headers = cache.conditional_headers(url) if cache is not None else None
+                async with global_sem:
+                    resp, attempts, error = await _fetch(client, limiter, url, cfg, stats, headers)
+                if resp is None:
+                    stats.failed += 1
+                    stats.errors[url] = error or "unknown error"
+                    state.record(url, "failed", attempts, error)
+                    return
+                if cache is not None:
+                    etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+                    if resp.status_code == 304 or cache.same_content(url, resp.content):
+                        cache.touch(url, etag, last_modified)
+                        stats.unchanged += 1
+                        state.record(url, "done", attempts, None, {"changed": False, "output": None})
+                        return
+                html = resp.text
+                if cfg.record_dir is not None:
+                    (cfg.record_dir / record_name(url)).write_text(html, encoding="utf-8")
+                try:
+                    result = await loop.run_in_executor(pool, parse, url, html)
+                except Exception as e:
+                    stats.failed += 1
+                    stats.errors[url] = f"parse: {e}"
+                    state.record(url, "failed", attempts, f"parse: {e}")
+                    return
+                # Cached only once parsed: a page whose parse failed must not look unchanged next run
+                if cache is not None:
+                    cache.put(url, resp.content, etag, last_modified)
+                stats.done += 1
+                state.record(url, "done", attempts, None, {"changed": True, "output": result})
+
+            try:
+                await asyncio.gather(*(one(u) for u in todo))
+                # Every URL is done or failed for good: the next crawl is a new run
+                state.complete()
+            finally:
+                state.flush()
+                if cache is not None:
+                    cache.save()
+
+    stats.elapsed_s = time.perf_counter() - t0
+    stats.jobs = state.jobs
+    return stats
+
+
+def crawl(urls: Iterable[str], parse: Callable[[str, str], Any], **kwargs) -> CrawlStats:
+    """
+    Sync wrapper for scripts.
+    """
+    return asyncio.run(crawl_async(urls, parse, **kwargs))
@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
 
-SCHEMES = json.loads(Path("app/data/schemes.json").read_text())
+SCHEMES = json.loads((Path(__file__).resolve().parents[1] / "data" / "schemes.json").read_text(encoding="utf-8"))
 
 def check_eligibility(profile: dict):
     results = []
@@ -1,7 +1,15 @@
+import hashlib
+from dataclasses import replace
+from functools import partial
 import requests
-from bs4 import BeautifulSoup
-import time
-from urllib.parse import urlparse
+from pathlib import Path
+
+from app.services.crawler import CrawlConfig, crawl
+from app.services.html_text import extract_text
+
+def html_to_text(content) -> str:
+    """Extract the visible text of an HTML page, one phrase per line."""
+    return extract_text(content, lines=True, target_body=False)
 
 def scrape_url(url, timeout=10):
     """Scrape text content from a single URL."""
@@ -11,27 +19,27 @@ def scrape_url(url, timeout=10):
         }
         response = requests.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text
-        text = soup.get_text()
-        
-        # Clean up text - remove extra whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        return text
+        return html_to_text(response.content)
     except Exception as e:
         return f"Error scraping {url}: {str(e)}"
 
-def scrape_urls_from_file(input_file, output_file, delay=1):
-    """Read URLs from file and scrape all of them."""
+def _part_path(parts_dir: Path, url: str) -> Path:
+    return parts_dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".txt")
+
+def _parse_to_part(url: str, html: str, parts_dir: Path) -> str:
+    # Runs in the crawler's process pool
+    path = _part_path(parts_dir, url)
+    path.write_text(html_to_text(html), encoding="utf-8")
+    return path.name
+
+def scrape_urls_from_file(input_file, output_file, delay=1, config=None):
+    """
+    Read URLs from file and scrape all of them concurrently.
+
+    `delay` is the minimum interval between two requests to the same host. Pages are parsed
+    into <output_file>.parts/ as they arrive (an interrupted run resumes from there) and the
+    output file is assembled in input order at the end.
+    """
     
     # Read URLs from input file
     with open(input_file, 'r', encoding='utf-8') as f:
@@ -39,29 +47,33 @@ def scrape_urls_from_file(input_file, output_file, delay=1):
     
     total_urls = len(urls)
     print(f"Found {total_urls} URLs to scrape")
+
+    output_file = Path(output_file)
+    parts_dir = output_file.with_name(output_file.name + ".parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    # A copy: the caller's config (or a shared one) keeps its own interval
+    config = replace(config or CrawlConfig(), per_host_interval_s=delay)
+    stats = crawl(urls, partial(_parse_to_part, parts_dir=parts_dir), state_path=parts_dir / "state.json", config=config)
+    print(f"Fetched {stats.done} new pages, {stats.skipped} resumed, {stats.failed} failed")
     
     # Open output file
     with open(output_file, 'w', encoding='utf-8') as f:
         for idx, url in enumerate(urls, 1):
-            print(f"Processing {idx}/{total_urls}: {url}")
-            
             # Write separator and URL
             f.write(f"\n{'='*80}\n")
             f.write(f"URL {idx}: {url}\n")
             f.write(f"{'='*80}\n\n")
             
-            # Scrape and write content
-            content = scrape_url(url)
-            f.write(content)
+            # Scraped content, or the error the crawler gave up with; a part file of an
+            # earlier run does not count for a URL that failed in this one
+            job = stats.jobs.get(url, {})
+            part = _part_path(parts_dir, url)
+            if job.get("status") == "done" and part.exists():
+                f.write(part.read_text(encoding="utf-8"))
+            else:
+                f.write(f"Error scraping {url}: {job.get('error') or 'not fetched'}")
             f.write("\n\n")
-            
-            # Flush to disk periodically
-            if idx % 10 == 0:
-                f.flush()
-            
-            # Be polite - add delay between requests
-            if idx < total_urls:
-                time.sleep(delay)
     
     print(f"\nCompleted! Scraped {total_urls} URLs.")
     print(f"Output saved to: {output_file}")
@@ -70,11 +82,11 @@ if __name__ == "__main__":
     # Configuration
     INPUT_FILE = "../data/sources.txt"  # Your input file
     OUTPUT_FILE = "../data/scraped_content.txt"  # Output file
-    DELAY_SECONDS = 1  # Delay between requests (be respectful to servers)
+    DELAY_SECONDS = 1  # Min delay between requests to one host (be respectful to servers)
     
     print("Starting web scraping...")
     print(f"Input file: {INPUT_FILE}")
     print(f"Output file: {OUTPUT_FILE}")
     print(f"Delay between requests: {DELAY_SECONDS} seconds\n")
     
-    scrape_urls_from_file("C:/Users/nilss/AppData/Local/Programs/Microsoft VS Code/document_links.txt", "C:/Users/nilss/AppData/Local/Programs/Microsoft VS Code/document_links_output2.txt", delay=0)
\ No newline at end of file
+    scrape_urls_from_file("C:/Users/nilss/AppData/Local/Programs/Microsoft VS Code/document_links.txt", "C:/Users/nilss/AppData/Local/Programs/Microsoft VS Code/document_links_output2.txt", delay=0)
@@ -1,7 +1,9 @@
-import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
+from app.services import metrics
+from app.services.intake_parser import parse_intake, found_any, is_ambiguous
 from app.services.llm import chat_text
+from app.services.llm_guard import ProviderUnavailable
 
 SYSTEM_PROMPT = """
 You are a strict data extraction tool.
@@ -22,60 +24,44 @@ EXAMPLE OUTPUT:
 {"age": "25","municipality": "Delft", "monthly_income": 1800, "children": 1}
 """
 
-def extract_user_info(text: str) -> Dict[str, Any]:
-    text = text.strip()
-
-    # ---------- HARD RULES ----------
-
-    # Age
-    if re.fullmatch(r"\d{1,3}", text):
-        return {
-            "age": int(text),
-            "municipality": None,
-            "children": None,
-            "monthly_income": None,
-        }
+# Where intake answers were resolved; the LLM share is the fallback rate
+EXTRACTION_STATS = {"local": 0, "llm": 0, "ambiguous": 0}
+metrics.expose("extraction", EXTRACTION_STATS, "Intake answers resolved locally or by the LLM.")
 
-    # Municipality (single word or short phrase, capitalized)
-    if re.fullmatch(r"[A-Za-z\- ]{2,}", text) and text[0].isupper():
-        return {
-            "age": None,
-            "municipality": text,
-            "children": None,
-            "monthly_income": None,
-        }
 
-    # Children
-    m = re.search(r"(\d+)\s*(child|children)", text.lower())
-    if m:
-        return {
-            "age": None,
-            "municipality": None,
-            "children": int(m.group(1)),
-            "monthly_income": None,
-        }
+@metrics.timed("extraction")
+def extract_user_info(text: str, asked: Optional[str] = None) -> Dict[str, Any]:
+    """
+    asked: the intake field whose question the user is answering (bare "1800" is then an
+    income, not an age). Local rules first (intake_parser.py); the LLM when they find nothing
+    or leave numbers unexplained.
+    """
+    text = text.strip()
 
-    # Income
-    m = re.search(r"(\d{3,5})", text.replace(",", ""))
-    if m:
-        return {
-            "age": None,
-            "municipality": None,
-            "children": None,
-            "monthly_income": int(m.group(1)),
-        }
+    extracted = parse_intake(text, asked)
+    if found_any(extracted):
+        if not is_ambiguous(text, extracted):
+            EXTRACTION_STATS["local"] += 1
+            return extracted
+        EXTRACTION_STATS["ambiguous"] += 1
 
     # Otherwise fall back to LLM extraction
-    raw = chat_text([{
-        "role": "user",
-        "content": f"""
+    EXTRACTION_STATS["llm"] += 1
+    try:
+        raw = chat_text([{
+            "role": "user",
+            "content": f"""
     {SYSTEM_PROMPT}
 
     USER MESSAGE:
     {text}
     """.strip()
-        }
-    ])
+            }
+        ])
+    except ProviderUnavailable as e:
+        # The local result (possibly partial, or nothing: the question is asked again)
+        print(f"LLM extraction unavailable ({e})")
+        return extracted
     # best-effort parse
     try:
         return json.loads(raw)
@@ -2,5 +2,5 @@ import json
 from pathlib import Path
 
 FIELDS = json.loads(
-    Path("app/data/fields.json").read_text(encoding="utf-8")
+    (Path(__file__).resolve().parents[1] / "data" / "fields.json").read_text(encoding="utf-8")
 )
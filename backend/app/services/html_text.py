@@ -0,0 +1,102 @@
+"""
+html_text.py
+
+Shared HTML -> text extraction for the scrapers (data/fetch_sources.clean_html and
+services/extract_eligibility.html_to_text).
+
+Fast path: lxml (libxml2 HTML parser in C), drop boilerplate elements in C, optionally narrow
+to the regulation body container, then one whitespace pass over the concatenated text.
+Fallback: the original BeautifulSoup/html.parser implementation, used when lxml is not
+installed or cannot parse the document. benchmarks/bench_html_extract.py compares both.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Optional, Union
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # optional speed-up
+    lxml = None
+
+DROP_TAGS = ("script", "style", "noscript", "template", "nav", "footer", "header")
+# Tags the original html_to_text removed (it kept nav/header/footer text)
+DROP_TAGS_LINES = ("script", "style")
+
+# Where overheid.nl puts the regulation text, most specific first
+BODY_XPATHS = (
+    "//*[@id='broodtekst']",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' wetgeving ')]",
+    "//main",
+    "//*[@id='content']",
+)
+# The same containers as CSS selectors, for the BeautifulSoup fallback
+BODY_SELECTORS = ("#broodtekst", ".wetgeving", "main", "#content")
+
+# Same boundaries the original line cleanup used: newlines and runs of 2+ spaces
+_LINE_SPLIT_RE = re.compile(r"[ \t\r\f\v]*\n[ \t\r\f\v]*| {2,}")
+
+
+def _find_body(tree):
+    for xp in BODY_XPATHS:
+        found = tree.xpath(xp)
+        if found:
+            return found[0]
+    return tree
+
+
+def _to_lines(text: str) -> str:
+    return "\n".join(p for p in (s.strip() for s in _LINE_SPLIT_RE.split(text)) if p)
+
+
+def _extract_lxml(html: Union[str, bytes], lines: bool, target_body: bool) -> Optional[str]:
+    try:
+        tree = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(tree, *(DROP_TAGS_LINES if lines else DROP_TAGS), with_tail=False)
+    node = _find_body(tree) if target_body else tree
+    if lines:
+        return _to_lines("".join(node.itertext()))
+    return " ".join(" ".join(node.itertext()).split())
+
+
+def _find_body_bs4(soup):
+    for sel in BODY_SELECTORS:
+        found = soup.select_one(sel)
+        if found is not None:
+            return found
+    return soup
+
+
+def _extract_bs4(html: Union[str, bytes], lines: bool, target_body: bool) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(DROP_TAGS_LINES if lines else DROP_TAGS)):
+        tag.decompose()
+    node = _find_body_bs4(soup) if target_body else soup
+    if lines:
+        return _to_lines(node.get_text())
+    return " ".join(node.get_text(separator=" ").split())
+
+
+def extract_text(
+    html: Union[str, bytes],
+    *,
+    lines: bool = False,
+    target_body: bool = True,
+    fast: bool = True,
+) -> str:
+    """
+    lines=False: single-space flattened text without page chrome (fetch_sources / RAG pages).
+    lines=True: one phrase per line, like the original extract_eligibility output.
+    target_body: keep only the regulation body container when the page has one.
+    """
+    if fast and lxml is not None and html:
+        text = _extract_lxml(html, lines, target_body)
+        if text is not None:
+            return text
+    return _extract_bs4(html, lines, target_body)
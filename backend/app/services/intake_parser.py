@@ -0,0 +1,448 @@
+"""
+intake_parser.py
+
+Local, rule-based extraction of the intake fields (age, municipality, children,
+monthly_income) from one user message, Dutch or English. extractor.extract_user_info only
+falls back to the LLM when nothing is found here, or when is_ambiguous() reports numbers
+the rules could not place.
+
+- all fields in one pass, independent of order ("Ik ben 32, woon in Delft en heb 2 kinderen")
+- numbers with Dutch/English separators and units ("€1.800,50", "1,8k", "2100 per maand",
+  "24000 per jaar" -> monthly)
+- number words ("twee kinderen", "no kids")
+- municipalities looked up in a vetted list of the catalog's gemeente names (plus a few
+  common aliases); a name in an answer to another question needs a cue or exact spelling
+- intake context: a bare answer ("1800", "2", "geen") is read as the field that was just asked
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+FIELDS = ("age", "municipality", "children", "monthly_income")
+
+NUMBER_WORDS = {
+    "geen": 0, "no": 0, "zero": 0, "none": 0, "nul": 0,
+    "een": 1, "één": 1, "one": 1, "a": 1, "an": 1,
+    "twee": 2, "two": 2, "drie": 3, "three": 3, "vier": 4, "four": 4,
+    "vijf": 5, "five": 5, "zes": 6, "six": 6, "zeven": 7, "seven": 7,
+    "acht": 8, "eight": 8, "negen": 9, "nine": 9, "tien": 10, "ten": 10,
+}
+# Bare "no"-style answers to the children question
+NONE_ANSWERS = {"geen", "nee", "no", "none", "zero", "nul", "0", "geen kinderen", "no children", "no kids"}
+
+# Short replies that are not a place name
+NON_ANSWERS = {"ja", "nee", "yes", "no", "ok", "oke", "oké", "hoi", "hallo", "hello", "hi", "hey", "weet ik niet", "i don't know"}
+
+MUNICIPALITY_ALIASES = {
+    "the hague": "Den Haag",
+    "'s-gravenhage": "Den Haag",
+    "s-gravenhage": "Den Haag",
+    "den bosch": "'s-Hertogenbosch",
+    "s-hertogenbosch": "'s-Hertogenbosch",
+    "'s-hertogenbosch": "'s-Hertogenbosch",
+}
+# Lowercase words allowed inside a municipality name ("Bergen op Zoom", "Krimpen aan den IJssel")
+_NAME_PARTICLES = {"aan", "den", "de", "op", "het", "en", "a/d", "van", "ter", "ten"}
+# Municipalities that are also common words: only matched after a cue ("in Best") or as the whole answer
+_COMMON_WORD_NAMES = {"best", "goes", "echt", "buren", "stein", "putten", "loon", "land", "horst", "ede", "epe"}
+# Scraped catalog names run on into the regulation text ("Alkmaar Artikel 9", "Zaanstad gelezen
+# het voorstel", "Geen"); a name ends at the first of these words
+_NOT_NAME_WORDS = {
+    "geen", "artikel", "gelezen", "gelet", "burgemeester", "permalink", "printen", "wettelijke",
+    "houdende", "hoofdstuk", "bijlage", "college", "raad", "besluit", "regeling", "verordening",
+    "beleidsregels", "tot", "nee", "ja", "idee", "kinderen", "kind",
+}
+# A cleaned name must occur this often in the catalog (authority and municipality columns of
+# gemeente rows) to be matched in free text; one-off values are mostly scraping debris
+MIN_SEEN = 2
+
+_NUM = r"\d{1,3}(?:[.,\s]\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d+)?"
+_CHILD_WORDS = r"kinderen|kind|kids?|children|child|zoons?|dochters?|sons?|daughters?"
+_WORD_NUM = "|".join(sorted((re.escape(w) for w in NUMBER_WORDS), key=len, reverse=True))
+
+_CHILDREN_RE = re.compile(
+    rf"\b({_NUM}|{_WORD_NUM})\s+(?:[a-zà-ÿ]+\s+)?(?:{_CHILD_WORDS})\b", re.IGNORECASE
+)
+_PARENT_OF_RE = re.compile(
+    rf"\b(?:moeder|vader|ouder|mother|mom|mum|father|dad|parent)\s+(?:of|van)\s+({_NUM}|{_WORD_NUM})\b(?!\s*(?:jaar|years?))",
+    re.IGNORECASE,
+)
+_AGE_CUE_RE = re.compile(
+    rf"\b(?:i am|i'm|im|ik ben|age|aged|leeftijd|mijn leeftijd is|my age is)\s*:?\s*(\d{{1,2}})\b"
+    rf"(?!\s*(?:[.,]\d|k\b|{_CHILD_WORDS}|euro|eur|€))",
+    re.IGNORECASE,
+)
+_AGE_UNIT_RE = re.compile(r"\b(\d{1,2})\s*(?:jaar|jr|years?|yrs?|y/o|yo)\b(?:\s*(?:oud|old))?", re.IGNORECASE)
+_AMOUNT = rf"({_NUM})\s*(k\b|duizend|thousand)?"
+_CURRENCY_RE = re.compile(rf"(?:€|\beur(?:o)?\b)\s*{_AMOUNT}|{_AMOUNT}\s*(?:€|euros?\b|eur\b)", re.IGNORECASE)
+_INCOME_CUE_RE = re.compile(
+    rf"\b(?:inkomen|income|verdien\w*|earn\w*|salaris|salary|loon|uitkering|bijstand|netto|net|krijg|receive)\D{{0,25}}?{_AMOUNT}",
+    re.IGNORECASE,
+)
+# "1400 netto", "1800 per maand": the cue follows the amount
+_INCOME_CUE_AFTER_RE = re.compile(
+    rf"(?<![\w.,]){_AMOUNT}\s*(?:euros?\s+|eur\s+)?"
+    rf"(?:netto|bruto|net|gross|per\s+maand|per\s+month|a\s+month|p/m|inkomen|income|salaris|salary)\b",
+    re.IGNORECASE,
+)
+_PERIOD_RE = {
+    "year": re.compile(r"per\s+jaar|per\s+year|a\s+year|jaarlijks|annual(?:ly)?|yearly|p/j", re.IGNORECASE),
+    "week": re.compile(r"per\s+week|a\s+week|weekly|wekelijks|p/w", re.IGNORECASE),
+}
+# "Ik woon in Gemeente Edam-Volendam" -> the name part of an answer to the municipality question
+_MUNI_PREFIX_RE = re.compile(
+    r"^(?:(?:ik\s+)?woon\s+in|i\s+live\s+in|in|uit|from)?\s*(?:(?:de\s+)?gemeente|municipality(?:\s+of)?)?\s+",
+    re.IGNORECASE,
+)
+_MUNI_CUE_RE = re.compile(
+    r"\b(?:in|gemeente|uit|from|live in|woon in|wonen in|municipality(?: of)?)\s+$", re.IGNORECASE
+)
+# A number that is not an age or a percentage ("17 years old", "100%")
+_AMOUNT_RE = re.compile(rf"(?<![\w.,]){_AMOUNT}(?![\w.,]?\d|\s*%|\s*(?:jaar|jr|years?|yrs?)\b)", re.IGNORECASE)
+# Words that may accompany the single number of an answer ("about 2100 a month"); anything
+# else ("my son is 5") means the number may be about something other than the question
+_FILLER_WORDS = {
+    "about", "around", "approximately", "approx", "roughly", "ongeveer", "circa", "ca", "zo'n", "rond",
+    "i", "ik", "have", "heb", "it", "it's", "is", "het", "de", "a", "an", "per", "month", "maand",
+    "monthly", "maandelijks", "net", "netto", "gross", "bruto", "euro", "euros", "eur", "year", "jaar",
+    "week", "old", "oud", "yes", "ja", "nou", "well", "so", "dus",
+}
+# Clause boundaries for deciding what an age belongs to; "5 en 7 jaar" stays one clause
+_CLAUSE_SPLIT_RE = re.compile(r"[,;]|(?<!\d\s)\b(?:en|and|maar|but)\b", re.IGNORECASE)
+_NUMBER_TOKEN_RE = re.compile(rf"(?<![\w.,]){_AMOUNT}(?![\w.,]?\d)", re.IGNORECASE)
+_BARE_NUMBER_RE = re.compile(rf"^\s*(?:€\s*)?{_AMOUNT}\s*(?:euros?|eur|€)?\s*[.!]?\s*$", re.IGNORECASE)
+
+
+def parse_amount(num: str, suffix: Optional[str] = None) -> Optional[float]:
+    """
+    "1.800" / "1,800" / "1 800" -> 1800, "1800,50" -> 1800.5, "1,8" + "k" -> 1800.
+    """
+    s = num.strip().replace(" ", "")
+    if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", s) and not suffix:
+        s = s.replace(".", "").replace(",", "")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+,\d{1,2}", s):
+        s = s.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:,\d{3})+\.\d{1,2}", s):
+        s = s.replace(",", "")
+    else:
+        s = s.replace(",", ".")
+    try:
+        v = float(s)
+    except ValueError:
+        return None
+    if suffix and suffix.lower() in ("k", "duizend", "thousand"):
+        v *= 1000
+    return v
+
+
+def _to_int(token: str) -> Optional[int]:
+    t = token.lower()
+    if t in NUMBER_WORDS:
+        return NUMBER_WORDS[t]
+    v = parse_amount(t)
+    return int(v) if v is not None and v == int(v) else None
+
+
+def _monthly(v: float, text: str) -> int:
+    if _PERIOD_RE["year"].search(text):
+        v /= 12
+    elif _PERIOD_RE["week"].search(text):
+        v *= 52 / 12
+    return int(round(v))
+
+
+# -----------------------------
+# Municipalities
+# -----------------------------
+def clean_municipality(raw: str) -> Optional[str]:
+    """
+    Catalog values are scraped and often carry trailing text ("Gouda in de Basisregistratie
+    personen", "Bergen\\nop Zoom", "Nijmegen -B"); keep the capitalised name part.
+    """
+    s = " ".join(str(raw).replace("\n", " ").split())
+    s = re.split(r"\s+-", s)[0]
+    s = re.sub(r"^gemeente\s+", "", s, flags=re.IGNORECASE)
+    words: List[str] = []
+    for w in s.split(" "):
+        if w.lower() in _NOT_NAME_WORDS or re.search(r"\d", w):
+            break
+        if w[:1].isupper() or w[:2] == "'s" or (words and w in _NAME_PARTICLES):
+            words.append(w)
+        else:
+            break
+    while words and words[-1].lower() in _NAME_PARTICLES:
+        words.pop()
+    name = " ".join(words)
+    return name if len(name) >= 2 else None
+
+
+def display_name(name: str) -> str:
+    """
+    Dutch capitalisation for names scraped in one case ("DEN HAAG" -> "Den Haag",
+    "krimpen aan den ijssel" -> "Krimpen aan den IJssel"); mixed-case names are kept.
+    """
+    if not (name.isupper() or name.islower()):
+        return name
+
+    def cap(part: str) -> str:
+        if part.startswith("'s"):
+            return "'s" + part[2:]
+        if part.startswith("ij"):
+            return "IJ" + part[2:]
+        return part[:1].upper() + part[1:]
+
+    words = []
+    for i, w in enumerate(name.lower().split(" ")):
+        if i and w in _NAME_PARTICLES:
+            words.append(w)
+        else:
+            words.append("-".join(cap(p) if j == 0 or p not in _NAME_PARTICLES else p for j, p in enumerate(w.split("-"))))
+    return " ".join(words)
+
+
+class MunicipalityIndex:
+    def __init__(self, names, min_seen: int = 1):
+        """
+        names: raw catalog values, one per occurrence; a name is kept when at least min_seen
+        of them clean to it.
+        """
+        canonical: Dict[str, str] = {}
+        seen: Dict[str, int] = {}
+        for raw in names:
+            name = clean_municipality(raw)
+            if name:
+                key = name.lower()
+                seen[key] = seen.get(key, 0) + 1
+                # Prefer a spelling with real capitalisation over an all-caps catalog entry
+                if key not in canonical or (canonical[key].isupper() and not name.isupper()):
+                    canonical[key] = name
+        # "Midden" next to "Midden-Groningen": a name cut at its hyphen, not a municipality
+        heads = {k.split("-")[0] for k in canonical if "-" in k}
+        canonical = {
+            k: display_name(v) for k, v in canonical.items() if seen[k] >= min_seen and k not in heads
+        }
+        for alias, name in MUNICIPALITY_ALIASES.items():
+            canonical.setdefault(alias, name)
+        self.canonical = canonical
+        # Longest names first so "Bergen op Zoom" wins over "Bergen"
+        alts = "|".join(re.escape(n) for n in sorted(canonical, key=len, reverse=True))
+        self.pattern = re.compile(rf"(?<![\w'-])({alts})(?![\w-])", re.IGNORECASE)
+
+    def find(self, text: str, whole_answer: bool = False, strict: bool = False) -> Optional[str]:
+        """
+        whole_answer: text answers "which municipality?", so a name in it needs no cue.
+        strict: text answers another question; only a cue ("in Delft") or the name spelled
+        exactly as in the catalog, token for token, counts.
+        """
+        answer = _MUNI_PREFIX_RE.sub("", text.strip(" .!?"))
+        for m in self.pattern.finditer(text):
+            surface = m.group(1)
+            key = surface.lower()
+            name = self.canonical[key]
+            cue = _MUNI_CUE_RE.search(text[: m.start()])
+            # The message is only the name ("delft", "Gemeente Delft")
+            alone = answer.lower() == key
+            capitalised = surface[:1].isupper() or surface[:2] == "'s"
+            if strict and not (cue or surface == name):
+                continue
+            if key in _COMMON_WORD_NAMES and not (cue or alone or (whole_answer and not strict)):
+                continue
+            if not (capitalised or cue or alone or whole_answer):
+                continue
+            return name
+        return None
+
+
+_municipalities: Dict[str, MunicipalityIndex] = {}
+
+
+def get_municipality_index() -> Optional[MunicipalityIndex]:
+    if "index" not in _municipalities:
+        try:
+            from app.services.subsidy_loader import get_subsidy_df
+
+            df = get_subsidy_df()
+            if "authority_type" in df.columns:
+                df = df[df["authority_type"] == "gemeente"]
+            # Every occurrence, not unique values: MIN_SEEN counts them
+            names = [
+                v for col in ("authority_name", "municipality") if col in df.columns for v in df[col].dropna().tolist()
+            ]
+        except Exception as e:  # catalog missing: fall back to the capitalised-phrase rule
+            print(f"Municipality list unavailable: {e}")
+            return None
+        _municipalities["index"] = MunicipalityIndex(names, min_seen=MIN_SEEN)
+    return _municipalities["index"]
+
+
+# -----------------------------
+# Extraction
+# -----------------------------
+def _children(text: str) -> Optional[int]:
+    # "2 sons and 1 daughter", "a son of 6 and a daughter of 9": add the mentions up
+    counts = [_to_int(m.group(1)) for m in _CHILDREN_RE.finditer(text)]
+    counts = [n for n in counts if n is not None]
+    if counts:
+        n = sum(counts)
+        return n if n <= 20 else None
+    m = _PARENT_OF_RE.search(text)
+    if m:
+        n = _to_int(m.group(1))
+        if n is not None and 0 <= n <= 20:
+            return n
+    return None
+
+
+def _age(text: str) -> Optional[int]:
+    for m in _AGE_CUE_RE.finditer(text):
+        # "2 kids aged 5 and 7, I'm 40": skip the children's ages
+        if 14 <= int(m.group(1)) <= 99 and not _about_child(text, m.start()):
+            return int(m.group(1))
+    for m in _AGE_UNIT_RE.finditer(text):
+        v = int(m.group(1))
+        # "kinderen van 5 en 7 jaar" is about the children; "2 kids, 34 years old" is not
+        if 16 <= v <= 99 and not _about_child(text, m.start()):
+            return v
+    return None
+
+
+def _about_child(text: str, start: int) -> bool:
+    """
+    True when the clause a number at `start` stands in mentions a child.
+    """
+    clause = _CLAUSE_SPLIT_RE.split(text[max(0, start - 40): start])[-1]
+    return re.search(rf"\b(?:{_CHILD_WORDS})\b", clause, re.IGNORECASE) is not None
+
+
+def _amount_groups(m: re.Match) -> Tuple[Optional[str], Optional[str]]:
+    # _AMOUNT contributes (number, suffix) group pairs; _CURRENCY_RE has two alternatives
+    g = m.groups()
+    for i in range(0, len(g), 2):
+        if g[i]:
+            return g[i], g[i + 1]
+    return None, None
+
+
+def _income(text: str) -> Optional[int]:
+    for rx in (_CURRENCY_RE, _INCOME_CUE_RE, _INCOME_CUE_AFTER_RE):
+        for m in rx.finditer(text):
+            num, suffix = _amount_groups(m)
+            if num is None:
+                continue
+            v = parse_amount(num, suffix)
+            if v is not None and 0 <= v <= 1_000_000:
+                return _monthly(v, text)
+    return None
+
+
+def _as_asked(asked: str, v: float, text: str) -> Dict[str, Any]:
+    if asked == "monthly_income":
+        return {"monthly_income": _monthly(v, text)}
+    if asked == "children" and v == int(v) and 0 <= v <= 20:
+        return {"children": int(v)}
+    if asked == "age" and v == int(v) and 14 <= v <= 120:
+        return {"age": int(v)}
+    return {}
+
+
+def _bare_answer(text: str, asked: Optional[str]) -> Dict[str, Any]:
+    """
+    A message that is only a number / "geen", interpreted by the question just asked.
+    """
+    t = text.strip().lower().rstrip(".!")
+    if asked == "children" and t in NONE_ANSWERS:
+        return {"children": 0}
+    if asked == "children" and t in NUMBER_WORDS:
+        return {"children": NUMBER_WORDS[t]}
+    m = _BARE_NUMBER_RE.match(text)
+    if not m:
+        return {}
+    v = parse_amount(m.group(1), m.group(2))
+    if v is None:
+        return {}
+    if asked in ("monthly_income", "children", "age"):
+        return _as_asked(asked, v, text)
+    # No (usable) context: small whole numbers are ages, larger ones amounts
+    if v == int(v) and 14 <= v <= 99 and not m.group(2) and "€" not in text and asked != "monthly_income":
+        return {"age": int(v)}
+    if v >= 100:
+        return {"monthly_income": _monthly(v, text)}
+    return {}
+
+
+def parse_intake(text: str, asked: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns {age, municipality, children, monthly_income}, None where nothing was found.
+    asked: the intake field whose question the user is answering, if any.
+    """
+    out: Dict[str, Any] = {f: None for f in FIELDS}
+    text = (text or "").strip()
+    if not text:
+        return out
+
+    bare = _bare_answer(text, asked)
+    if bare:
+        out.update(bare)
+        return out
+
+    out["children"] = _children(text)
+    out["age"] = _age(text)
+    out["monthly_income"] = _income(text)
+
+    # "about 2100 a month" in answer to the income question: the only number is the answer.
+    # Not for "my son is 5": other words mean the number may be about something else
+    if asked in ("monthly_income", "children", "age") and out[asked] is None:
+        numbers = [m for m in _AMOUNT_RE.finditer(text)]
+        if len(numbers) == 1 and not found_any(out) and _only_filler(text):
+            out.update(_as_asked(asked, parse_amount(*numbers[0].groups()) or 0, text))
+
+    words = re.findall(r"[\w'-]+", text)
+    short_answer = len(words) <= 4 and not re.search(r"\d", text)
+    index = get_municipality_index()
+    if index is not None:
+        out["municipality"] = index.find(
+            text, whole_answer=short_answer and asked == "municipality", strict=asked not in (None, "municipality")
+        )
+    if out["municipality"] is None and asked == "municipality" and not found_any(out):
+        # Unknown to the catalog but an answer to "which municipality?" ("Schiermonnikoog")
+        name = _MUNI_PREFIX_RE.sub("", text.strip(" .!"))
+        if (
+            len(name.split()) <= 4
+            and re.fullmatch(r"['A-Za-zÀ-ÿ\- ]{2,}", name)
+            and name.lower() not in NON_ANSWERS
+            and not set(name.lower().split()) & _NOT_NAME_WORDS
+        ):
+            out["municipality"] = name[:1].upper() + name[1:]
+    return out
+
+
+def _only_filler(text: str) -> bool:
+    words = re.findall(r"[a-zà-ÿ']+", _NUMBER_TOKEN_RE.sub(" ", text.lower()))
+    return all(w in _FILLER_WORDS for w in words)
+
+
+def found_any(extracted: Dict[str, Any]) -> bool:
+    return any(extracted.get(f) is not None for f in FIELDS)
+
+
+def is_ambiguous(text: str, extracted: Dict[str, Any]) -> bool:
+    """
+    True when the message has a number the extraction does not account for (not the age,
+    the children count, the income, or a child's age), e.g. "ik verdien 1800 en krijg 300
+    alimentatie". The rules then give a partial or wrong answer and the LLM should read it.
+    """
+    income = extracted.get("monthly_income")
+    known = {v for v in (extracted.get("age"), extracted.get("children")) if v is not None}
+    for m in _NUMBER_TOKEN_RE.finditer(text or ""):
+        v = parse_amount(m.group(1), m.group(2))
+        if v is None:
+            continue
+        if v in known or _about_child(text, m.start()):
+            continue
+        if income is not None and income in (round(v), round(v / 12), round(v * 52 / 12)):
+            continue
+        return True
+    return False
+
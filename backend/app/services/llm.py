@@ -1,27 +1,55 @@
 import os
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
+from app.services import llm_guard, metrics, resources, single_flight
+from app.services.response_cache import get_cache
 from app.services.rag_retrival import RAGRetriever, INDEX_DIR, EMBED_MODEL_NAME
+from app.services.rag_sidecar import RemoteRetriever, connect as connect_sidecar
+from app.services.rag_rerank import get_reranker, RERANK_FETCH_K, CONTEXT_TOKEN_BUDGET
 
 load_dotenv()
 
-GREENPT_API_KEY = os.getenv("GREENPT_API_KEY")
-if not GREENPT_API_KEY:
-    raise RuntimeError("GREENPT_API_KEY is not set")
+# Overridable to point at benchmarks/fake_llm_server.py
+GREENPT_BASE_URL = os.getenv("GREENPT_BASE_URL", "https://api.greenpt.ai/v1/")
+DEFAULT_MODEL = "green-l"
 
-client = OpenAI(
-    api_key=GREENPT_API_KEY,
-    base_url="https://api.greenpt.ai/v1/",
-)
 
-# Load retriever once
-rag = RAGRetriever(index_dir=INDEX_DIR, embed_model_name=EMBED_MODEL_NAME)
+def _make_client() -> "OpenAI":
+    # The openai package takes ~0.6s to import; only pay for it when a call is made
+    from openai import OpenAI
+
+    api_key = os.getenv("GREENPT_API_KEY")
+    if not api_key:
+        raise RuntimeError("GREENPT_API_KEY is not set")
+    return OpenAI(api_key=api_key, base_url=GREENPT_BASE_URL)
+
+
+# Built on first use (or by the startup warm-up), not at import; see resources.py
+resources.register("llm_client", _make_client)
+
+
+def _make_retriever():
+    # Multi-worker deployments share one model + index through the sidecar (rag_sidecar.py)
+    socket_path = os.getenv("RAG_SIDECAR_SOCKET")
+    if socket_path:
+        return connect_sidecar(socket_path)
+    return RAGRetriever(index_dir=INDEX_DIR, embed_model_name=EMBED_MODEL_NAME)
+
+
+resources.register("rag", _make_retriever)
+
+
+def get_client() -> "OpenAI":
+    return resources.get("llm_client")
+
+
+def get_rag() -> Union[RAGRetriever, RemoteRetriever]:
+    return resources.get("rag")
 
-DEFAULT_MODEL = "green-l"
 
 def detect_language_hint(text: str) -> str:
     text = text.lower()
@@ -41,13 +69,51 @@ def _format_rag_context(hits: List[Dict[str, Any]]) -> str:
         lines.append(f"[{i}] source={src}\n{txt}")
     return "\n\n".join(lines)
 
+def _complete(site: str, model: str, messages: List[Dict[str, str]], timeout: float) -> str:
+    # No client-side retries: llm_guard's breaker and the callers' fallbacks handle failures,
+    # and retries would overrun the request deadline
+    resp = get_client().with_options(timeout=timeout, max_retries=0).chat.completions.create(
+        model=model,
+        messages=messages,
+    )
+    metrics.record_usage(site, resp)
+    return resp.choices[0].message.content or ""
+
+
+def _cached_call(site: str, key: str, call: Callable[[], str], cache: bool) -> str:
+    """
+    Response cache (response_cache.py) first; on a miss, identical prompts in flight at the
+    same time share one request (single_flight.py) and the leader stores the answer.
+    """
+    store = get_cache() if cache else None
+    if store is not None:
+        try:
+            hit = store.get(key)
+        except sqlite3.Error as e:
+            print(f"LLM cache read failed: {e}")
+            hit = None
+        if hit is not None:
+            return hit
+
+    def call_and_store() -> str:
+        answer = call()
+        if store is not None and answer:
+            try:
+                store.put(key, answer)
+            except sqlite3.Error as e:
+                print(f"LLM cache write failed: {e}")
+        return answer
+
+    return single_flight.do(site, key, call_and_store)
+
+
 # def chat_text(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> str:
 #     resp = client.chat.completions.create(
 #         model=model,
 #         messages=messages,
 #     )
 #     return resp.choices[0].message.content or ""
-def chat_text(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> str:
+def chat_text(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL, cache: bool = True) -> str:
     # GreenPT does NOT support system role
     flattened = []
     system_prefix = ""
@@ -61,13 +127,14 @@ def chat_text(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> str
     if system_prefix and flattened:
         flattened[0]["content"] = system_prefix + flattened[0]["content"]
 
-    resp = client.chat.completions.create(
-        model=model,
-        messages=flattened,
-    )
-    return resp.choices[0].message.content or ""
+    def call() -> str:
+        return llm_guard.call(model, lambda timeout: _complete("chat", model, flattened, timeout))
 
-def translate_text(text: str, target_lang: str) -> str:
+    key = single_flight.request_key(op="chat", model=model, messages=flattened)
+    return _cached_call("chat", key, call, cache)
+
+@metrics.timed("translation")
+def translate_text(text: str, target_lang: str, cache: bool = True) -> str:
     if not text.strip():
         return text
 
@@ -80,11 +147,13 @@ TEXT:
 {text}
 """.strip()
 
-    resp = client.chat.completions.create(
-        model=DEFAULT_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-    )
-    return resp.choices[0].message.content or text
+    def call() -> str:
+        messages = [{"role": "user", "content": prompt}]
+        return llm_guard.call(DEFAULT_MODEL, lambda timeout: _complete("translate", DEFAULT_MODEL, messages, timeout))
+
+    key = single_flight.request_key(op="translate", model=DEFAULT_MODEL, prompt=prompt)
+    # Empty answers are not cached; fall back to the untranslated text
+    return _cached_call("translate", key, call, cache) or text
 
 
 def answer_with_rag(
@@ -93,8 +162,23 @@ def answer_with_rag(
     extra_messages: Optional[List[Dict[str, str]]] = None,
     top_k: int = 5,
     model: str = DEFAULT_MODEL,
+    filters: Optional[Dict[str, Any]] = None,
+    rerank: Optional[str] = None,
+    cache: bool = True,
 ) -> Tuple[str, List[Dict[str, Any]]]:
-    hits = rag.rag_search({"query": user_question, "top_k": top_k})
+    # rerank: None = RAG_RERANK env default, "" = off, "cross" / "overlap" = backend
+    # cache: False bypasses the LLM response cache for both the answer and its translation
+    reranker = get_reranker(rerank)
+    fetch_k = max(top_k, RERANK_FETCH_K) if reranker else top_k
+
+    with metrics.stage("rag_search"):
+        hits = get_rag().rag_search({"query": user_question, "top_k": fetch_k, "filters": filters})
+        if not hits and filters:
+            # Nothing indexed for e.g. this municipality yet: better national context than none
+            hits = get_rag().rag_search({"query": user_question, "top_k": fetch_k})
+    if reranker:
+        with metrics.stage("rerank"):
+            hits = reranker.rerank(user_question, hits, top_n=top_k, token_budget=CONTEXT_TOKEN_BUDGET)
     rag_context = _format_rag_context(hits)
 
     # lang = detect_language_hint(user_question)
@@ -127,11 +211,15 @@ def answer_with_rag(
     ]
 
 
-    answer = chat_text(msgs, model=model)
+    with metrics.stage("generation"):
+        answer = chat_text(msgs, model=model, cache=cache)
 
     lang = detect_language_hint(user_question)
     if lang == "en":
-        answer = translate_text(answer, "English")
+        try:
+            answer = translate_text(answer, "English", cache=cache)
+        except llm_guard.ProviderUnavailable as e:
+            print(f"Translation skipped: {e}")
 
     return answer, hits
 
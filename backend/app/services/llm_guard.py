@@ -0,0 +1,265 @@
+"""
+llm_guard.py
+
+Admission control, deadlines and circuit breaking around the LLM provider.
+
+Without it every request in a traffic spike blocks a threadpool worker on the GreenPT
+endpoint, and a slow or failing provider makes every request slow or failing. Each
+provider call (chat_text, translate_text, rank_with_llm) goes through call(model, fn):
+
+- deadline: /chat sets one per request (deadline(seconds)); it travels with the request's
+  context into the calls it makes, and every provider call gets at most the time left
+  (and never more than LLM_TIMEOUT_S)
+- concurrency: at most LLM_MAX_CONCURRENCY calls per model run at once; callers wait for
+  a slot until their deadline
+- admission: with LLM_MAX_QUEUE callers already waiting, new calls fail immediately
+- circuit breaker: when at least half of the last calls of a model (minimum
+  BREAKER_MIN_CALLS within BREAKER_WINDOW_S) failed, calls fail immediately for
+  BREAKER_COOLDOWN_S; then one probe call decides whether it closes again
+
+All refusals raise ProviderUnavailable (DeadlineExceeded when the caller's deadline ran out). Callers degrade on it: ranking falls back to the
+prefilter order, the results text to a local summary, extraction to the local parser's
+result, and /chat answers 503 when nothing useful is left. Cached answers
+(response_cache.py) are served before the guard is consulted, so they keep working while
+the breaker is open.
+
+STATS counts calls, rejections per reason, failures and breaker trips.
+Try it against benchmarks/fake_llm_server.py (injected latency / errors).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+from app.services import metrics
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+# Upper bound for one provider call, also without a request deadline
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+BREAKER_WINDOW_S = 30.0
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+
+T = TypeVar("T")
+
+STATS = {
+    "calls": 0,
+    "failed": 0,
+    "rejected_queue": 0,
+    "rejected_breaker": 0,
+    "rejected_deadline": 0,
+    "breaker_trips": 0,
+}
+metrics.expose("llm_guard", STATS, "LLM provider calls, failures, refusals and breaker trips.")
+
+
+class ProviderUnavailable(RuntimeError):
+    """
+    The call was not made (or gave up); the caller should degrade or answer 503.
+    retry_after: seconds after which a retry is worth it.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(ProviderUnavailable):
+    """
+    The caller's own deadline ran out; says nothing about the provider (single_flight lets
+    followers with time left try again).
+    """
+
+
+# -------------------------
+# Deadlines
+# -------------------------
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Everything called inside (in this thread / context) has to finish within `seconds`.
+    A nested deadline can only shorten the outer one.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left of the current deadline, None without one.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+# -------------------------
+# Per-model gate: semaphore + queue depth + breaker
+# -------------------------
+
+class _Gate:
+    def __init__(self):
+        self.slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        # (monotonic time, ok) of recent calls
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        self.open_until = 0.0
+        self.probing = False
+
+    def admit(self, now: float) -> Tuple[bool, bool]:
+        """
+        (may go ahead, is the half-open probe): after the cooldown exactly one call probes.
+        """
+        with self.lock:
+            if now < self.open_until:
+                return False, False
+            if self.open_until:  # half-open
+                if self.probing:
+                    return False, False
+                self.probing = True
+                return True, True
+            return True, False
+
+    def record(self, ok: bool, probe: bool) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if probe:  # the probe's outcome decides
+                self.probing = False
+                if ok:
+                    self.open_until = 0.0
+                    self.outcomes.clear()
+                else:
+                    self.open_until = now + BREAKER_COOLDOWN_S
+                return
+            if self.open_until:  # started before the breaker opened
+                return
+            self.outcomes.append((now, ok))
+            while self.outcomes and now - self.outcomes[0][0] > BREAKER_WINDOW_S:
+                self.outcomes.popleft()
+            errors = sum(1 for _, o in self.outcomes if not o)
+            if len(self.outcomes) >= BREAKER_MIN_CALLS and errors / len(self.outcomes) >= BREAKER_ERROR_RATE:
+                self.open_until = now + BREAKER_COOLDOWN_S
+                STATS["breaker_trips"] += 1
+                print(f"LLM circuit breaker open for {BREAKER_COOLDOWN_S:.0f}s ({errors}/{len(self.outcomes)} calls failed)")
+
+    @property
+    def state(self) -> str:
+        if not self.open_until:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+
+_gates: Dict[str, _Gate] = {}
+_gates_lock = threading.Lock()
+
+
+def _gate(model: str) -> _Gate:
+    with _gates_lock:
+        g = _gates.get(model)
+        if g is None:
+            g = _gates[model] = _Gate()
+        return g
+
+
+def call(model: str, fn: Callable[[float], T]) -> T:
+    """
+    fn(timeout_s) performs the provider request with that timeout. Raises
+    ProviderUnavailable when the call is refused or fn fails (timeout, connection error,
+    5xx...); failures count for the breaker.
+    """
+    gate = _gate(model)
+    now = time.monotonic()
+
+    left = remaining()
+    if left is not None and left <= 0:
+        STATS["rejected_deadline"] += 1
+        raise DeadlineExceeded("request deadline exceeded")
+
+    allowed, probe = gate.admit(now)
+    if not allowed:
+        STATS["rejected_breaker"] += 1
+        raise ProviderUnavailable(f"LLM provider circuit open for {model}", retry_after=max(gate.open_until - now, 1.0))
+
+    with gate.lock:
+        if gate.waiting >= LLM_MAX_QUEUE:
+            STATS["rejected_queue"] += 1
+            queue_full = True
+        else:
+            gate.waiting += 1
+            queue_full = False
+    if queue_full:
+        _release_probe(gate, probe)
+        raise ProviderUnavailable(f"too many LLM calls queued for {model}")
+
+    try:
+        acquired = gate.slots.acquire(timeout=left if left is not None else LLM_TIMEOUT_S)
+    finally:
+        with gate.lock:
+            gate.waiting -= 1
+    if not acquired:
+        STATS["rejected_deadline"] += 1
+        _release_probe(gate, probe)
+        raise DeadlineExceeded("request deadline exceeded waiting for an LLM slot")
+
+    try:
+        left = remaining()
+        timeout = LLM_TIMEOUT_S if left is None else min(LLM_TIMEOUT_S, left)
+        if timeout <= 0:
+            STATS["rejected_deadline"] += 1
+            _release_probe(gate, probe)
+            raise DeadlineExceeded("request deadline exceeded")
+        STATS["calls"] += 1
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            if left is not None and timeout < LLM_TIMEOUT_S and remaining() <= 0:
+                # Cut off by the caller's deadline, not a provider failure: the breaker ignores it
+                STATS["rejected_deadline"] += 1
+                _release_probe(gate, probe)
+                raise DeadlineExceeded("request deadline exceeded waiting for the LLM") from e
+            STATS["failed"] += 1
+            gate.record(False, probe)
+            raise ProviderUnavailable(f"LLM call failed ({type(e).__name__}: {e})") from e
+        gate.record(True, probe)
+        return result
+    finally:
+        gate.slots.release()
+
+
+def _release_probe(gate: _Gate, probe: bool) -> None:
+    # A probe that never reached the provider must not block the next one
+    if probe:
+        with gate.lock:
+            gate.probing = False
+
+
+def status() -> Dict[str, Dict[str, object]]:
+    return {m: {"breaker": g.state, "waiting": g.waiting} for m, g in _gates.items()}
+
+
+def reset() -> None:
+    """
+    Forgets breaker history and gates (benchmarks start each phase from a clean state).
+    """
+    with _gates_lock:
+        _gates.clear()
@@ -0,0 +1,212 @@
+"""
+metrics.py
+
+Per-stage latency histograms and counters, rendered in Prometheus text format on /metrics.
+
+    @metrics.timed("prefilter")              # whole function
+    def prefilter_candidates(...): ...
+
+    with metrics.stage("faiss_search"):      # a block
+        scores, ids = index.search(q, k)
+
+    metrics.record_usage("chat", resp)       # token counts from an OpenAI response
+
+Stages on the /chat path: chat (whole request), session_load, session_save, extraction,
+prefilter, llm_rank, rag_search (with embed, faiss_search, lexical_search inside it when
+the retriever is in-process), rerank, generation, translation.
+
+The services' own counter dicts (response_cache.STATS, single_flight.STATS, ...) are
+registered with expose() and rendered as counters, plus hit/coalesce ratios.
+
+METRICS=0 disables collection: timed() returns the function unchanged and stage() a
+shared no-op context manager, so the hot path pays one attribute lookup at most.
+Numbers are per process; scrape every worker (or run one) for the full picture.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+METRICS = os.getenv("METRICS", "1") != "0"
+PREFIX = "hulpwijzer"
+# Seconds; from in-memory lookups (prefilter) to LLM round trips
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "n")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last = +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+
+
+_stages: Dict[str, _Histogram] = {}
+# (name, sorted label items) -> value
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+# name -> (help, stats dict)
+_exposed: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+
+def observe(stage_name: str, seconds: float) -> None:
+    with _lock:
+        h = _stages.get(stage_name)
+        if h is None:
+            h = _stages[stage_name] = _Histogram()
+        h.observe(seconds)
+
+
+@contextmanager
+def _timer(stage_name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, time.perf_counter() - t0)
+
+
+def stage(stage_name: str):
+    """
+    Context manager timing a block into the stage's histogram (exceptions included).
+    """
+    return _timer(stage_name) if METRICS else _NOOP
+
+
+def timed(stage_name: str) -> Callable[[F], F]:
+    def wrap(fn: F) -> F:
+        if not METRICS:
+            return fn
+
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(stage_name, time.perf_counter() - t0)
+
+        return inner  # type: ignore[return-value]
+
+    return wrap
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    if not METRICS:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def record_usage(site: str, resp: Any) -> None:
+    """
+    Token counts of an OpenAI-compatible response (providers without usage are skipped).
+    """
+    usage = getattr(resp, "usage", None)
+    if not METRICS or usage is None:
+        return
+    inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, site=site, kind="prompt")
+    inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, site=site, kind="completion")
+
+
+def expose(name: str, stats: Dict[str, Any], help_text: str) -> None:
+    """
+    Renders a module's counter dict as {PREFIX}_{name}_total{event=key}; nested dicts
+    ({site: {event: n}}) become {site=..., event=...}.
+    """
+    _exposed[name] = (help_text, stats)
+
+
+# -------------------------
+# Prometheus text format
+# -------------------------
+
+def _labels(items) -> str:
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _ratio(num: float, den: float) -> float:
+    return num / den if den else 0.0
+
+
+def render() -> str:
+    lines: List[str] = []
+    with _lock:
+        stages = {k: (list(h.counts), h.total, h.n) for k, h in _stages.items()}
+        counters = dict(_counters)
+
+    name = f"{PREFIX}_stage_seconds"
+    lines += [f"# HELP {name} Latency of request pipeline stages.", f"# TYPE {name} histogram"]
+    for stage_name, (counts, total, n) in sorted(stages.items()):
+        cum = 0
+        for le, c in zip(BUCKETS + (float("inf"),), counts):
+            cum += c
+            le_s = "+Inf" if le == float("inf") else repr(le)
+            lines.append(f'{name}_bucket{{stage="{stage_name}",le="{le_s}"}} {cum}')
+        lines.append(f'{name}_sum{{stage="{stage_name}"}} {total:.6f}')
+        lines.append(f'{name}_count{{stage="{stage_name}"}} {n}')
+
+    seen = set()
+    for (cname, labels), value in sorted(counters.items()):
+        full = f"{PREFIX}_{cname}"
+        if full not in seen:
+            lines.append(f"# TYPE {full} counter")
+            seen.add(full)
+        lines.append(f"{full}{_labels(labels)} {value:g}")
+
+    for ename, (help_text, stats) in sorted(_exposed.items()):
+        full = f"{PREFIX}_{ename}_total"
+        lines += [f"# HELP {full} {help_text}", f"# TYPE {full} counter"]
+        for key, value in sorted(stats.items()):
+            if isinstance(value, dict):
+                for event, v in sorted(value.items()):
+                    lines.append(f'{full}{{site="{key}",event="{event}"}} {v}')
+            else:
+                lines.append(f'{full}{{event="{key}"}} {value}')
+
+    lines += _ratios()
+    return "\n".join(lines) + "\n"
+
+
+def _ratios() -> List[str]:
+    # The ratios asked about most often, so a dashboard does not have to derive them
+    out: List[str] = []
+
+    def gauge(gname: str, help_text: str, rows: List[Tuple[Optional[str], float]]) -> None:
+        full = f"{PREFIX}_{gname}"
+        out.extend([f"# HELP {full} {help_text}", f"# TYPE {full} gauge"])
+        for site, v in rows:
+            out.append(f"{full}{_labels([('site', site)] if site else [])} {v:.4f}")
+
+    if "llm_cache" in _exposed:
+        s = _exposed["llm_cache"][1]
+        gauge("llm_cache_hit_ratio", "LLM response cache hits / lookups.",
+              [(None, _ratio(s.get("hits", 0), s.get("hits", 0) + s.get("misses", 0)))])
+    if "single_flight" in _exposed:
+        s = _exposed["single_flight"][1]
+        gauge("llm_coalesce_ratio", "LLM calls served by another in-flight identical call.",
+              [(site, _ratio(r["followers"], r["leaders"] + r["followers"])) for site, r in sorted(s.items())])
+    if "extraction" in _exposed:
+        s = _exposed["extraction"][1]
+        gauge("extraction_local_ratio", "Intake answers resolved without the LLM.",
+              [(None, _ratio(s.get("local", 0), s.get("local", 0) + s.get("llm", 0)))])
+    return out
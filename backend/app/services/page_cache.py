@@ -0,0 +1,162 @@
+"""
+page_cache.py
+
+Content-addressed cache of scraped pages plus HTTP validators, so a refresh only
+re-downloads and re-parses regulations that actually changed.
+
+Layout (cache_dir):
+  index.json              url -> {sha256, etag, last_modified, fetched_at}
+  objects/ab/abcdef….html  raw page body, named by its sha256
+
+After a crawl, a change manifest (changes.json) lists which URLs changed, which were
+unchanged (304 or same hash) and which failed in that run. It also keeps, across runs,
+when each URL last changed (changed_at); downstream builders (RAG index, structured
+eligibility extraction) ask changed_since(manifest, their own last build) so a page
+changed by an earlier crawl stays pending until they have processed it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "changes.json"
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.objects_dir = cache_dir / "objects"
+        self.index_path = cache_dir / "index.json"
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.index_path.exists():
+            self.entries = json.loads(self.index_path.read_text(encoding="utf-8"))
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        e = self.entries.get(url)
+        if not e:
+            return {}
+        headers: Dict[str, str] = {}
+        if e.get("etag"):
+            headers["If-None-Match"] = e["etag"]
+        if e.get("last_modified"):
+            headers["If-Modified-Since"] = e["last_modified"]
+        return headers
+
+    def object_path(self, sha: str) -> Path:
+        return self.objects_dir / sha[:2] / f"{sha}.html"
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        e = self.entries.get(url)
+        if not e:
+            return None
+        p = self.object_path(e["sha256"])
+        return p.read_bytes() if p.exists() else None
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Page confirmed unchanged (304 or same hash): refresh validators only.
+        """
+        e = self.entries.setdefault(url, {})
+        if etag:
+            e["etag"] = etag
+        if last_modified:
+            e["last_modified"] = last_modified
+        e["fetched_at"] = time.time()
+
+    def same_content(self, url: str, body: bytes) -> bool:
+        """
+        True when body is the cached version of url (nothing to re-parse).
+        """
+        prev = self.entries.get(url, {}).get("sha256")
+        return prev is not None and prev == sha256_bytes(body)
+
+    def put(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        """
+        Stores the body; returns True when its content differs from the cached version.
+        Call it only once the page has been processed: a stored body counts as up to date.
+        """
+        sha = sha256_bytes(body)
+        prev = self.entries.get(url, {}).get("sha256")
+        if prev == sha:
+            self.touch(url, etag, last_modified)
+            return False
+        p = self.object_path(sha)
+        if not p.exists():
+            p.parent.mkdir(parents=True, exist_ok=True)
+            p.write_bytes(body)
+        self.entries[url] = {
+            "sha256": sha,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        return True
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+
+# -----------------------------
+# Change manifest
+# -----------------------------
+def write_change_manifest(
+    path: Path,
+    changed: List[str],
+    unchanged: List[str],
+    failed: List[str],
+    files: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    files: url -> output file name for changed pages, so consumers need not re-derive names.
+    changed/unchanged/failed describe this run; changed_at is merged with the previous manifest.
+    """
+    now = time.time()
+    files = files or {}
+    previous = load_change_manifest(path) or {}
+    changed_at: Dict[str, Dict[str, Any]] = dict(previous.get("changed_at") or {})
+    if not changed_at:
+        # Manifest from before changed_at: its changed pages may not have been processed yet
+        for url in previous.get("changed", []):
+            changed_at[url] = {"at": previous.get("generated_at", 0), "file": previous.get("files", {}).get(url)}
+    for url in changed:
+        changed_at[url] = {"at": now, "file": files.get(url)}
+
+    manifest = {
+        "generated_at": now,
+        "changed": sorted(changed),
+        "unchanged": sorted(unchanged),
+        "failed": sorted(failed),
+        "files": files,
+        "changed_at": changed_at,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return manifest
+
+
+def changed_since(manifest: Dict[str, Any], since: float) -> Dict[str, Optional[str]]:
+    """
+    url -> output file name of every page changed by any crawl after `since` (a consumer's
+    last build time), not just by the last one.
+    """
+    return {url: e.get("file") for url, e in (manifest.get("changed_at") or {}).items() if e.get("at", 0) > since}
+
+
+def load_change_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
@@ -0,0 +1,250 @@
+"""
+profiler.py
+
+Opt-in sampling profiler for single requests.
+
+/chat latency is spread over pandas (prefilter), the encoder, JSON parsing and waiting on
+the LLM provider; the stage histograms in metrics.py say which stage was slow, not why.
+A profiled request has its thread's stack sampled every PROFILE_INTERVAL_MS by one
+background thread (sys._current_frames, no tracing hooks), so the request itself runs at
+full speed and unprofiled requests pay nothing.
+
+    with profiler.profile("chat", requested=x_profile) as p:   # p is None when not sampled
+        ...
+
+A request is profiled when
+- it sends X-Profile: <PROFILE_TOKEN>, or
+- it falls in the PROFILE_SAMPLE_RATE share of requests (0.0 - 1.0, default 0).
+
+Both are off by default: without PROFILE_TOKEN the header is ignored and the admin
+endpoints refuse every request, so anonymous clients can neither force sampling and
+profile writes nor read stacks.
+
+Samples are wall-clock: a request blocked on the provider shows up as socket reads under
+chat_text / rank_with_llm, which is exactly the "network or CPU?" question. Work handed to
+other threads (speculative ranking) appears as a wait in the request thread.
+
+Each profile is written to PROFILE_DIR as
+    <id>.folded   collapsed stacks ("frame;frame;frame count"), the input format of
+                  flamegraph.pl, speedscope and inferno
+    <id>.json     metadata (name, duration, samples, trigger, status)
+and the newest PROFILE_KEEP are kept. /admin/profiles lists them (X-Profile-Token).
+
+PROFILING=0 switches everything off (header included).
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.services import metrics
+
+PROFILING = os.getenv("PROFILING", "1") != "0"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Required for header-triggered profiles and the admin endpoints; unset disables both
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_DIR = Path(os.getenv(
+    "PROFILE_DIR", str(Path(__file__).resolve().parents[1] / "storage" / "profiles")
+))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+# A request still running after this long stops being sampled (bounds sampler work)
+PROFILE_MAX_S = 300.0
+
+STATS = {"captured": 0, "sampled": 0, "requested": 0, "denied": 0, "samples": 0}
+metrics.expose("profiler", STATS, "Request profiles captured and stack samples taken.")
+
+_NOOP = nullcontext()
+
+
+@dataclass
+class Profile:
+    id: str
+    name: str
+    trigger: str  # header | sampled
+    thread_id: int
+    started: float = field(default_factory=time.monotonic)
+    created: float = field(default_factory=time.time)
+    stacks: Dict[str, int] = field(default_factory=dict)
+    samples: int = 0
+    status: Optional[int] = None
+
+
+# -----------------------------
+# Sampler
+# -----------------------------
+_active: Dict[str, Profile] = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_sampler: Optional[threading.Thread] = None
+# code object -> frame label; code objects live as long as their function
+_labels: Dict[Any, str] = {}
+
+
+def _module_name(path: str) -> str:
+    # /.../site-packages/pandas/core/frame.py -> pandas.core.frame; same for the stdlib and app/
+    roots = sorted({os.path.abspath(p or ".") for p in sys.path}, key=len, reverse=True)
+    for root in roots:
+        if path.startswith(root + os.sep):
+            path = path[len(root) + 1:]
+            break
+    else:
+        path = os.path.basename(path)
+    return path[:-3].replace(os.sep, ".") if path.endswith(".py") else path
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{_module_name(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+    return label
+
+
+def _collapse(frame) -> str:
+    parts: List[str] = []
+    while frame is not None:
+        parts.append(_label(frame.f_code))
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def _run() -> None:
+    while True:
+        _wake.wait()
+        time.sleep(PROFILE_INTERVAL_S)
+        with _lock:
+            profiles = list(_active.values())
+            if not profiles:
+                _wake.clear()
+                continue
+        frames = sys._current_frames()
+        now = time.monotonic()
+        for p in profiles:
+            frame = frames.get(p.thread_id)
+            if frame is None or now - p.started > PROFILE_MAX_S:
+                continue
+            stack = _collapse(frame)
+            p.stacks[stack] = p.stacks.get(stack, 0) + 1
+            p.samples += 1
+            STATS["samples"] += 1
+        del frames
+
+
+def _ensure_sampler() -> None:
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_run, name="profiler", daemon=True)
+        _sampler.start()
+
+
+# -----------------------------
+# Per-request profiles
+# -----------------------------
+def _trigger(requested: Optional[str]) -> Optional[str]:
+    if not PROFILING:
+        return None
+    if requested:
+        if authorized(requested):
+            return "header"
+        STATS["denied"] += 1
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def profile(name: str, requested: Optional[str] = None):
+    """
+    Context manager yielding the Profile being captured for the current thread, or None
+    when this request is not profiled. The profile is written when the block exits.
+    """
+    trigger = _trigger(requested)
+    return _capture(name, trigger) if trigger else _NOOP
+
+
+@contextmanager
+def _capture(name: str, trigger: str) -> Iterator[Profile]:
+    p = Profile(id=uuid.uuid4().hex[:16], name=name, trigger=trigger, thread_id=threading.get_ident())
+    STATS["requested" if trigger == "header" else "sampled"] += 1
+    with _lock:
+        _active[p.id] = p
+        _ensure_sampler()
+    _wake.set()
+    try:
+        yield p
+    finally:
+        with _lock:
+            _active.pop(p.id, None)
+        duration = time.monotonic() - p.started
+        try:
+            _write(p, duration)
+        except OSError as e:
+            print(f"Could not store profile {p.id} ({type(e).__name__}: {e})")
+
+
+def _write(p: Profile, duration: float) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    folded = "".join(f"{stack} {n}\n" for stack, n in sorted(p.stacks.items()))
+    (PROFILE_DIR / f"{p.id}.folded").write_text(folded, encoding="utf-8")
+    meta = {
+        "id": p.id,
+        "name": p.name,
+        "trigger": p.trigger,
+        "created": p.created,
+        "duration_ms": round(duration * 1000, 1),
+        "samples": p.samples,
+        "interval_ms": PROFILE_INTERVAL_S * 1000,
+        "status": p.status,
+    }
+    (PROFILE_DIR / f"{p.id}.json").write_text(json.dumps(meta), encoding="utf-8")
+    STATS["captured"] += 1
+    _prune()
+
+
+def _prune() -> None:
+    metas = sorted(PROFILE_DIR.glob("*.json"), key=lambda f: f.stat().st_mtime, reverse=True)
+    for old in metas[PROFILE_KEEP:]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+# -----------------------------
+# Admin access
+# -----------------------------
+def authorized(token: Optional[str]) -> bool:
+    return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Metadata of the stored profiles, newest first.
+    """
+    if not PROFILE_DIR.exists():
+        return []
+    out: List[Dict[str, Any]] = []
+    for f in PROFILE_DIR.glob("*.json"):
+        try:
+            out.append(json.loads(f.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    out.sort(key=lambda m: m.get("created", 0), reverse=True)
+    return out[:limit]
+
+
+def read_folded(profile_id: str) -> Optional[str]:
+    # Ids are hex; anything else cannot name a stored profile (and cannot escape PROFILE_DIR)
+    if not profile_id or any(c not in "0123456789abcdef" for c in profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.folded"
+    return path.read_text(encoding="utf-8") if path.exists() else None
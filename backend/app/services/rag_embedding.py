@@ -1,12 +1,20 @@
+import argparse
+import csv
+import hashlib
 import json
+import os
 import re
-from dataclasses import dataclass, asdict
+import time
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+
+from app.services.rag_encoder import EMBED_BACKEND, load_encoder
+from app.services.rag_lexical import build_bm25, BM25_DIRNAME
+from app.services.page_cache import changed_since, load_change_manifest, MANIFEST_NAME
 
 
 # ----------------------------
@@ -16,10 +24,20 @@ BASE_DIR = Path(__file__).resolve().parents[2]
 DATA_DIR = BASE_DIR / "app" / "data" / "rag_data"
 OUT_DIR = BASE_DIR / "app" / "data" / "rag_index"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
+CATALOG_CSV = BASE_DIR / "app" / "data" / "single_parent_support_subsidies.csv"
+# Written by data/fetch_sources.py after each scrape
+CHANGE_MANIFEST = BASE_DIR / "app" / "data" / "pages" / MANIFEST_NAME
 
 EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 CHUNK_CHARS = 1800
 CHUNK_OVERLAP = 250
+# Near-duplicate detection: 64-bit SimHash over word 3-shingles
+SIMHASH_SHINGLE = 3
+SIMHASH_MAX_DISTANCE = 3
+# Streaming build: chunks are embedded per window (SentenceTransformer sorts each window by
+# length internally, so padding waste stays low) and appended to an on-disk float32 array.
+EMBED_WINDOW = 2048
+EMBED_BATCH = 64
 
 
 # ----------------------------
@@ -32,60 +50,233 @@ class Chunk:
     source: str
     start_char: int
     end_char: int
+    # Joined from the subsidy catalog (None when the source is not a known CVDR regulation)
+    cvdr_id: Optional[str] = None
+    municipality: Optional[str] = None
+    year: Optional[int] = None
+    category: Optional[str] = None
+    # Every source this text was found in (the chunk itself first); filled by dedupe_chunks
+    refs: List[Dict[str, Any]] = field(default_factory=list)
 
 
 # ----------------------------
 # Helpers
 # ----------------------------
+_WS_RE = re.compile(r"\s+")
+# "Artikel 3." / "Artikel 4a" headings; inline references are lowercase ("artikel 36, eerste lid")
+_ARTIKEL_RE = re.compile(r"(?=\bArtikel \d+[a-z]?\b)")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9•(\"'])")
+
 def clean_text(s: str) -> str:
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
+    # Single pass; structure is recovered from Artikel headings and sentence ends, not newlines
+    return _WS_RE.sub(" ", s).strip()
 
 def read_text_file(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
-def load_documents(data_dir: Path) -> List[Tuple[str, str]]:
-    docs: List[Tuple[str, str]] = []
+def iter_documents(data_dir: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (relative_path, text) one file at a time, in a stable order (resume relies on it).
+    """
     for p in sorted(data_dir.rglob("*")):
         if p.is_dir():
             continue
         ext = p.suffix.lower()
         rel = str(p.relative_to(data_dir))
         if ext in [".txt", ".md"]:
-            docs.append((rel, read_text_file(p)))
+            yield rel, read_text_file(p)
         else:
             raise ValueError(f"Unsupported file type: {ext} ({rel})")
-    return docs
+
+def load_documents(data_dir: Path) -> List[Tuple[str, str]]:
+    return list(iter_documents(data_dir))
+
+_CVDR_RE = re.compile(r"CVDR(\d+)", re.IGNORECASE)
+
+def load_catalog_metadata(csv_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    cvdr_id -> {cvdr_id, municipality, year, category} from the subsidy catalog CSV.
+    """
+    if not csv_path.exists():
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    with csv_path.open(encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            cvdr_id = (row.get("cvdr_id") or "").strip()
+            if not cvdr_id:
+                continue
+            try:
+                year: Optional[int] = int(float(row.get("year") or ""))
+            except ValueError:
+                year = None
+            out[cvdr_id] = {
+                "cvdr_id": cvdr_id,
+                "municipality": (row.get("municipality") or "").strip() or None,
+                "year": year,
+                "category": (row.get("category") or "").strip() or None,
+            }
+    return out
+
+def source_metadata(source: str, catalog: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Scraped pages are named after their URL (…_CVDR748406_1.txt), so the CVDR id links them to the catalog.
+    """
+    m = _CVDR_RE.search(source)
+    if not m:
+        return {}
+    return catalog.get(m.group(1), {"cvdr_id": m.group(1)})
+
+def _split_spans(text: str, pattern: re.Pattern, start: int, end: int) -> List[Tuple[int, int]]:
+    spans: List[Tuple[int, int]] = []
+    pos = start
+    for m in pattern.finditer(text, start, end):
+        if m.start() > pos:
+            spans.append((pos, m.start()))
+            pos = m.start()
+    if pos < end:
+        spans.append((pos, end))
+    return spans
+
+def _sentence_spans(text: str, chunk_chars: int) -> List[Tuple[int, int]]:
+    """
+    Sentence spans of the cleaned text, never crossing an Artikel heading.
+    Sentences longer than chunk_chars (enumerations without punctuation) are hard-split.
+    """
+    out: List[Tuple[int, int]] = []
+    for a_start, a_end in _split_spans(text, _ARTIKEL_RE, 0, len(text)):
+        for s_start, s_end in _split_spans(text, _SENTENCE_END_RE, a_start, a_end):
+            while s_end - s_start > chunk_chars:
+                out.append((s_start, s_start + chunk_chars))
+                s_start += chunk_chars
+            out.append((s_start, s_end))
+    return out
 
 def chunk_text(text: str, source: str, chunk_chars: int, overlap: int) -> List[Chunk]:
+    """
+    Packs whole sentences into chunks of at most chunk_chars. A new chunk starts at every
+    "Artikel" heading once the current one is half full, so articles are not glued together
+    mid-chunk. Consecutive chunks within an article share up to `overlap` chars of
+    trailing sentences.
+    """
     text = clean_text(text)
+    spans = _sentence_spans(text, chunk_chars)
     chunks: List[Chunk] = []
-    start = 0
-    idx = 0
-    n = len(text)
 
-    while start < n:
-        end = min(n, start + chunk_chars)
+    def emit(start: int, end: int):
         chunk_str = text[start:end].strip()
         if chunk_str:
-            cid = f"{source}::chunk_{idx}"
             chunks.append(Chunk(
-                id=cid,
+                id=f"{source}::chunk_{len(chunks)}",
                 text=chunk_str,
                 source=source,
                 start_char=start,
-                end_char=end
+                end_char=end,
             ))
-            idx += 1
 
-        if end >= n:
-            break
-        start = max(0, end - overlap)
+    cur: List[Tuple[int, int]] = []
+    for span in spans:
+        is_heading = text.startswith("Artikel ", span[0])
+        size = cur[-1][1] - cur[0][0] if cur else 0
+        too_big = cur and span[1] - cur[0][0] > chunk_chars
+        new_article = cur and is_heading and size >= chunk_chars // 2
+        if too_big or new_article:
+            emit(cur[0][0], cur[-1][1])
+            # Carry trailing sentences as overlap, but never into a new article
+            carry: List[Tuple[int, int]] = []
+            if not is_heading:
+                for prev in reversed(cur):
+                    if span[1] - prev[0] > chunk_chars or cur[-1][1] - prev[0] > overlap:
+                        break
+                    carry.insert(0, prev)
+            cur = carry
+        cur.append(span)
+    if cur:
+        emit(cur[0][0], cur[-1][1])
 
     return chunks
 
+def simhash(text: str, shingle: int = SIMHASH_SHINGLE) -> int:
+    words = text.lower().split()
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams],
+        dtype=np.uint64,
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(grams)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+def _chunk_ref(c: Chunk) -> Dict[str, Any]:
+    return {
+        "id": c.id,
+        "source": c.source,
+        "cvdr_id": c.cvdr_id,
+        "municipality": c.municipality,
+        "year": c.year,
+        "category": c.category,
+    }
+
+class ChunkDeduper:
+    """
+    Streaming near-duplicate detector. Chunks within SIMHASH_MAX_DISTANCE bits of an already
+    kept chunk are folded into that chunk's refs instead of getting their own vector.
+    Uses (max_distance + 1) 64-bit bands: two hashes within the distance share at least one band.
+    Only hashes and refs are kept in memory, never chunk text.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.n_bands = max_distance + 1
+        self.band_bits = 64 // self.n_bands
+        self.bands: List[Dict[int, List[int]]] = [{} for _ in range(self.n_bands)]
+        self.hashes: List[int] = []
+        self.refs: List[List[Dict[str, Any]]] = []
+
+    def _band_keys(self, h: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(h >> (i * self.band_bits)) & mask for i in range(self.n_bands)]
+
+    def add(self, c: Chunk) -> Optional[int]:
+        """
+        Returns the new row number if the chunk is new, None if it was merged into an earlier row.
+        """
+        h = simhash(c.text)
+        keys = self._band_keys(h)
+        for band, key in zip(self.bands, keys):
+            for j in band.get(key, ()):
+                if bin(self.hashes[j] ^ h).count("1") <= self.max_distance:
+                    self.refs[j].append(_chunk_ref(c))
+                    return None
+
+        j = len(self.hashes)
+        c.refs = [_chunk_ref(c)]
+        self.refs.append(c.refs)
+        self.hashes.append(h)
+        for band, key in zip(self.bands, keys):
+            band.setdefault(key, []).append(j)
+        return j
+
+def dedupe_chunks(chunks: List[Chunk]) -> List[Chunk]:
+    deduper = ChunkDeduper()
+    return [c for c in chunks if deduper.add(c) is not None]
+
+def iter_unique_chunks(
+    docs: Iterator[Tuple[str, str]],
+    catalog: Dict[str, Dict[str, Any]],
+    deduper: ChunkDeduper,
+) -> Iterator[Chunk]:
+    """
+    Lazily chunks documents, joins catalog metadata and drops near-duplicates.
+    Merged duplicates only show up in deduper.refs of their kept row.
+    """
+    for source, text in docs:
+        meta = source_metadata(source, catalog)
+        for c in chunk_text(text, source, CHUNK_CHARS, CHUNK_OVERLAP):
+            for k, v in meta.items():
+                setattr(c, k, v)
+            if deduper.add(c) is not None:
+                yield c
+
 def l2_normalize(x: np.ndarray) -> np.ndarray:
     norm = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
     return x / norm
@@ -94,41 +285,294 @@ def l2_normalize(x: np.ndarray) -> np.ndarray:
 # ----------------------------
 # Build
 # ----------------------------
-def main():
-    print(f"Loading documents from: {DATA_DIR.resolve()}")
-    docs = load_documents(DATA_DIR)
-    if not docs:
-        raise SystemExit(f"No documents found. Put .txt/.md/.pdf in path: {DATA_DIR.resolve()}")
+EMB_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.jsonl"
+STATE_FILE = "build_state.json"
+# Previous complete build, kept while rebuilding so unchanged chunks are not re-embedded
+PREV_EMB_FILE = "embeddings.prev.f32"
+PREV_CHUNKS_FILE = "chunks.prev.jsonl"
 
-    all_chunks: List[Chunk] = []
-    for source, text in docs:
-        all_chunks.extend(chunk_text(text, source, CHUNK_CHARS, CHUNK_OVERLAP))
 
-    print(f"Total chunks: {len(all_chunks)}")
-    texts = [c.text for c in all_chunks]
+def _build_params() -> Dict[str, Any]:
+    # A resumed build must produce exactly the same chunk sequence
+    return {
+        "embed_model": EMBED_MODEL_NAME,
+        "embed_backend": EMBED_BACKEND,
+        "chunk_chars": CHUNK_CHARS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "simhash_max_distance": SIMHASH_MAX_DISTANCE,
+    }
 
-    print(f"Loading embedding model: {EMBED_MODEL_NAME}")
-    model = SentenceTransformer(EMBED_MODEL_NAME)
+def _read_state(out_dir: Path) -> Optional[Dict[str, Any]]:
+    state_path = out_dir / STATE_FILE
+    if not state_path.exists():
+        return None
+    return json.loads(state_path.read_text(encoding="utf-8"))
 
-    print("Embedding...")
-    emb = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-    emb = emb.astype("float32")
-    emb = l2_normalize(emb)
+def _load_state(out_dir: Path, fresh: bool) -> Dict[str, Any]:
+    state = _read_state(out_dir)
+    if not fresh and state is not None:
+        if state.get("params") == _build_params() and not state.get("complete"):
+            return state
+        if not state.get("complete"):
+            print("Build parameters changed, starting fresh")
+    return {"params": _build_params(), "rows_done": 0, "dim": None, "complete": False, "prev_dim": None}
+
+def _save_state(out_dir: Path, state: Dict[str, Any]):
+    tmp = out_dir / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, out_dir / STATE_FILE)
+
+def _truncate_to_rows(out_dir: Path, rows: int, dim: Optional[int]):
+    """
+    Drops anything written after the last committed window (interrupted mid-window).
+    """
+    emb_path = out_dir / EMB_FILE
+    chunks_path = out_dir / CHUNKS_FILE
+    with emb_path.open("ab") as f:
+        f.truncate(rows * (dim or 0) * 4)
+    kept = 0
+    with chunks_path.open("r+b") as f:
+        for _ in range(rows):
+            if not f.readline():
+                break
+            kept += 1
+        f.truncate(f.tell())
+    if kept != rows:
+        raise RuntimeError(f"{chunks_path} has {kept} rows, build state says {rows}; rerun with --fresh")
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class VectorReuse:
+    """
+    Vectors of the previous complete build, looked up by chunk text. Unchanged pages produce
+    identical chunks, so after a scrape only chunks of changed pages go through the model.
+    """
+
+    def __init__(self, out_dir: Path, dim: int):
+        n = (out_dir / PREV_EMB_FILE).stat().st_size // (4 * dim)
+        self.rows: Dict[bytes, int] = {}
+        with (out_dir / PREV_CHUNKS_FILE).open(encoding="utf-8") as f:
+            for i, line in zip(range(n), f):
+                self.rows.setdefault(_text_key(json.loads(line)["text"]), i)
+        self.emb = np.memmap(out_dir / PREV_EMB_FILE, dtype="float32", mode="r", shape=(n, dim)) if n else np.empty((0, dim), dtype="float32")
+        self.hits = 0
+
+    def lookup(self, text: str) -> Optional[np.ndarray]:
+        row = self.rows.get(_text_key(text))
+        if row is None:
+            return None
+        self.hits += 1
+        return self.emb[row]
 
-    dim = emb.shape[1]
-    index = faiss.IndexFlatIP(dim)  # cosine via normalized inner product
-    index.add(emb)
 
-    meta: List[Dict[str, Any]] = [asdict(c) for c in all_chunks]
+class WindowEncoder:
+    """
+    Encodes one window of texts, either in-process or through a SentenceTransformer
+    multi-process pool (one worker per CPU core / device). ONNX encoders have no pool;
+    ONNX Runtime already spreads one batch over all cores.
+    """
 
-    index_path = OUT_DIR / "faiss.index"
-    meta_path = OUT_DIR / "metadata.json"
+    def __init__(self, model, workers: int, reuse: Optional[VectorReuse] = None):
+        self.model = model
+        use_pool = workers > 1 and hasattr(model, "start_multi_process_pool")
+        self.pool = model.start_multi_process_pool(["cpu"] * workers) if use_pool else None
+        self.reuse = reuse
+        self.encoded = 0  # texts that went through the model in this run
 
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self.reuse is None:
+            return self._encode(texts)
+        found = [self.reuse.lookup(t) for t in texts]
+        missing = [i for i, v in enumerate(found) if v is None]
+        if len(missing) == len(texts):
+            return self._encode(texts)
+        out = np.empty((len(texts), self.reuse.emb.shape[1]), dtype="float32")
+        for i, v in enumerate(found):
+            if v is not None:
+                out[i] = v
+        if missing:
+            out[missing] = self._encode([texts[i] for i in missing])
+        return out
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        self.encoded += len(texts)
+        if self.pool is not None:
+            emb = self.model.encode_multi_process(texts, self.pool, batch_size=EMBED_BATCH)
+        else:
+            emb = self.model.encode(texts, batch_size=EMBED_BATCH, convert_to_numpy=True)
+        return l2_normalize(emb.astype("float32"))
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+
+
+def embed_stream(
+    chunks: Iterator[Chunk],
+    encoder: WindowEncoder,
+    out_dir: Path,
+    state: Dict[str, Any],
+) -> int:
+    """
+    Appends embeddings + chunk records window by window, committing build_state.json after each.
+    Rows below state["rows_done"] were written by an interrupted run and are skipped.
+    """
+    rows_done = state["rows_done"]
+    row = 0
+    window: List[Chunk] = []
+
+    with (out_dir / EMB_FILE).open("ab") as emb_f, (out_dir / CHUNKS_FILE).open("a", encoding="utf-8") as chunks_f:
+        def flush():
+            emb = encoder.encode([c.text for c in window])
+            emb_f.write(emb.tobytes())
+            for c in window:
+                rec = asdict(c)
+                rec.pop("refs")  # final refs are only known at the end, see write_metadata
+                chunks_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            emb_f.flush()
+            chunks_f.flush()
+            state["rows_done"] += len(window)
+            state["dim"] = int(emb.shape[1])
+            _save_state(out_dir, state)
+            print(f"Embedded {state['rows_done']} chunks")
+            window.clear()
+
+        for c in chunks:
+            row += 1
+            if row <= rows_done:
+                continue
+            window.append(c)
+            if len(window) >= EMBED_WINDOW:
+                flush()
+        if window:
+            flush()
+
+    return row
+
+
+def write_faiss(out_dir: Path, rows: int, dim: int, batch: int = 65536) -> Path:
+    emb = np.memmap(out_dir / EMB_FILE, dtype="float32", mode="r", shape=(rows, dim))
+    index = faiss.IndexFlatIP(dim)  # cosine via normalized inner product
+    for i in range(0, rows, batch):
+        index.add(np.ascontiguousarray(emb[i:i + batch]))
+    index_path = out_dir / "faiss.index"
     faiss.write_index(index, str(index_path))
-    meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return index_path
+
+
+def write_metadata(out_dir: Path, refs: List[List[Dict[str, Any]]]) -> Path:
+    """
+    Streams chunks.jsonl into metadata.json, attaching the final duplicate refs per row.
+    """
+    meta_path = out_dir / "metadata.json"
+    tmp = out_dir / "metadata.json.tmp"
+    with (out_dir / CHUNKS_FILE).open(encoding="utf-8") as src, tmp.open("w", encoding="utf-8") as dst:
+        dst.write("[\n")
+        for i, line in enumerate(src):
+            rec = json.loads(line)
+            rec["refs"] = refs[i]
+            dst.write((",\n" if i else "") + json.dumps(rec, ensure_ascii=False))
+        dst.write("\n]\n")
+    os.replace(tmp, meta_path)
+    return meta_path
+
+
+def iter_chunk_texts(out_dir: Path) -> Iterator[str]:
+    with (out_dir / CHUNKS_FILE).open(encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)["text"]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build the RAG index (FAISS + BM25) from app/data/rag_data")
+    parser.add_argument("--workers", type=int, default=1, help="embedding processes (default: in-process)")
+    parser.add_argument("--fresh", action="store_true", help="ignore a previous interrupted build")
+    parser.add_argument(
+        "--if-changed", action="store_true",
+        help="do nothing when no scrape changed a page since the last build",
+    )
+    args = parser.parse_args(argv)
+    # Pages changed by a crawl that finishes while this build runs are picked up by the next one
+    started_at = time.time()
+
+    prev = _read_state(OUT_DIR)
+    prev_complete = bool(prev and prev.get("complete") and prev.get("params") == _build_params())
+    if args.if_changed and prev_complete:
+        manifest = load_change_manifest(CHANGE_MANIFEST)
+        if manifest is not None and not changed_since(manifest, prev.get("built_at", 0)):
+            print("Index is up to date with the last scrape, nothing to do")
+            return
+
+    print(f"Loading documents from: {DATA_DIR.resolve()}")
+    if not any(p.is_file() for p in DATA_DIR.rglob("*")):
+        raise SystemExit(f"No documents found. Put .txt/.md in path: {DATA_DIR.resolve()}")
+
+    catalog = load_catalog_metadata(CATALOG_CSV)
+    print(f"Loaded catalog metadata for {len(catalog)} regulations")
+
+    state = _load_state(OUT_DIR, args.fresh)
+    if state["rows_done"] == 0:
+        if prev_complete and not args.fresh and (OUT_DIR / EMB_FILE).exists():
+            os.replace(OUT_DIR / EMB_FILE, OUT_DIR / PREV_EMB_FILE)
+            os.replace(OUT_DIR / CHUNKS_FILE, OUT_DIR / PREV_CHUNKS_FILE)
+            state["prev_dim"] = prev["dim"]
+        else:
+            state["prev_dim"] = None
+        for name in (EMB_FILE, CHUNKS_FILE):
+            (OUT_DIR / name).unlink(missing_ok=True)
+        (OUT_DIR / CHUNKS_FILE).touch()
+    else:
+        print(f"Resuming: {state['rows_done']} chunks already embedded")
+        _truncate_to_rows(OUT_DIR, state["rows_done"], state["dim"])
+    state["complete"] = False
+
+    reuse = None
+    if state.get("prev_dim") and (OUT_DIR / PREV_EMB_FILE).exists():
+        reuse = VectorReuse(OUT_DIR, state["prev_dim"])
+        print(f"Reusing vectors of {len(reuse.rows)} unchanged chunks from the previous build")
+
+    print(f"Loading embedding model: {EMBED_MODEL_NAME} ({EMBED_BACKEND})")
+    model = load_encoder(EMBED_MODEL_NAME)
+
+    # Chunking is cheap and deterministic, so a resumed run re-chunks from the start
+    # (restoring dedup state) and only skips the embedding of rows already on disk.
+    deduper = ChunkDeduper()
+    encoder = WindowEncoder(model, args.workers, reuse)
+    try:
+        rows = embed_stream(iter_unique_chunks(iter_documents(DATA_DIR), catalog, deduper), encoder, OUT_DIR, state)
+    finally:
+        encoder.close()
+
+    n_merged = sum(len(r) for r in deduper.refs) - rows
+    print(f"Total chunks: {rows} ({n_merged} near-duplicates merged)")
+    if reuse is not None:
+        # Counts of this run only: rows of an interrupted run were neither encoded nor reused here
+        print(f"Re-embedded {encoder.encoded} chunks, reused {reuse.hits}")
+    if rows == 0:
+        raise SystemExit("No chunks produced")
+
+    dim = state["dim"] or model.get_sentence_embedding_dimension()
+    index_path = write_faiss(OUT_DIR, rows, dim)
+    meta_path = write_metadata(OUT_DIR, deduper.refs)
+
+    print("Building BM25 index...")
+    stats = build_bm25(iter_chunk_texts(OUT_DIR), OUT_DIR / BM25_DIRNAME)
+
+    state["complete"] = True
+    state["built_at"] = started_at
+    _save_state(OUT_DIR, state)
+    if reuse is not None:
+        del reuse
+        for name in (PREV_EMB_FILE, PREV_CHUNKS_FILE):
+            (OUT_DIR / name).unlink(missing_ok=True)
 
     print(f"Saved index: {index_path.resolve()}")
     print(f"Saved metadata: {meta_path.resolve()}")
+    print(f"Saved BM25 index: {(OUT_DIR / BM25_DIRNAME).resolve()} ({stats['n_docs']} docs)")
 
 
 if __name__ == "__main__":
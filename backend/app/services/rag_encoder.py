@@ -0,0 +1,179 @@
+"""
+rag_encoder.py
+
+Sentence embedding backends for RAG queries (rag_retrival) and index builds (rag_embedding),
+selected with RAG_EMBED_BACKEND:
+
+  torch      SentenceTransformer in full precision (default)
+  onnx       the same model exported to ONNX, run with ONNX Runtime on CPU
+  onnx-int8  the ONNX export with int8 dynamic quantisation of the linear layers
+
+The ONNX backends only need onnxruntime + tokenizers at runtime (no torch import, which
+also shortens worker start-up). The export needs torch + sentence-transformers once:
+    python -m app.services.rag_encoder --export
+
+Both ONNX encoders mirror all-MiniLM-L6-v2's pipeline (mean pooling over the attention
+mask, then L2 normalisation), so queries encoded with them can search an index built with
+torch. benchmarks/bench_embed.py checks parity (cosine to the torch vectors, top-k overlap)
+and measures latency/throughput per backend.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch")
+# 0 = let ONNX Runtime pick (one thread per physical core)
+ONNX_THREADS = int(os.getenv("RAG_ONNX_THREADS", "0"))
+ONNX_DIR = Path(__file__).resolve().parents[1] / "data" / "embed_onnx"
+
+MODEL_FILE = "model.onnx"
+MODEL_INT8_FILE = "model.int8.onnx"
+META_FILE = "encoder.json"
+
+
+def onnx_model_dir(model_name: str, root: Path = ONNX_DIR) -> Path:
+    return root / model_name.replace("/", "__")
+
+
+class OnnxEncoder:
+    """
+    encode() / get_sentence_embedding_dimension() compatible subset of SentenceTransformer.
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = False, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = model_dir / (MODEL_INT8_FILE if quantized else MODEL_FILE)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"{path} not found. Run `python -m app.services.rag_encoder --export` first."
+            )
+        meta = json.loads((model_dir / META_FILE).read_text(encoding="utf-8"))
+        self.dim: int = meta["dim"]
+        self.normalize: bool = meta["normalize"]
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=meta["pad_id"], pad_token=meta["pad_token"])
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12
+        return emb.astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        """
+        Accepts (and ignores) SentenceTransformer's convert_to_numpy / show_progress_bar.
+        Texts are batched by length, like SentenceTransformer does, to keep padding low.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        return out
+
+
+def load_encoder(model_name: str, backend: Optional[str] = None):
+    backend = backend or EMBED_BACKEND
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {EMBED_BACKENDS})")
+    if backend == "torch":
+        # Imported here: pulling in torch costs seconds, and the ONNX backends do not need it
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    return OnnxEncoder(onnx_model_dir(model_name), quantized=backend == "onnx-int8")
+
+
+# ----------------------------
+# Export (build time, needs torch)
+# ----------------------------
+def export_onnx(model_name: str, out_dir: Optional[Path] = None, quantize: bool = True) -> Path:
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    out_dir = out_dir or onnx_model_dir(model_name)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    hf_model, hf_tokenizer = transformer.auto_model.eval(), transformer.tokenizer
+    hf_tokenizer.save_pretrained(str(out_dir))  # writes tokenizer.json for the fast tokenizer
+
+    sample = hf_tokenizer(["Bijzondere bijstand voor alleenstaande ouders"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        torch.onnx.export(
+            hf_model,
+            tuple(sample[n] for n in names),
+            str(out_dir / MODEL_FILE),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(out_dir / MODEL_FILE), str(out_dir / MODEL_INT8_FILE), weight_type=QuantType.QInt8)
+
+    meta = {
+        "model_name": model_name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "normalize": any(isinstance(m, Normalize) for m in st),
+        "pad_id": hf_tokenizer.pad_token_id,
+        "pad_token": hf_tokenizer.pad_token,
+    }
+    (out_dir / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    print(f"Exported {model_name} -> {out_dir}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    from app.services.rag_retrival import EMBED_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Export the RAG embedding model to ONNX (+ int8)")
+    parser.add_argument("--export", action="store_true")
+    parser.add_argument("--model", default=EMBED_MODEL_NAME)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+    if args.export:
+        export_onnx(args.model, quantize=not args.no_quantize)
+    else:
+        parser.print_help()
@@ -0,0 +1,248 @@
+"""
+rag_lexical.py
+
+BM25 inverted index over the RAG chunks.
+
+The dense MiniLM embeddings are weak on exact Dutch legal terms
+("bijzondere bijstand", "individuele inkomenstoeslag", article numbers), so
+rag_embedding also writes a lexical index next to faiss.index. Row i of the
+lexical index is row i of the FAISS index / metadata.json.
+
+On-disk layout (directory, every array is loaded with mmap):
+  terms.json        sorted vocabulary (term id = position)
+  offsets.npy       int64[V + 1]  posting list of term t is [offsets[t], offsets[t+1])
+  postings_doc.npy  int32[P]      doc ids, ascending per term
+  postings_tf.npy   uint16[P]     term frequency per posting
+  doc_len.npy       int32[N]      tokens per doc
+  stats.json        n_docs, avgdl, k1, b, build_id (written last)
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+BM25_DIRNAME = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# stats.json last: its build_id marks a complete set of files
+BM25_FILES = ("terms.json", "offsets.npy", "postings_doc.npy", "postings_tf.npy", "doc_len.npy", "stats.json")
+LOAD_ATTEMPTS = 5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Small list on purpose: legal terms and numbers must survive.
+STOPWORDS = {
+    "de", "het", "een", "en", "van", "in", "op", "te", "voor", "met", "is", "die", "dat",
+    "of", "aan", "als", "bij", "door", "om", "tot", "wordt", "worden", "zijn", "naar",
+    "dan", "deze", "dit", "er", "ook", "niet", "kan", "uit", "over", "onder",
+    "the", "a", "an", "and", "of", "to", "for", "is", "are", "what", "how", "can", "i",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+# ----------------------------
+# Build
+# ----------------------------
+def build_bm25(texts: Iterable[str], out_dir: Path, k1: float = BM25_K1, b: float = BM25_B) -> Dict[str, Any]:
+    """
+    Builds the posting lists for `texts` (doc id = position) and writes them to out_dir.
+    """
+    return build_bm25_from_counts((Counter(tokenize(t)) for t in texts), out_dir, k1, b)
+
+
+def build_bm25_from_counts(
+    doc_counts: Iterable[Dict[str, int]],
+    out_dir: Path,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+    build_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Same as build_bm25 for already tokenised docs ({term: tf} per doc), so incremental
+    builders can cache term counts of unchanged documents.
+
+    Running processes keep the previous files memory-mapped, so nothing is overwritten in
+    place: the files are written to a temp directory and moved in with os.replace,
+    stats.json (with build_id) last. BM25Index checks build_id to never mix two builds.
+    """
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_len: List[int] = []
+
+    for doc_id, counts in enumerate(doc_counts):
+        doc_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, min(tf, 65535)))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, t in enumerate(terms):
+        offsets[i + 1] = offsets[i] + len(postings[t])
+
+    p_doc = np.empty(int(offsets[-1]), dtype=np.int32)
+    p_tf = np.empty(int(offsets[-1]), dtype=np.uint16)
+    for i, t in enumerate(terms):
+        lst = postings[t]
+        p_doc[offsets[i]:offsets[i + 1]] = [d for d, _ in lst]
+        p_tf[offsets[i]:offsets[i + 1]] = [f for _, f in lst]
+
+    n_docs = len(doc_len)
+    stats = {
+        "n_docs": n_docs,
+        "avgdl": (sum(doc_len) / n_docs) if n_docs else 0.0,
+        "k1": k1,
+        "b": b,
+        "build_id": build_id or uuid.uuid4().hex,
+    }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    (tmp / "terms.json").write_text(json.dumps(terms, ensure_ascii=False), encoding="utf-8")
+    np.save(tmp / "offsets.npy", offsets)
+    np.save(tmp / "postings_doc.npy", p_doc)
+    np.save(tmp / "postings_tf.npy", p_tf)
+    np.save(tmp / "doc_len.npy", np.asarray(doc_len, dtype=np.int32))
+    (tmp / "stats.json").write_text(json.dumps(stats), encoding="utf-8")
+    for name in BM25_FILES:
+        os.replace(tmp / name, out_dir / name)
+    tmp.rmdir()
+    return stats
+
+
+# ----------------------------
+# Query
+# ----------------------------
+def _build_id(index_dir: Path) -> Optional[str]:
+    return json.loads((index_dir / "stats.json").read_text(encoding="utf-8")).get("build_id")
+
+
+class BM25Index:
+    def __init__(self, index_dir: Path):
+        # A rebuild may swap files while they are opened here: load until stats.json (moved
+        # in last) shows the same build before and after
+        for _ in range(LOAD_ATTEMPTS):
+            build_id = _build_id(index_dir)
+            self._load(index_dir)
+            if build_id == _build_id(index_dir):
+                break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError(f"BM25 index in {index_dir} kept changing while loading")
+
+    def _load(self, index_dir: Path) -> None:
+        self.terms: List[str] = json.loads((index_dir / "terms.json").read_text(encoding="utf-8"))
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.terms)}
+        self.offsets = np.load(index_dir / "offsets.npy", mmap_mode="r")
+        self.p_doc = np.load(index_dir / "postings_doc.npy", mmap_mode="r")
+        self.p_tf = np.load(index_dir / "postings_tf.npy", mmap_mode="r")
+        self.doc_len = np.load(index_dir / "doc_len.npy", mmap_mode="r")
+
+        stats = json.loads((index_dir / "stats.json").read_text(encoding="utf-8"))
+        self.build_id: Optional[str] = stats.get("build_id")
+        self.n_docs = int(stats["n_docs"])
+        self.k1 = float(stats["k1"])
+        self.b = float(stats["b"])
+        avgdl = float(stats["avgdl"]) or 1.0
+        # Per-doc length normalisation is query independent, precompute once.
+        self._norm = (self.k1 * (1.0 - self.b + self.b * np.asarray(self.doc_len, dtype=np.float32) / avgdl)).astype(np.float32)
+
+    @classmethod
+    def exists(cls, index_dir: Path) -> bool:
+        return (index_dir / "stats.json").exists()
+
+    def terms_with_prefix(self, prefix: str) -> List[int]:
+        """
+        Term ids starting with prefix ("kind" -> kind, kinderen, kindgebonden, ...); terms are sorted.
+        """
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\uffff")
+        return list(range(lo, hi))
+
+    def docs_with_term(self, tid: int) -> np.ndarray:
+        return self.p_doc[int(self.offsets[tid]):int(self.offsets[tid + 1])]
+
+    def docs_matching_prefixes(self, prefixes: Iterable[str], min_tf: int = 1, min_share: float = 0.0) -> np.ndarray:
+        """
+        Sorted ids of docs containing terms that start with one of the prefixes, at least
+        min_tf times in total and as at least min_share of the doc's tokens.
+        """
+        # "kind" also covers "kinderen": count each term once
+        tids = sorted({t for p in prefixes for t in self.terms_with_prefix(p.lower())})
+        if not tids:
+            return np.empty(0, dtype=np.int32)
+        docs = np.concatenate([self.docs_with_term(t) for t in tids])
+        if min_tf <= 1 and min_share <= 0.0:
+            return np.unique(docs)
+        tf = np.concatenate([self.p_tf[int(self.offsets[t]):int(self.offsets[t + 1])] for t in tids])
+        total = np.bincount(docs, weights=tf, minlength=self.n_docs)
+        keep = (total >= min_tf) & (total >= min_share * np.asarray(self.doc_len, dtype=np.float64))
+        return np.flatnonzero(keep).astype(np.int32)
+
+    def idf(self, term: str) -> float:
+        """
+        BM25 idf of a term; 0.0 when the term is not in the index.
+        """
+        tid = self.term_ids.get(term)
+        if tid is None:
+            return 0.0
+        df = int(self.offsets[tid + 1]) - int(self.offsets[tid])
+        return float(np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5)))
+
+    def search(self, query: str, top_k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Returns [(doc_id, bm25_score)] best first. Docs without any query term are not returned.
+        `allowed` (sorted doc ids) restricts the result to a metadata-filtered subset.
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        hit = False
+        for term in set(tokenize(query)):
+            tid = self.term_ids.get(term)
+            if tid is None:
+                continue
+            lo, hi = int(self.offsets[tid]), int(self.offsets[tid + 1])
+            docs = self.p_doc[lo:hi]
+            tf = self.p_tf[lo:hi].astype(np.float32)
+            df = hi - lo
+            idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+            # doc ids are unique within one posting list, so fancy-index += is safe
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + self._norm[docs])
+            hit = True
+
+        if not hit:
+            return []
+
+        ids = np.arange(self.n_docs) if allowed is None else allowed
+        sub = scores[ids]
+        k = min(top_k, len(ids))
+        if k == 0:
+            return []
+        top = np.argpartition(-sub, k - 1)[:k]
+        top = top[np.argsort(-sub[top])]
+        return [(int(ids[i]), float(sub[i])) for i in top if sub[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuses several ranked id lists: score(d) = sum 1 / (k + rank_d).
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
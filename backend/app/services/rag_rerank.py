@@ -0,0 +1,144 @@
+"""
+rag_rerank.py
+
+Optional second stage after FAISS/BM25 retrieval: over-fetch candidates, rescore them
+with a small local CPU reranker and keep the best ones that fit a token budget.
+
+Backends:
+  cross  - multilingual MiniLM cross-encoder (sentence-transformers CrossEncoder)
+  overlap - query/chunk term overlap on the BM25 tokenizer, no model; also the fallback
+            when the cross-encoder is not installed
+
+The rerank stage has a latency budget, capped by what is left of the request deadline:
+candidates are scored in small batches and once the budget is spent the unscored rest keeps
+its retrieval order behind the scored ones.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services import llm_guard
+from app.services.rag_lexical import tokenize
+
+RERANK_MODEL_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+# "" / "0" disables the stage, "1" / "cross" uses the cross-encoder, "overlap" the model-free scorer
+RERANK_BACKEND = os.getenv("RAG_RERANK", "")
+RERANK_FETCH_K = int(os.getenv("RAG_RERANK_FETCH_K", "50"))
+RERANK_BUDGET_MS = float(os.getenv("RAG_RERANK_BUDGET_MS", "300"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+RERANK_BATCH = 16
+# Cross-encoder input is truncated anyway; no point tokenising whole chunks
+MAX_QUERY_CHARS = 1000
+MAX_PASSAGE_CHARS = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token for Dutch/English BPE vocabularies; good enough for budgeting
+    return max(1, len(text) // 4)
+
+
+def overlap_score(query_terms: set, text: str) -> float:
+    terms = set(tokenize(text))
+    if not query_terms or not terms:
+        return 0.0
+    return len(query_terms & terms) / len(query_terms)
+
+
+def fit_token_budget(hits: List[Dict[str, Any]], top_n: int, token_budget: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    Keeps hits in order until top_n or the token budget is reached. The first hit is always kept.
+    """
+    out: List[Dict[str, Any]] = []
+    used = 0
+    for h in hits:
+        if len(out) >= top_n:
+            break
+        cost = estimate_tokens(h.get("text", "") or "")
+        if out and token_budget is not None and used + cost > token_budget:
+            continue
+        out.append(h)
+        used += cost
+    return out
+
+
+class Reranker:
+    def __init__(self, backend: str = "cross", model_name: str = RERANK_MODEL_NAME):
+        self.backend = backend
+        self.model = None
+        if backend == "cross":
+            try:
+                from sentence_transformers import CrossEncoder
+                self.model = CrossEncoder(model_name, device="cpu", max_length=512)
+            except Exception as e:  # missing package / no model download
+                print(f"Cross-encoder unavailable ({e}); reranking with term overlap")
+                self.backend = "overlap"
+
+    def _score_batch(self, query: str, query_terms: set, batch: List[Dict[str, Any]]) -> List[float]:
+        if self.model is None:
+            return [overlap_score(query_terms, h.get("text", "") or "") for h in batch]
+        pairs = [(query[:MAX_QUERY_CHARS], (h.get("text", "") or "")[:MAX_PASSAGE_CHARS]) for h in batch]
+        return [float(s) for s in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+
+    def rerank(
+        self,
+        query: str,
+        hits: List[Dict[str, Any]],
+        *,
+        top_n: int,
+        token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET,
+        budget_ms: float = RERANK_BUDGET_MS,
+    ) -> List[Dict[str, Any]]:
+        """
+        hits: retrieval output, best first. Returns at most top_n hits with a "rerank_score".
+        """
+        if not hits:
+            return []
+        budget_s = budget_ms / 1000.0
+        left = llm_guard.remaining()
+        if left is not None:
+            budget_s = min(budget_s, left)
+        deadline = time.perf_counter() + budget_s
+        query_terms = set(tokenize(query))
+
+        scored: List[Dict[str, Any]] = []
+        i = 0
+        # Checked before every batch, the first included: a spent budget keeps retrieval order
+        while i < len(hits) and time.perf_counter() < deadline:
+            batch = hits[i:i + RERANK_BATCH]
+            for h, s in zip(batch, self._score_batch(query, query_terms, batch)):
+                scored.append({**h, "rerank_score": s})
+            i += len(batch)
+
+        scored.sort(key=lambda h: h["rerank_score"], reverse=True)
+        # Out of time: unscored candidates keep their retrieval order behind the scored ones
+        ranked = scored + hits[i:]
+        return fit_token_budget(ranked, top_n, token_budget)
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker(backend: Optional[str] = None) -> Optional[Reranker]:
+    """
+    Process-wide reranker for the configured backend, or None when reranking is disabled.
+    """
+    global _reranker
+    backend = RERANK_BACKEND if backend is None else backend
+    if backend in ("", "0", "false", "off"):
+        return None
+    if backend == "1":
+        backend = "cross"
+    current = _reranker
+    if current is not None and current.backend in (backend, "overlap"):
+        return current
+    # Loading the cross-encoder takes seconds: concurrent first requests wait for one load
+    with _reranker_lock:
+        if _reranker is None or _reranker.backend not in (backend, "overlap"):
+            _reranker = Reranker(backend)
+        return _reranker
@@ -1,24 +1,33 @@
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
+from app.services import metrics
+from app.services.rag_encoder import load_encoder
+from app.services.rag_lexical import BM25Index, BM25_DIRNAME, reciprocal_rank_fusion, tokenize
+from app.services.build_index import get_knowledge_index
+
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 INDEX_DIR = BASE_DIR / "app" / "data" / "rag_index"
 EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K_DEFAULT = 5
+# Each side of a hybrid search fetches this many candidates before fusion
+HYBRID_FETCH_K = 50
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+# Chunk metadata fields rag_search can filter on (see rag_embedding.Chunk)
+FILTER_FIELDS = ("municipality", "year", "category", "cvdr_id")
 
 def l2_normalize(x: np.ndarray) -> np.ndarray:
     norm = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
     return x / norm
 
+def _facet_value(v: Any) -> str:
+    return " ".join(str(v).strip().lower().replace("gemeente ", "").split())
+
 
 class RAGRetriever:
     def __init__(self, index_dir: Path, embed_model_name: str):
@@ -35,33 +44,167 @@ class RAGRetriever:
             meta_path.read_text(encoding="utf-8")
         )
 
-        self.model = SentenceTransformer(embed_model_name)
+        # torch (SentenceTransformer) or ONNX Runtime, per RAG_EMBED_BACKEND; see rag_encoder.py
+        self.model = load_encoder(embed_model_name)
+
+        # Optional: older indexes were built without the lexical side
+        bm25_dir = index_dir / BM25_DIRNAME
+        self.bm25: Optional[BM25Index] = BM25Index(bm25_dir) if BM25Index.exists(bm25_dir) else None
+
+        self.facets = self._build_facets(self.meta)
+        self._by_id: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def _build_facets(meta: List[Dict[str, Any]]) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        field -> normalised value -> sorted chunk ids. Built once so filters cost a dict lookup.
+        """
+        acc: Dict[str, Dict[str, List[int]]] = {f: {} for f in FILTER_FIELDS}
+        for idx, m in enumerate(meta):
+            # Deduplicated chunks carry every source they were found in
+            for ref in m.get("refs") or [m]:
+                for f in FILTER_FIELDS:
+                    v = ref.get(f)
+                    if v is None or v == "":
+                        continue
+                    ids = acc[f].setdefault(_facet_value(v), [])
+                    if not ids or ids[-1] != idx:
+                        ids.append(idx)
+        return {
+            f: {v: np.asarray(ids, dtype=np.int64) for v, ids in values.items()}
+            for f, values in acc.items()
+        }
+
+    def _allowed_ids(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Resolves {field: value | [values]} to the sorted chunk ids matching ALL fields
+        (any of the values within a field). None means "no filter".
+        """
+        if not filters:
+            return None
+        allowed: Optional[np.ndarray] = None
+        for field, value in filters.items():
+            if value is None or value == "" or value == []:
+                continue
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter field: {field}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            parts = [self.facets[field].get(_facet_value(v)) for v in values]
+            ids = np.unique(np.concatenate([p for p in parts if p is not None] or [np.empty(0, dtype=np.int64)]))
+            allowed = ids if allowed is None else np.intersect1d(allowed, ids, assume_unique=True)
+        return allowed
+
+    def _dense_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        with metrics.stage("embed"):
+            q = self.model.encode([query], convert_to_numpy=True).astype("float32")
+        q = l2_normalize(q)
+
+        with metrics.stage("faiss_search"):
+            if allowed is None:
+                scores, ids = self.index.search(q, k)
+            else:
+                # The ID selector is applied inside the scan, so k results all come from the subset
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed))
+                scores, ids = self.index.search(q, min(k, len(allowed)), params=params)
+        return [(idx, float(score)) for score, idx in zip(scores[0].tolist(), ids[0].tolist()) if idx >= 0]
+
+    def _lexical_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        if self.bm25 is None:
+            return self._page_lexical_search(query, k, allowed)
+        return self.bm25.search(query, k, allowed=allowed)
+
+    def _page_lexical_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Fallback for indexes built without chunk-level BM25: rank pages with the knowledge
+        index (build_index.py), then score each chunk of those pages by the share of the
+        query's idf weight it contains. Chunks without any query term are left out.
+        """
+        knowledge = get_knowledge_index()
+        if knowledge is None:
+            return []
+        allowed_set = set(allowed.tolist()) if allowed is not None else None
+        cvdr_ids = None
+        if allowed_set is not None:
+            cvdr_ids = {str(self.meta[i].get("cvdr_id")) for i in allowed_set if self.meta[i].get("cvdr_id")}
+        weights = {t: knowledge.bm25.idf(t) for t in set(tokenize(query))}
+        total = sum(weights.values())
+        if total <= 0.0:
+            return []
+        out: List[Tuple[int, float]] = []
+        for page in knowledge.search(query, k, cvdr_ids=cvdr_ids):
+            # A chunk never scores above its page, so later pages cannot beat a full top k
+            if len(out) >= k and page["score"] <= out[k - 1][1]:
+                break
+            ids = self.facets["cvdr_id"].get(_facet_value(page.get("cvdr_id") or ""), [])
+            for idx in ids:
+                if allowed_set is not None and int(idx) not in allowed_set:
+                    continue
+                terms = set(tokenize(self.meta[int(idx)].get("text", "")))
+                share = sum(w for t, w in weights.items() if t in terms) / total
+                if share > 0.0:
+                    out.append((int(idx), page["score"] * share))
+            out.sort(key=lambda x: x[1], reverse=True)
+        return out[:k]
 
     def rag_search(self, data: dict) -> List[Dict[str, Any]]:
+        """
+        data:
+          query: search string
+          top_k: number of hits (default 5)
+          mode: "dense" | "lexical" | "hybrid" (default hybrid; dense when no lexical index exists)
+          filters: optional {field: value | [values]} on municipality / year / category / cvdr_id,
+                   applied inside the search so top_k hits all match
+        """
         query = (data.get("query") or "").strip()
         top_k = int(data.get("top_k") or TOP_K_DEFAULT)
+        mode = data.get("mode") or "hybrid"
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if mode != "dense" and self.bm25 is None and get_knowledge_index() is None:
+            mode = "dense"
 
         if not query:
             return []
 
-        q = self.model.encode([query], convert_to_numpy=True).astype("float32")
-        q = l2_normalize(q)
-
-        scores, ids = self.index.search(q, top_k)
-        out: List[Dict[str, Any]] = []
-
-        for score, idx in zip(scores[0].tolist(), ids[0].tolist()):
-            if idx < 0:
-                continue
-            m = self.meta[idx]
-            out.append({
-                "score": float(score),
-                "source": m.get("source", ""),
-                "chunk_id": m.get("id", ""),
-                "text": m.get("text", ""),
-            })
+        allowed = self._allowed_ids(data.get("filters"))
+        if allowed is not None and len(allowed) == 0:
+            return []
 
-        return out
+        if mode == "dense":
+            ranked = self._dense_search(query, top_k, allowed)
+        elif mode == "lexical":
+            ranked = self._lexical_search(query, top_k, allowed)
+        else:
+            fetch_k = max(top_k, HYBRID_FETCH_K)
+            dense = self._dense_search(query, fetch_k, allowed)
+            with metrics.stage("lexical_search"):
+                lexical = self._lexical_search(query, fetch_k, allowed)
+            ranked = reciprocal_rank_fusion([
+                [i for i, _ in dense],
+                [i for i, _ in lexical],
+            ])[:top_k]
+
+        return [{"score": float(score), **self._hit(idx)} for idx, score in ranked]
+
+    def _hit(self, idx: int) -> Dict[str, Any]:
+        m = self.meta[idx]
+        return {
+            "source": m.get("source", ""),
+            "chunk_id": m.get("id", ""),
+            "text": m.get("text", ""),
+            "municipality": m.get("municipality"),
+            "cvdr_id": m.get("cvdr_id"),
+            "refs": m.get("refs", []),
+        }
+
+    def chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A search hit by chunk_id, without score (compact /chat responses send only the ids).
+        """
+        if self._by_id is None:
+            self._by_id = {m.get("id"): idx for idx, m in enumerate(self.meta)}
+        idx = self._by_id.get(chunk_id)
+        return None if idx is None else self._hit(idx)
 
 
 RAG_SEARCH_TOOL = {
@@ -74,6 +217,7 @@ RAG_SEARCH_TOOL = {
             "properties": {
                 "query": {"type": "string", "description": "The search query string for the rag search."},
                 "top_k": {"type": "integer", "default": 5},
+                "mode": {"type": "string", "enum": list(SEARCH_MODES), "default": "hybrid"},
             },
             "required": ["query"],
         },
@@ -149,6 +293,11 @@ def run_chat():
 
 
 if __name__ == "__main__":
+    import os
+
+    from dotenv import load_dotenv
+    from openai import OpenAI
+
     load_dotenv()
     GREENPT_API_KEY = os.getenv("GREENPT_API_KEY")
 
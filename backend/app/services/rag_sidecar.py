@@ -0,0 +1,188 @@
+"""
+rag_sidecar.py
+
+Embedding + search sidecar: one process holds the SentenceTransformer model, the FAISS
+index and the chunk metadata, and every uvicorn worker on the box queries it over a Unix
+socket. Without it each worker loads its own copy of the model, index and metadata, which
+multiplies that memory by the worker count.
+
+All searches are serialised by one lock (search_lock in _make_handler): one encode + FAISS
+search runs at a time, whichever worker sent it. A search waits for every search queued
+ahead of it, so under concurrent load the RAG latency grows with the number of workers
+(and their threads) sending requests; REQUEST_TIMEOUT_S bounds that wait on the client.
+
+Protocol: one JSON object per line in each direction.
+    request   {"op": "rag_search", "data": {...rag_search args...}}  |  {"op": "ping"}
+              {"op": "chunk", "data": {"chunk_id": "..."}}
+    response  {"ok": true, "result": ...}  |  {"ok": false, "error": "..."}
+
+Deployment (run from backend/):
+    python -m app.services.rag_sidecar --socket /tmp/hulpwijzer-rag.sock &
+    RAG_SIDECAR_SOCKET=/tmp/hulpwijzer-rag.sock uvicorn app.main:app --workers 4
+
+With RAG_SIDECAR_SOCKET set, llm.get_rag() returns a RemoteRetriever instead of loading
+the index in the worker. benchmarks/bench_worker_memory.py measures RSS per worker in
+both modes; run it on the target host, the saving depends on the model and corpus size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SOCKET = "/tmp/hulpwijzer-rag.sock"
+CONNECT_TIMEOUT_S = 5.0
+# Requests may queue behind other workers' searches; generous, but not unbounded
+REQUEST_TIMEOUT_S = float(os.getenv("RAG_SIDECAR_TIMEOUT_S", "30"))
+
+
+class SidecarError(RuntimeError):
+    pass
+
+
+# Failures that happen before the request is written
+_NOT_SENT = (ConnectionRefusedError, FileNotFoundError, BrokenPipeError, ConnectionResetError)
+
+
+# -----------------------------
+# Server
+# -----------------------------
+def _make_handler(retriever):
+    # faiss and torch release the GIL, but one encode at a time keeps CPU use predictable.
+    # This serialises every worker's searches: latency grows with the number of workers
+    search_lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    req = json.loads(line)
+                    op = req.get("op")
+                    if op == "ping":
+                        result: Any = {"chunks": len(retriever.meta)}
+                    elif op == "rag_search":
+                        with search_lock:
+                            result = retriever.rag_search(req.get("data") or {})
+                    elif op == "chunk":
+                        result = retriever.chunk((req.get("data") or {}).get("chunk_id", ""))
+                    else:
+                        raise ValueError(f"Unknown op: {op}")
+                    resp = {"ok": True, "result": result}
+                except Exception as e:
+                    resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    return Handler
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, retriever=None) -> None:
+    if retriever is None:
+        from app.services.rag_retrival import RAGRetriever, INDEX_DIR, EMBED_MODEL_NAME
+
+        retriever = RAGRetriever(index_dir=INDEX_DIR, embed_model_name=EMBED_MODEL_NAME)
+    path = Path(socket_path)
+    if path.exists():
+        path.unlink()
+    with _Server(str(path), _make_handler(retriever)) as server:
+        print(f"RAG sidecar serving {len(retriever.meta)} chunks on {path}")
+        server.serve_forever()
+
+
+# -----------------------------
+# Client
+# -----------------------------
+class RemoteRetriever:
+    """
+    Drop-in for RAGRetriever.rag_search in the web workers. One connection per thread
+    (FastAPI runs sync endpoints in a thread pool); reconnects once when a request could not
+    be sent, never after it was (a timed-out search would only queue again).
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT_S)
+            sock.connect(self.socket_path)
+            sock.settimeout(REQUEST_TIMEOUT_S)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _call(self, op: str, data: Optional[Dict[str, Any]] = None) -> Any:
+        payload = json.dumps({"op": op, "data": data}, ensure_ascii=False).encode("utf-8") + b"\n"
+        for attempt in range(2):
+            try:
+                sock, rfile = self._conn()
+                sock.sendall(payload)
+            except _NOT_SENT as e:
+                # Nothing reached the sidecar (not listening, or it closed our kept connection
+                # when it restarted): safe to try once more on a new connection
+                self._close()
+                if attempt:
+                    raise SidecarError(f"RAG sidecar at {self.socket_path} unavailable: {e}") from e
+                continue
+            except OSError as e:
+                self._close()
+                raise SidecarError(f"RAG sidecar at {self.socket_path} unavailable: {e}") from e
+            break
+        # Sent: the search is queued or running in the sidecar. A timeout or dropped
+        # connection now is not retried, that would queue the same search again
+        try:
+            line = rfile.readline()
+        except OSError as e:
+            self._close()
+            raise SidecarError(f"RAG sidecar at {self.socket_path} did not answer: {e}") from e
+        if not line:
+            self._close()
+            raise SidecarError(f"RAG sidecar at {self.socket_path} closed the connection")
+        resp = json.loads(line)
+        if not resp.get("ok"):
+            raise SidecarError(resp.get("error") or "sidecar error")
+        return resp["result"]
+
+    def ping(self) -> Dict[str, Any]:
+        return self._call("ping")
+
+    def rag_search(self, data: dict) -> List[Dict[str, Any]]:
+        return self._call("rag_search", data)
+
+    def chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        return self._call("chunk", {"chunk_id": chunk_id})
+
+
+def connect(socket_path: str) -> RemoteRetriever:
+    """
+    Client for a running sidecar; fails fast (so /ready shows it) when none is listening.
+    """
+    remote = RemoteRetriever(socket_path)
+    remote.ping()
+    return remote
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve RAG search to the web workers over a Unix socket")
+    parser.add_argument("--socket", default=os.getenv("RAG_SIDECAR_SOCKET") or DEFAULT_SOCKET)
+    serve(parser.parse_args().socket)
@@ -0,0 +1,91 @@
+"""
+resources.py
+
+Lazily loaded process-wide resources (LLM client, RAG retriever, subsidy catalog).
+
+Importing the app used to construct the OpenAI client, read the FAISS index and load the
+SentenceTransformer model as module side effects, so every worker boot and every import
+paid for them. Now each resource is registered with a loader and built on first use;
+main.py warms them in a background thread at startup and /ready reports their state.
+
+    register("rag", lambda: RAGRetriever(...))
+    rag = get("rag")          # loads once, thread-safe; later calls return the same object
+    warm(background=True)     # load everything registered, e.g. at startup
+    status()                  # {name: {"state", "load_s", "error"}}
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+@dataclass
+class Resource:
+    name: str
+    loader: Callable[[], Any]
+    # Not needed to serve /chat (e.g. optional indexes); /ready ignores failures of these
+    required: bool = True
+    state: str = "idle"  # idle | loading | ready | failed
+    value: Any = None
+    error: Optional[str] = None
+    load_s: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_registry: Dict[str, Resource] = {}
+
+
+def register(name: str, loader: Callable[[], Any], required: bool = True) -> None:
+    if name not in _registry:
+        _registry[name] = Resource(name, loader, required)
+
+
+def get(name: str) -> Any:
+    res = _registry[name]
+    if res.state == "ready":
+        return res.value
+    with res.lock:
+        if res.state != "ready":
+            res.state = "loading"
+            t0 = time.perf_counter()
+            try:
+                res.value = res.loader()
+            except Exception as e:
+                res.state, res.error = "failed", f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                res.load_s = round(time.perf_counter() - t0, 3)
+            res.state, res.error = "ready", None
+    return res.value
+
+
+def _warm(names: Iterable[str]) -> None:
+    for name in names:
+        try:
+            get(name)
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+
+
+def warm(names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+    names = list(names or _registry)
+    if not background:
+        _warm(names)
+        return None
+    t = threading.Thread(target=_warm, args=(names,), name="resource-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    return {
+        r.name: {"state": r.state, "required": r.required, "load_s": r.load_s, "error": r.error}
+        for r in _registry.values()
+    }
+
+
+def is_ready() -> bool:
+    return all(r.state == "ready" for r in _registry.values() if r.required)
@@ -0,0 +1,139 @@
+"""
+response_cache.py
+
+Persistent cache of LLM responses for chat_text / translate_text.
+
+Both are pure functions of (model, messages) at the provider's fixed temperature, and the
+same prompts come back often: the extraction prompt for common phrasings, the translation
+of the same explanation, identical follow-up questions. A hit returns the stored answer
+without contacting the provider.
+
+Storage is one SQLite file (WAL mode, so several workers can share it):
+
+    entries(key, value, size, created, accessed)
+
+- key: single_flight.request_key() of the call (model, messages, parameters)
+- TTL: entries older than LLM_CACHE_TTL_S are misses and get overwritten
+- size bound: when the values exceed LLM_CACHE_MAX_MB, least recently used entries are
+  deleted until 90% of the bound is left
+
+LLM_CACHE=0 disables it; callers opt out per call with cache=False.
+
+Personal data: keys are hashes, but the stored values are answers to prompts built from
+what users typed (the extraction of an intake answer, the explanation for a profile), kept
+for up to the TTL. The file is not part of the source tree (.gitignore) and should be
+treated like the session store. Follow-up answers, whose prompts carry the profile and the
+free-text question of one session, are not cached (chatbot._answer_followup).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.services import metrics, resources
+
+CACHE_PATH = Path(os.getenv(
+    "LLM_CACHE_PATH", str(Path(__file__).resolve().parents[1] / "storage" / "llm_cache.sqlite3")
+))
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+# Evict check every this many stores (SUM over the table is cheap, but not free)
+EVICT_EVERY = 50
+
+STATS = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+metrics.expose("llm_cache", STATS, "LLM response cache lookups, stores and evictions.")
+
+
+class ResponseCache:
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_BYTES, ttl_s: float = TTL_S):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._stores = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl_s:
+            STATS["misses"] += 1
+            return None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        STATS["hits"] += 1
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now),
+        )
+        STATS["stores"] += 1
+        self._stores += 1
+        if self._stores % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drops expired entries, then least recently used ones down to 90% of max_bytes.
+        """
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_s,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            freed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                if total - freed <= target:
+                    break
+                doomed.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            removed += len(doomed)
+        STATS["evicted"] += removed
+        return removed
+
+
+def _open_cache() -> Optional[ResponseCache]:
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    return ResponseCache()
+
+
+resources.register("llm_cache", _open_cache, required=False)
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """
+    The process-wide cache, or None when disabled or the file cannot be opened.
+    """
+    try:
+        return resources.get("llm_cache")
+    except Exception as e:
+        print(f"LLM response cache unavailable ({type(e).__name__}: {e})")
+        return None
@@ -0,0 +1,109 @@
+"""
+single_flight.py
+
+Coalescing of identical in-flight LLM calls.
+
+When several users with the same profile finish intake together, each ranks the same
+candidates with the same prompt; repeated follow-up questions produce identical chat_text
+prompts. do() runs the first of a set of identical calls (the leader) and lets the others
+(followers) wait for its result instead of sending their own request to the provider.
+
+Identity is request_key(): a hash over model, messages and sampling parameters. Only calls
+that overlap in time are merged; nothing is cached after the leader finishes. A leader's
+exception is raised in its followers as well, except when the leader ran out of its own
+request deadline (llm_guard.DeadlineExceeded): followers with time left then try again,
+one of them as the new leader.
+
+STATS counts leaders and followers per call site ("chat", "translate", "rank").
+SINGLE_FLIGHT=0 disables coalescing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.services import llm_guard, metrics
+
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") != "0"
+
+T = TypeVar("T")
+
+# site -> {"leaders": n, "followers": n, "retried": n}
+STATS: Dict[str, Dict[str, int]] = defaultdict(lambda: {"leaders": 0, "followers": 0, "retried": 0})
+metrics.expose("single_flight", STATS, "LLM calls that made a request (leaders) or shared one (followers).")
+
+_inflight: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def request_key(**parts: Any) -> str:
+    """
+    Canonical hash of a request (model, messages, parameters...); key order does not matter.
+    """
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def do(site: str, key: str, fn: Callable[[], T]) -> T:
+    """
+    fn() for the first caller with this key; concurrent callers with the same key get its result.
+    """
+    if not SINGLE_FLIGHT:
+        return fn()
+
+    while True:
+        with _lock:
+            fut = _inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                _inflight[key] = fut
+            STATS[site]["leaders" if leader else "followers"] += 1
+        if leader:
+            break
+
+        # The leader belongs to another request; wait no longer than our own deadline
+        left = llm_guard.remaining()
+        try:
+            return fut.result(timeout=None if left is None else max(left, 0.0))
+        except FutureTimeout:
+            raise llm_guard.DeadlineExceeded("request deadline exceeded waiting for a shared LLM call")
+        except llm_guard.DeadlineExceeded:
+            # The leader's deadline, not ours: ask again (the key is free by now); the next
+            # round counts this call as leader or follower
+            with _lock:
+                STATS[site]["followers"] -= 1
+                STATS[site]["retried"] += 1
+
+    try:
+        result = fn()
+    except BaseException as e:
+        _done(key)
+        fut.set_exception(e)
+        raise
+    _done(key)
+    fut.set_result(result)
+    return result
+
+
+def _done(key: str) -> None:
+    # Before publishing the result, so later calls start a fresh request
+    with _lock:
+        _inflight.pop(key, None)
+
+
+def coalesce_rate(site: Optional[str] = None) -> float:
+    """
+    Share of calls that were served by another call's request (one site, or all).
+    """
+    rows = [STATS[site]] if site else list(STATS.values())
+    leaders = sum(r["leaders"] for r in rows)
+    followers = sum(r["followers"] for r in rows)
+    total = leaders + followers
+    return followers / total if total else 0.0
@@ -0,0 +1,175 @@
+"""
+speculative.py
+
+Speculative subsidy ranking during intake.
+
+Municipality and children drive the prefilter, and they are usually known one or two turns
+before the income question is answered. chatbot_step then calls start(), which runs
+prefilter + LLM ranking in a background thread while the user is still typing. When intake
+completes, finish() takes that result instead of ranking from scratch:
+
+- same municipality/children and the income filter only removed candidates: take the
+  ranking minus the removed regulations, and have the LLM re-rank only its top entries
+  with the income included (rerank; a short prompt instead of all candidates). The
+  speculative order is kept as is when no rerank is given or the provider is unavailable
+- income brought in candidates the speculative run did not see, or the job failed: rank again
+- municipality/children changed in the meantime: the old job is cancelled/discarded
+
+Jobs live in this process only; a session that lands on another worker just ranks normally.
+SPECULATIVE_RANKING=0 disables the stage.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.services import llm_guard, metrics
+from app.services.subsidy_loader import get_subsidy_df
+from app.services.subsidy_ranker import UserProfile, candidate_ids, cvdr_key, prefilter_candidates, _norm
+
+SPECULATIVE_RANKING = os.getenv("SPECULATIVE_RANKING", "1") != "0"
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "4"))
+# Abandoned intakes: drop their results after this long
+JOB_TTL_S = 600
+# Longest the final turn waits for a still-running speculative job before ranking itself
+WAIT_TIMEOUT_S = 120
+
+RankFn = Callable[[UserProfile], Dict[str, Any]]
+# Ranks the given candidate rows for the profile (subsidy_ranker.rank_candidates)
+RerankFn = Callable[[pd.DataFrame, UserProfile], Dict[str, Any]]
+
+STATS = {"started": 0, "cancelled": 0, "reused": 0, "refined": 0, "reranked": 0, "missed": 0}
+metrics.expose("speculative", STATS, "Speculative ranking jobs and how intake completion used them.")
+
+
+@dataclass
+class _Job:
+    key: Tuple[str, int]
+    future: Future
+    started: float
+
+
+_jobs: Dict[str, _Job] = {}
+_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative")
+    return _pool
+
+
+def _key(profile: UserProfile) -> Tuple[str, int]:
+    return _norm(profile.municipality).replace("gemeente ", ""), int(profile.children_u18 or 0)
+
+
+def _cancel(job: _Job) -> None:
+    if job.future.cancel():
+        STATS["cancelled"] += 1
+    # A job already calling the LLM cannot be interrupted; its result is simply never read
+
+
+def _expire(now: float) -> None:
+    for sid in [s for s, j in _jobs.items() if now - j.started > JOB_TTL_S]:
+        _cancel(_jobs.pop(sid))
+
+
+def start(session_id: str, profile: UserProfile, rank: RankFn) -> None:
+    """
+    Starts ranking for the known fields (income still missing). Idempotent per
+    municipality/children; a changed profile replaces the running job.
+    """
+    if not SPECULATIVE_RANKING or not profile.municipality:
+        return
+    key = _key(profile)
+    spec_profile = replace(profile, net_income_monthly_eur=None)
+    with _lock:
+        now = time.monotonic()
+        _expire(now)
+        job = _jobs.get(session_id)
+        if job is not None:
+            if job.key == key:
+                return
+            _cancel(job)
+        _jobs[session_id] = _Job(key, _executor().submit(rank, spec_profile), now)
+        STATS["started"] += 1
+
+
+def finish(
+    session_id: str,
+    profile: UserProfile,
+    rank: RankFn,
+    *,
+    max_candidates: int,
+    rerank: Optional[RerankFn] = None,
+) -> Dict[str, Any]:
+    """
+    The ranking result for the complete profile, reusing the speculative run when it is valid.
+    max_candidates must match what rank() passes to prefilter_candidates. The speculative run
+    ranked without the income; rerank, when given, re-ranks its top entries with it.
+    """
+    with _lock:
+        job = _jobs.pop(session_id, None)
+    if job is None or job.key != _key(profile):
+        if job is not None:
+            _cancel(job)
+        STATS["missed"] += 1
+        return rank(profile)
+
+    try:
+        left = llm_guard.remaining()
+        spec = job.future.result(timeout=WAIT_TIMEOUT_S if left is None else min(WAIT_TIMEOUT_S, max(left, 0.0)))
+    except Exception as e:  # failed, cancelled or too slow: rank normally
+        print(f"Speculative ranking unusable ({type(e).__name__}: {e}); ranking again")
+        STATS["reranked"] += 1
+        return rank(profile)
+    if spec.get("degraded"):
+        # Ranked locally while the provider was unavailable; it may be back by now
+        STATS["reranked"] += 1
+        return rank(profile)
+
+    # Income only removes candidates (filter_by_income), but the top-N cut can then let
+    # in regulations the LLM never saw; only reuse when that did not happen.
+    candidates_df, _ = prefilter_candidates(
+        get_subsidy_df(), replace(profile), require_municipality_match=True, max_candidates=max_candidates
+    )
+    final_ids = candidate_ids(candidates_df)
+    seen_ids = set(spec.get("candidate_ids") or [])
+    if not final_ids <= seen_ids:
+        STATS["reranked"] += 1
+        return rank(profile)
+
+    dropped = seen_ids - final_ids
+    ranked = [r for r in spec.get("ranked", []) if cvdr_key(r.get("cvdr_id")) not in dropped]
+    for i, r in enumerate(ranked, start=1):
+        r["rank"] = i
+    reused = {**spec, "ranked": ranked, "candidates_used": len(final_ids) or spec.get("candidates_used", 0)}
+
+    if rerank is None or profile.net_income_monthly_eur is None:
+        STATS["reused"] += 1
+        return reused
+    # The speculative top entries, in that order; rows the LLM dropped are not sent again
+    order = {k: i for i, k in enumerate(cvdr_key(r.get("cvdr_id")) for r in ranked) if k}
+    keys = candidates_df["cvdr_id"].map(cvdr_key) if "cvdr_id" in candidates_df.columns else None
+    if keys is None or not order:
+        STATS["reused"] += 1
+        return reused
+    short = candidates_df[keys.isin(order)]
+    short = short.iloc[keys[keys.isin(order)].map(order).argsort(kind="stable")]
+    refined = rerank(short, profile)
+    if refined.get("degraded") or not refined.get("ranked"):
+        # Provider gone since the speculative run: its LLM order beats the prefilter order
+        STATS["reused"] += 1
+        return reused
+    STATS["refined"] += 1
+    return {**refined, "candidates_used": reused["candidates_used"], "candidate_ids": spec.get("candidate_ids")}
+
@@ -0,0 +1,280 @@
+"""
+structured_eligibility.py
+
+Offline batch pipeline: scraped regulation pages -> typed, queryable eligibility fields per
+regulation, written to a Parquet file next to the subsidy CSV.
+
+The catalog CSV only has keyword signals and raw snippets, so at runtime the LLM has to read
+eligibility_snippet for every candidate. The fields extracted here (income threshold as % of
+the bijstandsnorm, yearly amounts, age limits, application windows) let prefilter_candidates
+filter on net_income_monthly_eur numerically instead.
+
+Extraction is rule based (Dutch regulation phrasing), best effort: a field is null when the
+text does not state it clearly, and nulls never exclude a regulation.
+
+Input: app/data/pages/*.txt (full scraped text, see data/fetch_sources.py), falling back to the
+catalog snippets for regulations without a scraped page. With a change manifest only changed
+pages are re-extracted; other rows are carried over from the previous Parquet file.
+
+Run from backend/:
+    python -m app.services.structured_eligibility [--full]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.page_cache import changed_since, load_change_manifest, MANIFEST_NAME
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+PAGES_DIR = DATA_DIR / "pages"
+CATALOG_CSV = DATA_DIR / "single_parent_support_subsidies.csv"
+OUT_PATH = DATA_DIR / "structured_eligibility.parquet"
+CHANGE_MANIFEST = PAGES_DIR / MANIFEST_NAME
+
+# Plausible per-household amounts; larger sums are budgets / subsidy ceilings for organisations
+MAX_HOUSEHOLD_AMOUNT_EUR = 10_000
+
+SCHEMA = {
+    "cvdr_id": "string",
+    "income_threshold_pct": "Float64",
+    "income_threshold_basis": "string",  # "bijstandsnorm" | "minimumloon"
+    "amount_single_parent_eur": "Float64",
+    "amount_min_eur": "Float64",
+    "amount_max_eur": "Float64",
+    "amount_period": "string",  # "year" | "month" | "once"
+    "min_age": "Int64",  # of the applicant
+    "max_age": "Int64",  # of the applicant
+    "child_max_age": "Int64",  # oldest child / young person the scheme covers
+    "application_deadline_days": "Int64",
+    "application_start": "string",  # ISO date
+    "application_end": "string",  # ISO date
+    "referteperiode_years": "Int64",
+    "source": "string",  # "page" | "snippet"
+}
+
+MONTHS = {
+    "januari": 1, "februari": 2, "maart": 3, "april": 4, "mei": 5, "juni": 6,
+    "juli": 7, "augustus": 8, "september": 9, "oktober": 10, "november": 11, "december": 12,
+}
+
+_CVDR_RE = re.compile(r"CVDR(\d+)", re.IGNORECASE)
+_PCT_RE = re.compile(
+    r"(\d{2,3}(?:[,.]\d+)?)\s*%\s*(?:van\s+)?(?:de|het)?\s*(?:[\w-]+\s+){0,3}?(bijstandsnorm|minimumloon)",
+    re.IGNORECASE,
+)
+_EUR = r"(?:€|EUR|euro)\s*(\d{1,3}(?:\.\d{3})*|\d+)(?:,(\d{2}|-))?"
+_EUR_RE = re.compile(_EUR, re.IGNORECASE)
+_SINGLE_PARENT_AMOUNT_RE = re.compile(r"alleenstaande\s+ouders?\W{0,5}(?:[^€.;]{0,40}?)" + _EUR, re.IGNORECASE)
+_PERIOD_RE = {
+    "year": re.compile(r"per\s+(?:kalender)?jaar|jaarlijks", re.IGNORECASE),
+    "month": re.compile(r"per\s+maand|maandelijks", re.IGNORECASE),
+    "once": re.compile(r"eenmalig", re.IGNORECASE),
+}
+_MIN_AGE_RES = (
+    re.compile(r"(\d{2})\s+jaar\s+of\s+ouder", re.IGNORECASE),
+    re.compile(r"(?:vanaf|ten minste|minimaal)\s+(?:de\s+leeftijd\s+van\s+)?(\d{2})\s+jaar", re.IGNORECASE),
+)
+_MAX_AGE_RES = (
+    re.compile(r"(?:jonger\s+dan\s+|tot\s+(?:de\s+leeftijd\s+van\s+)?)(\d{2})\s+jaar", re.IGNORECASE),
+    re.compile(r"pensioengerechtigde\s+leeftijd", re.IGNORECASE),
+)
+# An age phrase is the applicant's limit only when the applicant is its subject
+# ("de aanvrager is 21 jaar of ouder", "u bent jonger dan 27 jaar"); most age ranges in
+# regulations describe the children or young people a scheme is for
+_APPLICANT_CUE_RE = re.compile(
+    r"\b(?:aanvrager|belanghebbende|verzoeker|u\s+bent|bent\s+u|hij\s+of\s+zij\s+is)\b", re.IGNORECASE
+)
+_CHILD_CUE_RE = re.compile(
+    r"\b(?:kind|kinderen|jongere|jongeren|jeugdige|jeugdigen|leerling|leerlingen|scholier|scholieren|student|studenten)\b",
+    re.IGNORECASE,
+)
+# How far before the age phrase the subject is looked for (within the same sentence)
+_AGE_SUBJECT_WINDOW = 80
+_CHILD_AGE_RE = re.compile(
+    r"kind(?:eren)?\s+(?:[\w ]{0,30}?)(?:tot|jonger\s+dan|onder|van\s+\d{1,2}\s+tot)\s+(?:de\s+leeftijd\s+van\s+)?(\d{1,2})\s+jaar",
+    re.IGNORECASE,
+)
+_DEADLINE_RE = re.compile(
+    r"(?:aanvraag|verzoek|aanvragen)[^.]{0,80}?binnen\s+(?:uiterlijk\s+)?(\d{1,3})\s+(dagen|weken|maanden|jaar)",
+    re.IGNORECASE,
+)
+_DATE = r"(\d{1,2})\s+(" + "|".join(MONTHS) + r")\s+(\d{4})"
+_WINDOW_RE = re.compile(_DATE + r"\s*(?:–|-|tot\s+en\s+met|t/m|tot)\s*" + _DATE, re.IGNORECASE)
+_REFERTE_RE = re.compile(r"referteperiode\s+(?:van\s+)?(\d{1,2})\s+jaar", re.IGNORECASE)
+_UNIT_DAYS = {"dagen": 1, "weken": 7, "maanden": 30, "jaar": 365}
+
+
+def _eur(whole: str, cents: Optional[str]) -> float:
+    v = float(whole.replace(".", ""))
+    if cents and cents != "-":
+        v += int(cents) / 100
+    return v
+
+
+def _iso(day: str, month: str, year: str) -> Optional[str]:
+    m = MONTHS.get(month.lower())
+    d = int(day)
+    if not m or not 1 <= d <= 31:
+        return None
+    return f"{int(year):04d}-{m:02d}-{d:02d}"
+
+
+def _age_subject(text: str, start: int) -> Optional[str]:
+    """
+    "applicant" or "child" for the nearest subject before an age phrase, None if neither.
+    """
+    window = text[max(0, start - _AGE_SUBJECT_WINDOW):start]
+    window = re.split(r"[.;:]\s", window)[-1]
+    applicant = [m.end() for m in _APPLICANT_CUE_RE.finditer(window)]
+    child = [m.end() for m in _CHILD_CUE_RE.finditer(window)]
+    if not applicant and not child:
+        return None
+    return "applicant" if (applicant[-1] if applicant else -1) > (child[-1] if child else -1) else "child"
+
+
+def _ages(rx: re.Pattern, text: str, subject: str) -> List[int]:
+    return [int(m.group(1)) for m in rx.finditer(text) if _age_subject(text, m.start()) == subject]
+
+
+def extract_fields(text: str) -> Dict[str, Any]:
+    """
+    Rule-based field extraction from one regulation's text. Missing fields are None.
+    """
+    text = " ".join((text or "").split())
+    out: Dict[str, Any] = {k: None for k in SCHEMA if k not in ("cvdr_id", "source")}
+
+    # Income threshold: the regulation's own limit is usually the most generous percentage stated
+    pcts = [(float(p.replace(",", ".")), basis.lower()) for p, basis in _PCT_RE.findall(text)]
+    pcts = [(p, b) for p, b in pcts if 50 <= p <= 200]
+    if pcts:
+        bijstand = [p for p, b in pcts if b == "bijstandsnorm"]
+        if bijstand:
+            out["income_threshold_pct"], out["income_threshold_basis"] = max(bijstand), "bijstandsnorm"
+        else:
+            out["income_threshold_pct"], out["income_threshold_basis"] = max(p for p, _ in pcts), "minimumloon"
+
+    amounts = [a for a in (_eur(w, c) for w, c in _EUR_RE.findall(text)) if 0 < a <= MAX_HOUSEHOLD_AMOUNT_EUR]
+    if amounts:
+        out["amount_min_eur"] = min(amounts)
+        out["amount_max_eur"] = max(amounts)
+    m = _SINGLE_PARENT_AMOUNT_RE.search(text)
+    if m:
+        v = _eur(m.group(1), m.group(2))
+        if v <= MAX_HOUSEHOLD_AMOUNT_EUR:
+            out["amount_single_parent_eur"] = v
+    for period, rx in _PERIOD_RE.items():
+        if rx.search(text):
+            out["amount_period"] = period
+            break
+
+    min_ages = [a for rx in _MIN_AGE_RES for a in _ages(rx, text, "applicant") if 16 <= a <= 70]
+    if min_ages:
+        out["min_age"] = min(min_ages)
+    max_ages = [a for a in _ages(_MAX_AGE_RES[0], text, "applicant") if 18 <= a <= 70]
+    if max_ages:
+        out["max_age"] = max(max_ages)
+    # "kinderen tot 18 jaar", "jongeren van 18 tot 21 jaar": the range of the children covered
+    child_ages = [int(x) for x in _CHILD_AGE_RE.findall(text)] + _ages(_MAX_AGE_RES[0], text, "child")
+    child_ages = [a for a in child_ages if 1 <= a <= 27]
+    if child_ages:
+        out["child_max_age"] = max(child_ages)
+
+    m = _DEADLINE_RE.search(text)
+    if m:
+        out["application_deadline_days"] = int(m.group(1)) * _UNIT_DAYS[m.group(2).lower()]
+    m = _WINDOW_RE.search(text)
+    if m:
+        out["application_start"] = _iso(*m.group(1, 2, 3))
+        out["application_end"] = _iso(*m.group(4, 5, 6))
+
+    m = _REFERTE_RE.search(text)
+    if m:
+        out["referteperiode_years"] = int(m.group(1))
+    return out
+
+
+# -----------------------------
+# Batch build
+# -----------------------------
+def _iter_pages(pages_dir: Path, only: Optional[set] = None) -> Iterator[Tuple[str, str]]:
+    if not pages_dir.exists():
+        return
+    for p in sorted(pages_dir.glob("*.txt")):
+        if only is not None and p.name not in only:
+            continue
+        m = _CVDR_RE.search(p.name)
+        if m:
+            yield m.group(1), p.read_text(encoding="utf-8", errors="ignore")
+
+
+def _snippet_texts(csv_path: Path) -> Iterator[Tuple[str, str]]:
+    df = pd.read_csv(csv_path, usecols=["cvdr_id", "eligibility_snippet", "application_snippet"])
+    for r in df.itertuples(index=False):
+        if pd.isna(r.cvdr_id):
+            continue
+        text = " ".join(str(x) for x in (r.eligibility_snippet, r.application_snippet) if isinstance(x, str))
+        yield str(int(r.cvdr_id)), text
+
+
+def _to_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=list(SCHEMA))
+    return df.astype(SCHEMA)
+
+
+def build_structured(
+    pages_dir: Path = PAGES_DIR,
+    csv_path: Path = CATALOG_CSV,
+    out_path: Path = OUT_PATH,
+    full: bool = False,
+) -> pd.DataFrame:
+    """
+    Extracts fields for every regulation and writes out_path (Parquet). Unless full=True,
+    rows of pages no scrape changed since the previous build are reused from the previous file.
+    """
+    previous: Optional[pd.DataFrame] = None
+    changed_files: Optional[set] = None
+    manifest = load_change_manifest(CHANGE_MANIFEST)
+    if not full and manifest is not None and out_path.exists():
+        previous = pd.read_parquet(out_path).set_index("cvdr_id", drop=False)
+        # Every page changed since this file was written, over however many crawls
+        changed_files = {f for f in changed_since(manifest, out_path.stat().st_mtime).values() if f}
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for cvdr_id, text in _iter_pages(pages_dir, only=changed_files):
+        rows[cvdr_id] = {"cvdr_id": cvdr_id, **extract_fields(text), "source": "page"}
+    n_pages = len(rows)
+
+    if previous is not None:
+        for cvdr_id, r in previous.iterrows():
+            if cvdr_id not in rows and r["source"] == "page":
+                rows[cvdr_id] = r.to_dict()
+
+    for cvdr_id, text in _snippet_texts(csv_path):
+        if cvdr_id not in rows:
+            rows[cvdr_id] = {"cvdr_id": cvdr_id, **extract_fields(text), "source": "snippet"}
+
+    df = _to_frame(list(rows.values()))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(out_path, index=False)
+    print(f"Extracted {n_pages} pages, {len(df)} regulations total -> {out_path}")
+    return df
+
+
+def load_structured(path: Path = OUT_PATH) -> Optional[pd.DataFrame]:
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract structured eligibility fields into Parquet")
+    parser.add_argument("--full", action="store_true", help="re-extract every page, ignore the change manifest")
+    args = parser.parse_args()
+    df = build_structured(full=args.full)
+    print(df.notna().sum().to_string())
@@ -1,9 +1,66 @@
 from pathlib import Path
 import pandas as pd
 
+from app.services import resources
+from app.services.build_index import index_stamp
+from app.services.catalog_store import (
+    CATALOG_DIR,
+    STRUCTURED_PATH,
+    catalog_is_fresh,
+    join_structured,
+    load_filter_columns,
+    reset_snippet_store,
+)
+
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "single_parent_support_subsidies.csv"
 
+_cached: dict = {}
+
+def _stamp():
+    # Reload when the CSV, the structured fields or the built catalog change on disk, and
+    # rebuild the candidate view when the knowledge index behind child_mask was rebuilt
+    meta = CATALOG_DIR / "meta.json"
+    return tuple(
+        p.stat().st_mtime if p.exists() else None for p in (DATA_PATH, STRUCTURED_PATH, meta)
+    ) + (index_stamp(),)
+
 def get_subsidy_df() -> pd.DataFrame:
-    if not DATA_PATH.exists():
-        raise FileNotFoundError(f"CSV not found at {DATA_PATH}")
-    return pd.read_csv(DATA_PATH)
+    """
+    The subsidy catalog. Uses the columnar build (catalog_store.py) when it is up to date:
+    only the short filter columns are loaded, snippets are fetched per row by
+    subsidy_ranker.candidates_for_llm. Falls back to the full CSV otherwise.
+    The frame is cached per process; callers must not modify it in place.
+    """
+    stamp = _stamp()
+    if _cached.get("stamp") == stamp:
+        return _cached["df"]
+
+    if catalog_is_fresh(DATA_PATH):
+        df = load_filter_columns()
+    else:
+        if not DATA_PATH.exists():
+            raise FileNotFoundError(f"CSV not found at {DATA_PATH}")
+        df = join_structured(pd.read_csv(DATA_PATH))
+
+    # Materialised prefilter (candidate_view.py); unchanged municipalities keep their entries
+    from app.services.candidate_view import CandidateView
+
+    _cached["view"] = CandidateView(df, previous=_cached.get("view"))
+    _cached["stamp"] = stamp
+    _cached["df"] = df
+    # The open snippet blob belongs to the previous build; row ids of df index the new one
+    reset_snippet_store()
+    return df
+
+
+def get_candidate_view(df: pd.DataFrame):
+    """
+    The CandidateView of df, when df is the catalog returned by get_subsidy_df.
+    """
+    if _cached.get("df") is df:
+        return _cached.get("view")
+    return None
+
+
+# Warmed at startup so the first completed intake does not pay for the Parquet/CSV read
+resources.register("subsidy_catalog", get_subsidy_df)
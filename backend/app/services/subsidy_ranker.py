@@ -14,19 +14,51 @@ Expected CSV columns (best-effort; missing columns are handled gracefully):
 - single_parent_signals, benefit_signals, eligibility_signals, application_data_signals
 - eligibility_snippet, application_snippet
 - cvdr_id (optional)
+- structured eligibility fields (optional, see structured_eligibility.py):
+  income_threshold_pct, income_threshold_basis, amount_*, min_age, max_age, child_max_age,
+  application_deadline_days, application_start, application_end
 
 """
 
 from __future__ import annotations
 
 import json
+import os
 import re
 from dataclasses import dataclass, asdict
 from difflib import get_close_matches
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import pandas as pd
 
+from app.services import llm_guard, metrics, single_flight
+
+# Net monthly bijstandsnorm for a single parent (21 to AOW age, incl. holiday allowance).
+# Income thresholds in the regulations are stated as a % of this; update every January and July.
+BIJSTANDSNORM_SINGLE_PARENT_EUR = float(os.getenv("BIJSTANDSNORM_SINGLE_PARENT_EUR", "1401.0"))
+
+STRUCTURED_FIELDS = (
+    "income_threshold_pct",
+    "income_threshold_basis",
+    "amount_single_parent_eur",
+    "amount_min_eur",
+    "amount_max_eur",
+    "amount_period",
+    "min_age",
+    "max_age",
+    "child_max_age",
+    "application_deadline_days",
+    "application_start",
+    "application_end",
+)
+
+# Matched as substrings in the catalog columns and as word prefixes in the knowledge index
+CHILD_KEYWORDS = ("kind", "kinderen", "jeugd", "leerling", "school", "kinderopvang", "gezins")
+# Full page text: a child keyword in every other article is a child-related regulation, a
+# definition of "gezinsleden" or one "kinderen" in a bijstand regulation is not
+CHILD_PAGE_MIN_TF = 3
+CHILD_PAGE_MIN_SHARE = 0.005
+
 # -----------------------------
 # Data models
 # -----------------------------
@@ -95,6 +127,37 @@ def _safe_bool_col(df: pd.DataFrame, col: str) -> pd.Series:
     return s.fillna(False).map(lambda x: str(x).strip().lower() in ("1", "true", "yes", "y"))
 
 
+def _pages_with_keywords(keywords: Iterable[str], min_tf: int = 1, min_share: float = 0.0) -> set:
+    """
+    CVDR ids of scraped pages mentioning the keywords (build_index.py), at least min_tf times
+    and as min_share of the page's words; empty when not built.
+    """
+    from app.services.build_index import get_knowledge_index
+
+    index = get_knowledge_index()
+    if index is None:
+        return set()
+    return index.cvdr_ids_with_prefixes(keywords, min_tf=min_tf, min_share=min_share)
+
+
+def cvdr_key(v: Any) -> Optional[str]:
+    """
+    Comparable CVDR id: the CSV stores floats, the LLM echoes str / int / float.
+    """
+    if v is None or (isinstance(v, float) and pd.isna(v)) or v == "":
+        return None
+    try:
+        return str(int(float(v)))
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def candidate_ids(candidates_df: pd.DataFrame) -> Set[str]:
+    if "cvdr_id" not in candidates_df.columns:
+        return set()
+    return {k for k in (cvdr_key(v) for v in candidates_df["cvdr_id"].tolist()) if k}
+
+
 def contains_any(text: str, keywords: Iterable[str]) -> bool:
     t = _norm(text)
     return any(k in t for k in keywords)
@@ -162,7 +225,7 @@ def quick_relevance_score(row: pd.Series, profile: UserProfile) -> float:
         score += 2.0
 
     if profile.children_u18 > 0:
-        child_kw = ["kind", "kinderen", "jeugd", "leerling", "school", "kinderopvang", "gezins"]
+        child_kw = CHILD_KEYWORDS
         if contains_any(title, child_kw) or contains_any(benefit, child_kw) or contains_any(sp, child_kw):
             score += 2.0
 
@@ -188,6 +251,7 @@ def quick_relevance_score(row: pd.Series, profile: UserProfile) -> float:
     return score
 
 
+@metrics.timed("prefilter")
 def prefilter_candidates(
     df: pd.DataFrame,
     profile: UserProfile,
@@ -208,6 +272,18 @@ def prefilter_candidates(
       - Then filters by children-related (if children_u18 > 0)
       - Then sorts by a quick heuristic score and truncates to max_candidates
     """
+    if profile.children_u18 is None:
+        profile.children_u18 = 0
+
+    # Catalog from get_subsidy_df: answer from the materialised per-municipality view
+    if require_municipality_match and profile.municipality:
+        from app.services.subsidy_loader import get_candidate_view
+
+        view = get_candidate_view(df)
+        hit = view.lookup(profile, max_candidates) if view is not None else None
+        if hit is not None:
+            return hit, []
+
     base = df
 
     suggestions: List[str] = []
@@ -225,42 +301,87 @@ def prefilter_candidates(
 
     # Single parent filter
     if profile.is_single_parent:
-        sp_signals = _safe_col(base, "single_parent_signals", "").fillna("")
-        mask = (
-            _safe_bool_col(base, "single_parent_relevant")
-            | _safe_bool_col(base, "mentions_single_parent_explicitly")
-            | sp_signals.str.contains("alleenstaande ouder|eenouder", case=False, regex=True)
-        )
-        base = base[mask].copy()
+        base = base[single_parent_mask(base)].copy()
 
     # Children-related filter
-    if profile.children_u18 is None:
-        profile.children_u18 = 0
     if profile.children_u18 > 0:
-        child_regex = r"kind|kinderen|jeugd|leerling|school|kinderopvang|gezins"
-        title = _safe_col(base, "title", "").fillna("")
-        benefit = _safe_col(base, "benefit_signals", "").fillna("")
-        sp_signals = _safe_col(base, "single_parent_signals", "").fillna("")
-        mask = (
-            title.str.contains(child_regex, case=False, regex=True)
-            | benefit.str.contains(child_regex, case=False, regex=True)
-            | sp_signals.str.contains(child_regex, case=False, regex=True)
-        )
-        base = base[mask].copy()
+        base = base[child_mask(base)].copy()
+
+    # Income filter on the structured threshold; regulations without a known threshold stay in
+    base = filter_by_income(base, profile.net_income_monthly_eur)
 
     # Score + top-N
     base["_prefilter_score"] = base.apply(lambda r: quick_relevance_score(r, profile), axis=1)
-    base = base.sort_values("_prefilter_score", ascending=False).head(max_candidates).copy()
+    base = base.sort_values("_prefilter_score", ascending=False, kind="stable").head(max_candidates).copy()
 
     return base, suggestions
 
 
+def single_parent_mask(df: pd.DataFrame) -> pd.Series:
+    sp_signals = _safe_col(df, "single_parent_signals", "").fillna("")
+    return (
+        _safe_bool_col(df, "single_parent_relevant")
+        | _safe_bool_col(df, "mentions_single_parent_explicitly")
+        | sp_signals.str.contains("alleenstaande ouder|eenouder", case=False, regex=True)
+    )
+
+
+def child_mask(df: pd.DataFrame) -> pd.Series:
+    child_regex = "|".join(CHILD_KEYWORDS)
+    title = _safe_col(df, "title", "").fillna("")
+    benefit = _safe_col(df, "benefit_signals", "").fillna("")
+    sp_signals = _safe_col(df, "single_parent_signals", "").fillna("")
+    mask = (
+        title.str.contains(child_regex, case=False, regex=True)
+        | benefit.str.contains(child_regex, case=False, regex=True)
+        | sp_signals.str.contains(child_regex, case=False, regex=True)
+    )
+    # Signals are a keyword sample; the knowledge index knows the full page text
+    child_pages = _pages_with_keywords(CHILD_KEYWORDS, CHILD_PAGE_MIN_TF, CHILD_PAGE_MIN_SHARE)
+    if child_pages:
+        cvdr = _safe_col(df, "cvdr_id", None).map(lambda x: str(int(x)) if pd.notna(x) else "")
+        mask = mask | cvdr.isin(child_pages)
+    return mask
+
+
+def filter_by_income(df: pd.DataFrame, net_income_monthly_eur: Optional[float]) -> pd.DataFrame:
+    """
+    Drops regulations whose income threshold (as % of the bijstandsnorm) is below the user's
+    net monthly income. Needs the structured eligibility columns; otherwise a no-op.
+    """
+    if net_income_monthly_eur is None or "income_threshold_pct" not in df.columns:
+        return df
+    pct = pd.to_numeric(df["income_threshold_pct"], errors="coerce")
+    basis = _safe_col(df, "income_threshold_basis", "").fillna("")
+    limit = pct / 100.0 * BIJSTANDSNORM_SINGLE_PARENT_EUR
+    too_high = (basis == "bijstandsnorm") & pct.notna() & (float(net_income_monthly_eur) > limit)
+    return df[~too_high.fillna(False).astype(bool)]
+
+
+def _structured_value(v: Any) -> Any:
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    if hasattr(v, "item"):  # numpy / pandas scalars -> plain JSON types
+        return v.item()
+    return v
+
+
 def candidates_for_llm(candidates_df: pd.DataFrame) -> List[Dict[str, Any]]:
     """
     Converts the candidate dataframe into a compact list of dicts for LLM input.
     """
+    # Columnar catalog: snippets are not in the frame, read them by row id from the blob
+    lazy_snippets: Dict[int, Dict[str, Optional[str]]] = {}
+    if "eligibility_snippet" not in candidates_df.columns and "_row_id" in candidates_df.columns:
+        from app.services.catalog_store import get_snippet_store
+
+        row_ids = [int(x) for x in candidates_df["_row_id"].tolist()]
+        lazy_snippets = dict(zip(row_ids, get_snippet_store().get_rows(row_ids)))
+
     out: List[Dict[str, Any]] = []
     for _, r in candidates_df.iterrows():
+        if lazy_snippets:
+            r = pd.concat([r, pd.Series(lazy_snippets[int(r["_row_id"])])])
         year = r.get("year", None)
         year_val: Optional[int] = None
         try:
@@ -285,12 +406,17 @@ def candidates_for_llm(candidates_df: pd.DataFrame) -> List[Dict[str, Any]]:
                 "cvdr_id": r.get("cvdr_id"),
             }
         )
+        structured = {f: _structured_value(r.get(f)) for f in STRUCTURED_FIELDS if f in candidates_df.columns}
+        structured = {k: v for k, v in structured.items() if v is not None}
+        if structured:
+            out[-1]["structured_eligibility"] = structured
     return out
 
 
 # -----------------------------
 # LLM ranking
 # -----------------------------
+@metrics.timed("llm_rank")
 def rank_with_llm(
     llm_candidates: List[Dict[str, Any]],
     profile: UserProfile,
@@ -312,7 +438,8 @@ def rank_with_llm(
     """
     from openai import OpenAI  # type: ignore
 
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    # Retries are left to llm_guard's breaker and the local fallback in filter_then_rank
+    client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
 
     payload = {
         "user_profile": {
@@ -345,13 +472,27 @@ def rank_with_llm(
 
     user = "Here is the data:\n" + json.dumps(payload, ensure_ascii=False)
 
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": system}, {"role": "user", "content": user}],
-        temperature=temperature,
-    )
+    messages = [{"role": "user", "content": system}, {"role": "user", "content": user}]
+
+    def complete(timeout: float) -> str:
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout,
+        )
+        metrics.record_usage("rank", resp)
+        return resp.choices[0].message.content or ""
 
-    text = resp.choices[0].message.content or ""
+    def call() -> str:
+        return llm_guard.call(model, complete)
+
+    # Users with the same profile finishing intake together share one ranking request;
+    # each still parses its own copy of the answer below
+    key = single_flight.request_key(
+        op="rank", model=model, base_url=base_url, messages=messages, temperature=temperature
+    )
+    text = single_flight.do("rank", key, call)
 
     # Parse JSON robustly (some models wrap it)
     try:
@@ -387,6 +528,35 @@ def rank_with_llm(
     return ranked
 
 
+def rank_locally(llm_candidates: List[Dict[str, Any]], top_k: int = 15) -> List[RankedItem]:
+    """
+    Degraded ranking when the LLM is unavailable: the prefilter order, with the
+    catalog's own signals and snippets instead of generated summaries.
+    """
+    items = llm_candidates[:top_k]
+    ranked: List[RankedItem] = []
+    for i, c in enumerate(items, start=1):
+        ranked.append(
+            RankedItem(
+                rank=i,
+                score=round(100.0 * (len(items) - i + 1) / len(items), 1),
+                title=str(c.get("title") or ""),
+                municipality=str(c.get("municipality") or ""),
+                category=str(c.get("category") or ""),
+                year=c.get("year"),
+                url=str(c.get("url") or ""),
+                benefit_summary=", ".join(c.get("benefit_signals") or []),
+                eligibility_summary=str(c.get("eligibility_snippet") or "unknown"),
+                required_data_or_documents=list(c.get("application_data_signals") or []),
+                why_relevant="Matches your municipality and household; not reviewed in detail.",
+                confidence="low",
+                cvdr_id=cvdr_key(c.get("cvdr_id")),
+                doc_type=(str(c.get("doc_type")) if c.get("doc_type") else None),
+            )
+        )
+    return ranked
+
+
 # -----------------------------
 # Convenience: one-call pipeline
 # -----------------------------
@@ -409,6 +579,8 @@ def filter_then_rank(
     Returns a dict with:
       - "ranked": list[dict]
       - "candidates_used": int
+      - "candidate_ids": list[str] (CVDR ids sent to the LLM)
+      - "degraded": bool (LLM unavailable, ranked by rank_locally)
       - "municipality_suggestions": list[str]
     """
     candidates_df, suggestions = prefilter_candidates(
@@ -417,20 +589,43 @@ def filter_then_rank(
     print(f"Prefiltered to {len(candidates_df)} candidates. Municipality suggestions: {suggestions}")
     if len(candidates_df) == 0:
         return {"ranked": [], "candidates_used": 0, "municipality_suggestions": suggestions}
+    return rank_candidates(candidates_df, profile, model=model, api_key=api_key, base_url=base_url, top_k=top_k)
+
 
+def rank_candidates(
+    candidates_df: pd.DataFrame,
+    profile: UserProfile,
+    *,
+    model: str,
+    api_key: str,
+    base_url: Optional[str] = None,
+    top_k: int = 15,
+) -> Dict[str, Any]:
+    """
+    The ranking half of filter_then_rank for already selected candidates (same result dict);
+    speculative.finish uses it to re-rank a short list once the income is known.
+    """
     llm_items = candidates_for_llm(candidates_df)
     print(f"Sending {len(llm_items)} candidates to LLM for ranking...")
-    ranked_items = rank_with_llm(
-        llm_items,
-        profile,
-        model=model,
-        api_key=api_key,
-        base_url=base_url,
-        top_k=top_k,
-    )
+    degraded = False
+    try:
+        ranked_items = rank_with_llm(
+            llm_items,
+            profile,
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            top_k=top_k,
+        )
+    except llm_guard.ProviderUnavailable as e:
+        print(f"LLM ranking unavailable ({e}); using the prefilter order")
+        ranked_items = rank_locally(llm_items, top_k)
+        degraded = True
     print(len(ranked_items))
     return {
         "ranked": [asdict(x) for x in ranked_items],
+        "degraded": degraded,
         "candidates_used": len(llm_items),
+        "candidate_ids": sorted(candidate_ids(candidates_df)),
         "municipality_suggestions": [],
     }
@@ -0,0 +1,124 @@
+"""
+Embedding backends (rag_encoder.py) on CPU: parity with the torch model and speed.
+
+Parity, against the torch SentenceTransformer vectors of the same texts:
+  - cosine per text (mean / min)
+  - top-10 overlap when the queries search the corpus sample
+Speed:
+  - query latency (one text per call, like rag_search): p50 / p95
+  - corpus throughput (batches of 64, like rag_embedding): texts/s
+
+Corpus sample: chunks of the built index (rag_index/chunks.jsonl), or the catalog snippets.
+Needs torch + sentence-transformers for the reference and `rag_encoder --export` for ONNX.
+Run from backend/:
+    python -m benchmarks.bench_embed [--backends torch,onnx,onnx-int8] [--corpus 512]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.rag_encoder import EMBED_BACKENDS, load_encoder
+from app.services.rag_retrival import EMBED_MODEL_NAME, INDEX_DIR
+from app.services.subsidy_loader import DATA_PATH
+
+QUERIES_PATH = Path(__file__).resolve().parent / "rag_queries.json"
+TOP_K = 10
+
+
+def load_corpus(n: int) -> List[str]:
+    chunks = INDEX_DIR / "chunks.jsonl"
+    texts: List[str] = []
+    if chunks.exists():
+        with chunks.open(encoding="utf-8") as f:
+            for line in f:
+                texts.append(json.loads(line)["text"])
+                if len(texts) >= n:
+                    break
+    if not texts:
+        df = pd.read_csv(DATA_PATH, usecols=["eligibility_snippet"])
+        texts = [t for t in df["eligibility_snippet"].dropna().tolist()][:n]
+    return texts
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+
+def measure(backend: str, queries: List[str], corpus: List[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    enc = load_encoder(EMBED_MODEL_NAME, backend)
+    load_s = time.perf_counter() - t0
+
+    enc.encode(queries[:2], batch_size=2)  # warm-up (graph optimisation, allocator)
+    lat = []
+    q_emb = []
+    for q in queries:
+        t0 = time.perf_counter()
+        q_emb.append(enc.encode([q], batch_size=1)[0])
+        lat.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    c_emb = enc.encode(corpus, batch_size=64)
+    corpus_s = time.perf_counter() - t0
+
+    return {
+        "load_s": round(load_s, 2),
+        "query_p50_ms": round(statistics.median(lat), 2),
+        "query_p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "corpus_texts_per_s": round(len(corpus) / corpus_s, 1),
+        "_q": _normalize(np.asarray(q_emb, dtype=np.float32)),
+        "_c": _normalize(np.asarray(c_emb, dtype=np.float32)),
+    }
+
+
+def parity(ref: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, float]:
+    cos = np.concatenate([(ref["_q"] * other["_q"]).sum(1), (ref["_c"] * other["_c"]).sum(1)])
+    k = min(TOP_K, len(ref["_c"]))
+    top_ref = np.argsort(-(ref["_q"] @ ref["_c"].T), axis=1)[:, :k]
+    top_other = np.argsort(-(other["_q"] @ ref["_c"].T), axis=1)[:, :k]  # other's queries on the torch index
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(top_ref.tolist(), top_other.tolist())]
+    return {
+        "cosine_mean": round(float(cos.mean()), 4),
+        "cosine_min": round(float(cos.min()), 4),
+        f"top{k}_overlap": round(statistics.mean(overlap), 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(EMBED_BACKENDS))
+    parser.add_argument("--corpus", type=int, default=512)
+    args = parser.parse_args(argv)
+
+    queries = [q["query"] for q in json.loads(QUERIES_PATH.read_text(encoding="utf-8"))]
+    corpus = load_corpus(args.corpus)
+    print(f"{len(queries)} queries, {len(corpus)} corpus texts")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for backend in args.backends.split(","):
+        try:
+            results[backend] = measure(backend, queries, corpus)
+        except Exception as e:  # backend not installed / not exported
+            print(f"{backend}: skipped ({type(e).__name__}: {e})")
+
+    ref = results.get("torch")
+    report = {}
+    for backend, r in results.items():
+        row = {k: v for k, v in r.items() if not k.startswith("_")}
+        if ref is not None and backend != "torch":
+            row.update(parity(ref, r))
+            row["query_speedup"] = round(ref["query_p50_ms"] / r["query_p50_ms"], 2)
+            row["corpus_speedup"] = round(r["corpus_texts_per_s"] / ref["corpus_texts_per_s"], 2)
+        report[backend] = row
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+LLM-fallback rate and accuracy of intake extraction on a corpus of intake answers
+(benchmarks/intake_answers.json: text, the question just asked, expected fields).
+
+Compares the original order-dependent regex shortcuts of extractor.extract_user_info
+(kept verbatim below) with intake_parser.parse_intake. A case "falls back" when no field
+is found locally, which costs a chat_text round trip. A local value that differs from the
+expected one counts as wrong (worse than a fallback: the LLM never sees the message).
+No LLM calls are made. Run from backend/:
+    python -m benchmarks.bench_extract [--show-misses]
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.services.intake_parser import FIELDS, found_any, parse_intake
+
+CORPUS_PATH = Path(__file__).resolve().parent / "intake_answers.json"
+
+
+# Original hard rules, kept verbatim as the baseline
+def extract_reference(text: str, asked: Optional[str] = None) -> Dict[str, Any]:
+    text = text.strip()
+    if re.fullmatch(r"\d{1,3}", text):
+        return {"age": int(text), "municipality": None, "children": None, "monthly_income": None}
+    if re.fullmatch(r"[A-Za-z\- ]{2,}", text) and text[0].isupper():
+        return {"age": None, "municipality": text, "children": None, "monthly_income": None}
+    m = re.search(r"(\d+)\s*(child|children)", text.lower())
+    if m:
+        return {"age": None, "municipality": None, "children": int(m.group(1)), "monthly_income": None}
+    m = re.search(r"(\d{3,5})", text.replace(",", ""))
+    if m:
+        return {"age": None, "municipality": None, "children": None, "monthly_income": int(m.group(1))}
+    return {f: None for f in FIELDS}
+
+
+def evaluate(extract: Callable[[str, Optional[str]], Dict[str, Any]], cases, show_misses: bool) -> Dict[str, Any]:
+    fallback = correct = wrong = expected = 0
+    t0 = time.perf_counter()
+    for case in cases:
+        got = extract(case["text"], case.get("asked"))
+        expected += sum(case["expect"].get(f) is not None for f in FIELDS)
+        if not found_any(got):
+            fallback += 1
+            if show_misses and case["expect"]:
+                print(f"  fallback: {case['text']!r}")
+            continue
+        for f in FIELDS:
+            want, have = case["expect"].get(f), got.get(f)
+            if have is None:
+                continue
+            if want is not None and str(have).lower() == str(want).lower():
+                correct += 1
+            else:
+                wrong += 1
+                if show_misses:
+                    print(f"  wrong {f}: {case['text']!r} -> {have!r} (expected {want!r})")
+    elapsed_us = (time.perf_counter() - t0) / len(cases) * 1e6
+    return {
+        "cases": len(cases),
+        "llm_fallback_rate": round(fallback / len(cases), 3),
+        "fields_correct": f"{correct}/{expected}",
+        "fields_wrong": wrong,
+        "mean_us_per_message": round(elapsed_us, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+    cases = json.loads(CORPUS_PATH.read_text(encoding="utf-8"))
+    parse_intake("warm-up", None)  # builds the municipality index from the catalog
+
+    report = {}
+    for name, fn in (("reference", extract_reference), ("intake_parser", parse_intake)):
+        if args.show_misses:
+            print(name)
+        report[name] = evaluate(fn, cases, args.show_misses)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
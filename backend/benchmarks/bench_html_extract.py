@@ -0,0 +1,118 @@
+"""
+Throughput and output equivalence of html_text.extract_text against the original
+BeautifulSoup implementations of fetch_sources.clean_html and extract_eligibility.scrape_url.
+
+Pages: every *.html in benchmarks/recorded_pages (see page_server.py for recording), or
+synthetic CVDR-like pages built from the catalog snippets when there are none.
+Run from backend/:
+    python -m benchmarks.bench_html_extract [--pages DIR] [--repeat 3]
+"""
+
+import argparse
+import html as html_lib
+import json
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from app.services.html_text import extract_text
+from app.services.subsidy_loader import DATA_PATH
+
+RECORDED_DIR = Path(__file__).resolve().parent / "recorded_pages"
+
+
+# Original implementations, kept verbatim as the baseline
+def clean_html_reference(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header"]):
+        tag.decompose()
+    text = soup.get_text(separator=" ")
+    return " ".join(text.split())
+
+
+def scrape_text_reference(content) -> str:
+    soup = BeautifulSoup(content, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def synthetic_pages(n: int = 40, articles: int = 120) -> List[str]:
+    df = pd.read_csv(DATA_PATH)
+    snippets = [str(s) for s in df["eligibility_snippet"].dropna().tolist()]
+    pages = []
+    for i in range(n):
+        body = "\n".join(
+            f"<div class='artikel'><h4>Artikel {a + 1}. Bepaling</h4>\n  <p>{html_lib.escape(snippets[(i * articles + a) % len(snippets)])}</p></div>"
+            for a in range(articles)
+        )
+        pages.append(
+            "<html><head><title>Regeling</title><script>var tracking = {};</script><style>p{}</style></head>"
+            "<body><header><a href='/'>Lokale regelgeving</a></header><nav><ul><li>Zoeken</li><li>Help</li></ul></nav>"
+            f"<div id='broodtekst'><h1>Regeling {i}</h1>{body}</div>"
+            "<footer>Overheid.nl | Privacy</footer></body></html>"
+        )
+    return pages
+
+
+def _time(fn: Callable[[str], str], pages: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in pages:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(pages: List[str], repeat: int):
+    mb = sum(len(p.encode("utf-8")) for p in pages) / 1e6
+    cases = {
+        "clean_html": (
+            clean_html_reference,
+            lambda h: extract_text(h, target_body=False),
+            lambda h: extract_text(h),
+        ),
+        "scrape_text": (
+            scrape_text_reference,
+            lambda h: extract_text(h, lines=True, target_body=False),
+            None,
+        ),
+    }
+    report = {"pages": len(pages), "mb": round(mb, 2)}
+    for name, (ref, fast, fast_body) in cases.items():
+        t_ref = _time(ref, pages, repeat)
+        t_fast = _time(fast, pages, repeat)
+        ref_out = [ref(p) for p in pages]
+        fast_out = [fast(p) for p in pages]
+        entry = {
+            "reference_mb_s": round(mb / t_ref, 2),
+            "fast_mb_s": round(mb / t_fast, 2),
+            "speedup": round(t_ref / t_fast, 1),
+            "exact_match": sum(a == b for a, b in zip(ref_out, fast_out)) / len(pages),
+            "word_match": sum(a.split() == b.split() for a, b in zip(ref_out, fast_out)) / len(pages),
+        }
+        if fast_body is not None:
+            t_body = _time(fast_body, pages, repeat)
+            body_out = [fast_body(p) for p in pages]
+            entry["fast_body_mb_s"] = round(mb / t_body, 2)
+            entry["body_chars_vs_full"] = round(sum(map(len, body_out)) / max(1, sum(map(len, ref_out))), 3)
+        report[name] = entry
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=Path, default=RECORDED_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = sorted(args.pages.glob("*.html")) if args.pages.exists() else []
+    pages = [f.read_text(encoding="utf-8", errors="ignore") for f in files] or synthetic_pages()
+    print(json.dumps(run(pages, args.repeat), indent=2))
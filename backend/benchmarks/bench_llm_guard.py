@@ -0,0 +1,123 @@
+"""
+llm_guard.py under a burst, against benchmarks/fake_llm_server.py.
+
+Phase "burst": --callers concurrent chat_text calls with distinct prompts (no cache, no
+coalescing) on a slow provider, each under a --deadline-s request deadline. Reports how
+many were answered, refused by admission (queue full) or by the deadline, and latency
+of answered vs refused calls; refusals should be fast.
+Phase "outage": the provider fails every request; the breaker should trip after a few
+calls and later calls fail immediately instead of each waiting for the provider.
+
+Run from backend/:
+    python -m benchmarks.bench_llm_guard [--callers 64] [--latency-ms 500] [--concurrency 8] [--queue 16]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_llm_server import serve
+
+PORT = 8767
+
+
+def _pct(xs: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(xs, q)), 1) if xs else None
+
+
+def run_phase(llm, guard, n: int, deadline_s: float) -> Dict[str, Any]:
+    outcomes: List[tuple] = []
+    lock = threading.Lock()
+    start = threading.Barrier(n)
+
+    def one(i: int):
+        start.wait()
+        t0 = time.perf_counter()
+        try:
+            with guard.deadline(deadline_s):
+                llm.chat_text([{"role": "user", "content": f"burst question {i} {time.time()}"}], cache=False)
+            kind = "ok"
+        except guard.ProviderUnavailable as e:
+            kind = "refused:" + str(e).split(" (")[0]
+        with lock:
+            outcomes.append((kind, (time.perf_counter() - t0) * 1000))
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(n)]
+    before = dict(guard.STATS)
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    ok = [ms for k, ms in outcomes if k == "ok"]
+    refused = [ms for k, ms in outcomes if k != "ok"]
+    kinds: Dict[str, int] = {}
+    for k, _ in outcomes:
+        kinds[k] = kinds.get(k, 0) + 1
+    return {
+        "calls": n,
+        "wall_s": round(wall, 2),
+        "outcomes": kinds,
+        "answered_p50_ms": _pct(ok, 50),
+        "answered_p95_ms": _pct(ok, 95),
+        "refused_p50_ms": _pct(refused, 50),
+        "refused_max_ms": round(max(refused), 1) if refused else None,
+        "guard": {k: guard.STATS[k] - before.get(k, 0) for k in guard.STATS},
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--deadline-s", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    # Read by the modules at import time
+    os.environ.update({
+        "GREENPT_BASE_URL": f"http://127.0.0.1:{PORT}/v1/",
+        "GREENPT_API_KEY": os.getenv("GREENPT_API_KEY", "bench"),
+        "LLM_MAX_CONCURRENCY": str(args.concurrency),
+        "LLM_MAX_QUEUE": str(args.queue),
+        "LLM_CACHE": "0",
+        "SINGLE_FLIGHT": "0",
+    })
+    from app.services import llm, llm_guard
+
+    report = {}
+    server = serve(PORT, latency_ms=args.latency_ms)
+    try:
+        report["burst"] = run_phase(llm, llm_guard, args.callers, args.deadline_s)
+        report["burst"]["provider_max_in_flight"] = server.stats["max_in_flight"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    llm_guard.reset()
+    server = serve(PORT, latency_ms=args.latency_ms, fail_rate=1.0)
+    try:
+        # Sequential callers: the breaker needs a few failures before it opens
+        outage = [run_phase(llm, llm_guard, 1, args.deadline_s) for _ in range(10)]
+        report["outage"] = {
+            "per_call_ms": [o["answered_p50_ms"] or o["refused_p50_ms"] for o in outage],
+            "provider_requests": server.stats["requests"],
+            "breaker": llm_guard.status(),
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
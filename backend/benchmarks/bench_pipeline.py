@@ -0,0 +1,302 @@
+"""
+Benchmark suite for the chat pipeline, with a JSON baseline and regression check.
+
+Conversations: chatbot_step through full intakes (age, municipality, children, income)
+and follow-up questions, against benchmarks/fake_llm_server.py (deterministic answers,
+--llm-latency-ms per call). Municipalities are drawn from the catalog with a fixed seed.
+Reported per turn kind: intake, results (ranking + explanation), followup.
+
+Micro-benchmarks:
+  prefilter_exact / prefilter_fuzzy   subsidy_ranker.prefilter_candidates
+  filter_by_municipality
+  candidates_for_llm                  on a 60-candidate prefilter result
+  rag_search                          rag_queries.json, with municipality filter
+  chunk_text                          rag_data pages (catalog snippets without them)
+
+Every benchmark records calls/s, p50/p95/p99 ms and peak Python memory (tracemalloc, in a
+separate untimed pass so tracing does not skew the timings). Micro-benchmarks keep the
+best of three passes; conversations start after one untimed warm-up conversation. Benchmarks whose inputs are
+missing (no RAG index) are reported as skipped.
+
+    python -m benchmarks.bench_pipeline --save                 # write the baseline
+    python -m benchmarks.bench_pipeline                        # compare with it
+
+A benchmark regresses when p50 or p95 grows, or calls/s drops, by more than --tolerance
+(default 25%) against the baseline; the run then exits with status 1. Baselines are
+machine specific: record one per machine / CI runner. Run from backend/.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_llm_server import serve
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "pipeline_baseline.json"
+QUERIES_PATH = BENCH_DIR / "rag_queries.json"
+PORT = 8769
+SEED = 1234
+
+
+# -------------------------
+# Measurement
+# -------------------------
+
+def summarize(latencies_s: List[float], wall_s: float, peak_kb: Optional[float]) -> Dict[str, Any]:
+    ms = np.asarray(latencies_s) * 1000
+    return {
+        "n": len(latencies_s),
+        "calls_per_s": round(len(latencies_s) / wall_s, 2) if wall_s else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "peak_kb": round(peak_kb, 1) if peak_kb is not None else None,
+    }
+
+
+def bench(fn: Callable[[Any], Any], inputs: List[Any], warmup: int = 3, repeat: int = 3) -> Dict[str, Any]:
+    for x in inputs[:warmup]:
+        fn(x)
+    # Best of `repeat` passes (by median), like timeit: the others measure machine noise
+    runs = []
+    for _ in range(repeat):
+        lat = []
+        t_start = time.perf_counter()
+        for x in inputs:
+            t0 = time.perf_counter()
+            fn(x)
+            lat.append(time.perf_counter() - t0)
+        runs.append((float(np.median(lat)), lat, time.perf_counter() - t_start))
+    _, lat, wall = min(runs, key=lambda r: r[0])
+
+    tracemalloc.start()
+    for x in inputs[: max(1, len(inputs) // 10)]:
+        fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(lat, wall, peak / 1024)
+
+
+# -------------------------
+# Inputs
+# -------------------------
+
+def municipalities(n: int) -> List[str]:
+    from app.services.subsidy_loader import get_subsidy_df
+
+    names = sorted({str(m) for m in get_subsidy_df()["municipality"].dropna().unique()})
+    return random.Random(SEED).sample(names, min(n, len(names)))
+
+
+def chunk_inputs(n: int) -> List[str]:
+    from app.services.rag_embedding import DATA_DIR
+    from app.services.subsidy_loader import DATA_PATH
+    import pandas as pd
+
+    texts = [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(DATA_DIR.glob("*.txt"))[:n]]
+    if texts:
+        return texts
+    df = pd.read_csv(DATA_PATH, usecols=["title", "eligibility_snippet", "application_snippet"]).fillna("")
+    return [
+        f"{r.title}\nArtikel 1 Doelgroep\n{r.eligibility_snippet}\nArtikel 2 Aanvraag\n{r.application_snippet}"
+        for r in df.head(n).itertuples()
+    ]
+
+
+# -------------------------
+# Suites
+# -------------------------
+
+def micro(args) -> Dict[str, Any]:
+    from app.services.subsidy_loader import get_subsidy_df
+    from app.services.subsidy_ranker import (
+        UserProfile, candidates_for_llm, filter_by_municipality, prefilter_candidates,
+    )
+    from app.services.rag_embedding import CHUNK_CHARS, CHUNK_OVERLAP, chunk_text
+
+    df = get_subsidy_df()
+    munis = municipalities(args.micro_n)
+    rng = random.Random(SEED)
+    profiles = [
+        UserProfile(True, rng.choice([0, 1, 3]), rng.choice([None, 1200, 2000]), municipality=m) for m in munis
+    ]
+    out: Dict[str, Any] = {}
+    out["prefilter_exact"] = bench(lambda p: prefilter_candidates(df, p), profiles)
+    # Misspelled / partial names take the scan path instead of the materialised view
+    fuzzy = [UserProfile(True, p.children_u18, p.net_income_monthly_eur, municipality=p.municipality[:-1]) for p in profiles]
+    out["prefilter_fuzzy"] = bench(lambda p: prefilter_candidates(df, p), fuzzy)
+    out["filter_by_municipality"] = bench(lambda m: filter_by_municipality(df, m), munis)
+
+    candidate_sets = [prefilter_candidates(df, p, max_candidates=60)[0] for p in profiles[:20]]
+    out["candidates_for_llm"] = bench(candidates_for_llm, candidate_sets)
+
+    texts = chunk_inputs(args.micro_n)
+    out["chunk_text"] = bench(lambda t: chunk_text(t, "bench", CHUNK_CHARS, CHUNK_OVERLAP), texts)
+
+    try:
+        from app.services.llm import get_rag
+
+        rag = get_rag()
+        queries = json.loads(QUERIES_PATH.read_text(encoding="utf-8"))
+        reqs = [{"query": q["query"], "top_k": 5, "filters": {"municipality": q["municipality"]}} for q in queries]
+        out["rag_search"] = bench(rag.rag_search, reqs * max(1, args.micro_n // len(reqs)))
+    except Exception as e:  # no index built / no embedding model
+        out["rag_search"] = {"skipped": f"{type(e).__name__}: {e}"}
+    return out
+
+
+def conversations(args) -> Dict[str, Any]:
+    from app.services.chatbot import chatbot_step
+    from app.services.llm import get_rag
+    from app.services.session import SESSIONS_DIR
+
+    try:
+        get_rag()
+    except Exception as e:
+        return {"skipped": f"RAG retriever unavailable ({type(e).__name__}: {e})"}
+
+    rng = random.Random(SEED)
+    followups = [
+        "Hoe vraag ik dit aan?",
+        "Welke documenten heb ik nodig?",
+        "How much money is it?",
+        "Geldt dit ook als mijn kind 17 is?",
+    ]
+    turns: Dict[str, List[float]] = {"intake": [], "results": [], "followup": []}
+    session_ids = []
+
+    # One untimed conversation first: catalog, view, RAG model/index and client are loaded lazily
+    warm_sid = f"bench-{uuid.uuid4()}"
+    session_ids.append(warm_sid)
+    for message in ("30", municipalities(1)[0], "1", "1500", followups[0]):
+        chatbot_step(warm_sid, message)
+
+    t_start = time.perf_counter()
+    tracemalloc.start()
+    try:
+        for muni in municipalities(args.conversations):
+            sid = f"bench-{uuid.uuid4()}"
+            session_ids.append(sid)
+            script = [
+                ("intake", str(rng.randint(19, 55))),
+                ("intake", muni),
+                ("intake", str(rng.randint(1, 4))),
+                ("results", str(rng.choice([900, 1300, 1800, 2600]))),
+            ] + [("followup", q) for q in rng.sample(followups, args.followups)]
+            for kind, message in script:
+                t0 = time.perf_counter()
+                chatbot_step(sid, message)
+                turns[kind].append(time.perf_counter() - t0)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        for sid in session_ids:
+            (SESSIONS_DIR / f"{sid}.json").unlink(missing_ok=True)
+    wall = time.perf_counter() - t_start
+
+    # Timings here include tracemalloc overhead on both sides of a comparison; the LLM
+    # latency of the stub dominates anyway
+    out = {kind: summarize(lat, sum(lat), None) for kind, lat in turns.items() if lat}
+    out["conversation"] = {
+        "n": args.conversations,
+        "conversations_per_s": round(args.conversations / wall, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+    return out
+
+
+# -------------------------
+# Baseline comparison
+# -------------------------
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for suite, rows in report.items():
+        if not isinstance(rows, dict):
+            continue
+        for name, cur in rows.items():
+            old = (baseline.get(suite) or {}).get(name)
+            if not isinstance(cur, dict) or not isinstance(old, dict) or "skipped" in cur or "skipped" in old:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                if cur.get(key) and old.get(key) and cur[key] > old[key] * (1 + tolerance):
+                    regressions.append(f"{suite}.{name}.{key}: {old[key]} -> {cur[key]}")
+            for key in ("calls_per_s", "conversations_per_s"):
+                if cur.get(key) and old.get(key) and cur[key] < old[key] / (1 + tolerance):
+                    regressions.append(f"{suite}.{name}.{key}: {old[key]} -> {cur[key]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--suites", default="micro,conversations")
+    parser.add_argument("--micro-n", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--followups", type=int, default=2)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    # Every run starts from the same state: stub LLM, empty response cache, no warm-up
+    cache_dir = tempfile.mkdtemp(prefix="bench-llm-cache-")
+    os.environ.update({
+        "GREENPT_BASE_URL": f"http://127.0.0.1:{PORT}/v1/",
+        "GREENPT_API_KEY": os.getenv("GREENPT_API_KEY", "bench"),
+        "LLM_CACHE_PATH": str(Path(cache_dir) / "llm_cache.sqlite3"),
+    })
+    server = serve(PORT, latency_ms=args.llm_latency_ms)
+
+    report: Dict[str, Any] = {}
+    try:
+        suites = args.suites.split(",")
+        if "micro" in suites:
+            report["micro"] = micro(args)
+        if "conversations" in suites:
+            report["conversations"] = conversations(args)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    report["meta"] = {
+        "python": sys.version.split()[0],
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stub_llm_requests": server.stats["requests"],
+        "llm_latency_ms": args.llm_latency_ms,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save first")
+        return 0
+    regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print(f"REGRESSIONS (> {args.tolerance:.0%} vs {args.baseline.name}):")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+    print(f"No regressions vs {args.baseline.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
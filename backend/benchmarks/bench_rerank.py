@@ -0,0 +1,70 @@
+"""
+Compares plain top-k retrieval with over-fetch + rerank + token budget.
+
+For each query in rag_queries.json it reports the context size that would go into the
+prompt (estimated tokens) and the hit rate: share of queries where at least one kept
+snippet contains one of the expected phrases.
+
+Needs a built index (python -m app.services.rag_embedding). Run from backend/:
+    python -m benchmarks.bench_rerank [--backend cross|overlap] [--top-k 5]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.rag_retrival import RAGRetriever, INDEX_DIR, EMBED_MODEL_NAME
+from app.services.rag_rerank import Reranker, RERANK_FETCH_K, CONTEXT_TOKEN_BUDGET, estimate_tokens
+
+QUERIES_PATH = Path(__file__).resolve().parent / "rag_queries.json"
+
+
+def _is_hit(hits: List[Dict[str, Any]], expect: List[str]) -> bool:
+    return any(e.lower() in (h.get("text", "") or "").lower() for h in hits for e in expect)
+
+
+def _context_tokens(hits: List[Dict[str, Any]]) -> int:
+    return sum(estimate_tokens(h.get("text", "") or "") for h in hits)
+
+
+def run(backend: str, top_k: int, use_filters: bool) -> Dict[str, Any]:
+    queries = json.loads(QUERIES_PATH.read_text(encoding="utf-8"))
+    rag = RAGRetriever(INDEX_DIR, EMBED_MODEL_NAME)
+    reranker = Reranker(backend)
+
+    rows = {"baseline": [], "rerank": []}
+    for q in queries:
+        filters = {"municipality": q["municipality"]} if use_filters else None
+
+        t0 = time.perf_counter()
+        base = rag.rag_search({"query": q["query"], "top_k": top_k, "filters": filters})
+        t1 = time.perf_counter()
+        pool = rag.rag_search({"query": q["query"], "top_k": max(top_k, RERANK_FETCH_K), "filters": filters})
+        kept = reranker.rerank(q["query"], pool, top_n=top_k, token_budget=CONTEXT_TOKEN_BUDGET)
+        t2 = time.perf_counter()
+
+        rows["baseline"].append((_is_hit(base, q["expect"]), _context_tokens(base), (t1 - t0) * 1000, len(base)))
+        rows["rerank"].append((_is_hit(kept, q["expect"]), _context_tokens(kept), (t2 - t1) * 1000, len(kept)))
+
+    report: Dict[str, Any] = {"backend": reranker.backend, "top_k": top_k, "queries": len(queries)}
+    for name, r in rows.items():
+        report[name] = {
+            "hit_rate": sum(x[0] for x in r) / len(r),
+            "mean_context_tokens": statistics.mean(x[1] for x in r),
+            "mean_snippets": statistics.mean(x[3] for x in r),
+            "mean_latency_ms": statistics.mean(x[2] for x in r),
+            "max_latency_ms": max(x[2] for x in r),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="cross", choices=["cross", "overlap"])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--no-filters", action="store_true", help="search the whole corpus")
+    args = parser.parse_args()
+    print(json.dumps(run(args.backend, args.top_k, not args.no_filters), indent=2))
@@ -0,0 +1,68 @@
+"""
+Cold-start budget for the API: time to `import app.main` in a fresh interpreter (what every
+uvicorn worker boot and test collection pays) and, separately, time until every registered
+resource is loaded (what the background warm-up hides behind /ready).
+
+Exits non-zero when the import exceeds the budget.
+Run from backend/:
+    python -m benchmarks.bench_startup [--budget-s 1.5] [--repeat 3] [--warm]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+t_import = time.perf_counter() - t0
+out = {"import_s": t_import, "heavy_modules": sorted(m for m in ("torch", "sentence_transformers") if m in sys.modules)}
+if WARM:
+    from app.services import resources
+    t0 = time.perf_counter()
+    resources.warm(background=False)
+    out["warm_s"] = time.perf_counter() - t0
+    out["resources"] = resources.status()
+print(json.dumps(out))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    env = {**os.environ, "GREENPT_API_KEY": os.environ.get("GREENPT_API_KEY", "bench")}
+    res = subprocess.run(
+        [sys.executable, "-c", f"WARM = {warm}\n" + IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-s", type=float, default=float(os.getenv("STARTUP_BUDGET_S", "1.5")))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="also time loading every resource")
+    args = parser.parse_args()
+
+    runs = [run_once(args.warm) for _ in range(args.repeat)]
+    import_s = statistics.median(r["import_s"] for r in runs)
+    print(f"import app.main: median {import_s:.3f}s over {len(runs)} runs (budget {args.budget_s:.1f}s)")
+    print(f"heavy modules imported: {runs[-1]['heavy_modules'] or 'none'}")
+    if args.warm:
+        print(f"warm-up: median {statistics.median(r['warm_s'] for r in runs):.3f}s")
+        for name, st in runs[-1]["resources"].items():
+            print(f"  {name:<16} {st['state']:<7} {st['load_s']}s {st['error'] or ''}")
+
+    if import_s > args.budget_s:
+        print("FAIL: import exceeds the cold-start budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Resident memory per web worker, with the RAG model + index loaded in every worker ("local")
+versus shared through the sidecar ("sidecar", see app/services/rag_sidecar.py).
+
+Each worker is simulated by a fresh interpreter that imports app.main, loads every resource
+and runs one RAG query, like a uvicorn worker after its first /chat. Linux only (/proc).
+Run from backend/ (needs the built rag_index):
+    python -m benchmarks.bench_worker_memory [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+WORKER_SNIPPET = """
+import json
+from app.services import resources
+import app.main
+from app.services.llm import get_rag
+resources.warm(background=False)
+get_rag().rag_search({"query": "bijzondere bijstand alleenstaande ouder", "top_k": 5})
+rss = [l for l in open("/proc/self/status") if l.startswith("VmRSS")][0].split()[1]
+print(json.dumps({"rss_mb": int(rss) / 1024, "resources": resources.status()}))
+"""
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_worker(env: dict) -> dict:
+    res = subprocess.run(
+        [sys.executable, "-c", WORKER_SNIPPET], cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if res.returncode != 0:
+        return {"error": res.stderr.strip().splitlines()[-1] if res.stderr.strip() else "failed"}
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    env = {**os.environ, "GREENPT_API_KEY": os.environ.get("GREENPT_API_KEY", "bench"), "WARMUP": "0"}
+    env.pop("RAG_SIDECAR_SOCKET", None)
+
+    local = run_worker(env)
+
+    sock = str(Path(tempfile.mkdtemp()) / "rag.sock")
+    sidecar = subprocess.Popen(
+        [sys.executable, "-m", "app.services.rag_sidecar", "--socket", sock],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(600):
+            if Path(sock).exists() or sidecar.poll() is not None:
+                break
+            time.sleep(0.1)
+        remote = run_worker({**env, "RAG_SIDECAR_SOCKET": sock})
+        sidecar_mb = rss_mb(sidecar.pid) if sidecar.poll() is None else None
+    finally:
+        sidecar.terminate()
+        sidecar.wait()
+
+    n = args.workers
+    print(f"{'mode':<10} {'per worker MB':>14} {'sidecar MB':>11} {f'total for {n} workers':>22}")
+    if "error" in local:
+        print(f"{'local':<10} failed: {local['error']}")
+    else:
+        print(f"{'local':<10} {local['rss_mb']:>14.0f} {'-':>11} {n * local['rss_mb']:>22.0f}")
+    if "error" in remote or sidecar_mb is None:
+        print(f"{'sidecar':<10} failed: {remote.get('error', 'sidecar exited')}")
+    else:
+        total = n * remote["rss_mb"] + sidecar_mb
+        print(f"{'sidecar':<10} {remote['rss_mb']:>14.0f} {sidecar_mb:>11.0f} {total:>22.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local OpenAI-compatible stand-in for the GreenPT endpoint, with injected latency and errors.
+
+    python -m benchmarks.fake_llm_server --port 8766 --latency-ms 800 --jitter-ms 200 --fail-rate 0.1
+    GREENPT_BASE_URL=http://127.0.0.1:8766/v1/ GREENPT_API_KEY=x uvicorn app.main:app
+
+Serves POST /v1/chat/completions with deterministic answers for the prompts the app sends:
+- ranking ("Here is the data:" + JSON payload): the candidates in the given order, as the
+  JSON list rank_with_llm expects
+- extraction ("strict data extraction tool"): all fields null
+- translation ("Translate the following text"): the text itself
+- anything else: a short fixed answer derived from the prompt hash
+
+--fail-rate answers that share of requests with 503. --slow-after N adds --latency-ms per
+request beyond N in flight, like a provider that queues under load.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+def _rank_answer(prompt: str) -> str:
+    payload = json.loads(prompt.split("Here is the data:", 1)[1])
+    top_k = int(payload.get("instructions", {}).get("max_results") or 10)
+    out: List[Dict[str, Any]] = []
+    for i, c in enumerate(payload.get("candidates", [])[:top_k], start=1):
+        out.append({
+            "rank": i,
+            "score": round(100.0 - i * 5, 1),
+            "title": c.get("title") or "",
+            "municipality": c.get("municipality") or "",
+            "category": c.get("category") or "",
+            "year": c.get("year"),
+            "url": c.get("url") or "",
+            "benefit_summary": ", ".join(c.get("benefit_signals") or []),
+            "eligibility_summary": "unknown",
+            "required_data_or_documents": c.get("application_data_signals") or [],
+            "why_relevant": "Stub ranking in catalog order.",
+            "confidence": "medium",
+            "cvdr_id": str(c["cvdr_id"]) if c.get("cvdr_id") is not None else None,
+            "doc_type": c.get("doc_type"),
+        })
+    return json.dumps(out, ensure_ascii=False)
+
+
+def answer(messages: List[Dict[str, str]]) -> str:
+    prompt = "\n".join(m.get("content") or "" for m in messages)
+    if "Here is the data:" in prompt:
+        return _rank_answer(prompt)
+    if "strict data extraction tool" in prompt:
+        return json.dumps({"age": None, "municipality": None, "monthly_income": None, "children": None})
+    if "Translate the following text" in prompt:
+        return prompt.split("TEXT:", 1)[-1].strip()
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    return f"Stub answer {digest}: check the listed schemes on your municipality's website."
+
+
+def make_handler(latency_ms: float, jitter_ms: float, fail_rate: float, slow_after: int):
+    stats = {"requests": 0, "failed": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with lock:
+                stats["requests"] += 1
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+                queued = max(0, stats["in_flight"] - slow_after) if slow_after else 0
+            try:
+                delay = latency_ms * (1 + queued) + random.uniform(-jitter_ms, jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000.0)
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                if fail_rate and random.random() < fail_rate:
+                    with lock:
+                        stats["failed"] += 1
+                    self._send(503, {"error": {"message": "overloaded", "type": "server_error"}})
+                    return
+                req = json.loads(body or b"{}")
+                content = answer(req.get("messages") or [])
+                prompt_tokens = sum(len((m.get("content") or "").split()) for m in req.get("messages") or [])
+                completion_tokens = len(content.split())
+                self._send(200, {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": req.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+            finally:
+                with lock:
+                    stats["in_flight"] -= 1
+
+        def _send(self, status, obj):
+            data = json.dumps(obj).encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler, stats
+
+
+def serve(
+    port: int = 8766, latency_ms: float = 0.0, jitter_ms: float = 0.0, fail_rate: float = 0.0, slow_after: int = 0
+) -> ThreadingHTTPServer:
+    """
+    Starts the server on a background thread and returns it (call .shutdown() to stop).
+    """
+    handler, stats = make_handler(latency_ms, jitter_ms, fail_rate, slow_after)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--slow-after", type=int, default=0)
+    args = parser.parse_args()
+    srv = serve(args.port, args.latency_ms, args.jitter_ms, args.fail_rate, args.slow_after)
+    print(f"Fake OpenAI-compatible LLM on http://127.0.0.1:{args.port}/v1/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,328 @@
+"""
+Open-loop load generator for /chat and /session/{id}, to size deployments.
+
+Synthesised conversations: a user profile (municipality sampled from the catalog CSV,
+age, children, income), a language (Dutch or English, --english share) and phrasing
+picked per answer (bare "1800", "ik verdien ongeveer 1800 per maand", "I'm 34"...).
+The client answers whatever the last reply asked for (missing_fields), like a person,
+then asks --followups follow-up questions. After each turn the frontend's session
+refresh (GET /session/{id}) happens with probability --session-poll.
+
+Open loop: conversations arrive as a Poisson process at the offered rate, whether or not
+earlier ones have finished, so a saturated server shows up as growing latency and errors
+instead of a quietly lower request rate. Think time between turns is exponential
+(--think-s mean).
+
+--rates runs one step per offered rate (conversations/s, --duration seconds each) and
+reports per step: completed requests/s, error share and p50/p95/p99 per request kind.
+Saturation throughput is the highest step whose /chat p95 stays under --slo-ms with
+under 1% errors.
+
+Against a running app:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rates 0.5,1,2,4
+Or let it start the app (uvicorn subprocess) on the stub LLM (benchmarks/fake_llm_server.py):
+    python -m benchmarks.load_test --spawn --workers 2 --llm-latency-ms 800 --rates 0.5,1,2,4,8
+The app needs its RAG index for results/follow-up turns. Run from backend/.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.services.intake_parser import clean_municipality
+from app.services.subsidy_loader import DATA_PATH
+from benchmarks.fake_llm_server import serve
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+ANSWERS = {
+    "nl": {
+        "age": ["{v}", "Ik ben {v}", "{v} jaar", "ik ben {v} jaar oud"],
+        "municipality": ["{v}", "Ik woon in {v}", "gemeente {v}", "in {v}"],
+        "children": ["{v}", "{v} kinderen", "ik heb {v} kinderen"],
+        "monthly_income": ["{v}", "ongeveer {v} per maand", "€{v} netto", "ik verdien {v} euro per maand"],
+    },
+    "en": {
+        "age": ["{v}", "I'm {v}", "{v} years old", "I am {v}"],
+        "municipality": ["{v}", "I live in {v}", "in {v}"],
+        "children": ["{v}", "{v} kids", "I have {v} children"],
+        "monthly_income": ["{v}", "about {v} a month", "€{v} net per month", "I earn {v} per month"],
+    },
+}
+NO_CHILDREN = {"nl": ["geen", "geen kinderen"], "en": ["none", "no kids"]}
+FOLLOWUPS = {
+    "nl": [
+        "Hoe vraag ik dit aan?",
+        "Welke documenten heb ik nodig?",
+        "Hoeveel krijg ik ongeveer?",
+        "Kan ik dit met terugwerkende kracht aanvragen?",
+        "Wat als mijn inkomen volgende maand verandert?",
+    ],
+    "en": [
+        "How do I apply for this?",
+        "Which documents do I need?",
+        "How much money would I get?",
+        "Can I apply retroactively?",
+        "What if my income changes next month?",
+    ],
+}
+MAX_TURNS = 12
+
+
+@dataclass
+class Script:
+    lang: str
+    profile: Dict[str, Any]
+    followups: List[str]
+
+
+def load_municipalities() -> List[str]:
+    df = pd.read_csv(DATA_PATH, usecols=["municipality"])
+    # Catalog values are scraped ("Aalsmeer tot vaststelling van de"); a user types the name
+    names = (clean_municipality(str(m).replace("Gemeente ", "")) for m in df["municipality"].dropna().unique())
+    return sorted({n for n in names if n})
+
+
+def make_script(rng: random.Random, municipalities: List[str], english: float, n_followups: int) -> Script:
+    lang = "en" if rng.random() < english else "nl"
+    profile = {
+        "age": rng.randint(19, 58),
+        "municipality": rng.choice(municipalities),
+        "children": rng.choice([0, 1, 1, 2, 2, 3, 4]),
+        "monthly_income": rng.choice([850, 1100, 1350, 1600, 1900, 2300, 2800]),
+    }
+    return Script(lang, profile, rng.sample(FOLLOWUPS[lang], min(n_followups, len(FOLLOWUPS[lang]))))
+
+
+def render_answer(rng: random.Random, script: Script, field_name: str) -> str:
+    value = script.profile[field_name]
+    if field_name == "children" and value == 0:
+        return rng.choice(NO_CHILDREN[script.lang])
+    return rng.choice(ANSWERS[script.lang][field_name]).format(v=value)
+
+
+# -------------------------
+# Driver
+# -------------------------
+
+@dataclass
+class Step:
+    rate: float
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: {
+        "intake": [], "results": [], "followup": [], "session": []
+    })
+    errors: Dict[str, int] = field(default_factory=dict)
+    requests: int = 0
+    conversations_started: int = 0
+    conversations_done: int = 0
+    stuck: int = 0
+
+    def record(self, kind: str, seconds: float, error: Optional[str]) -> None:
+        self.requests += 1
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.latencies[kind].append(seconds)
+
+
+async def _request(client: httpx.AsyncClient, step: Step, kind: str, method: str, url: str, **kw) -> Optional[dict]:
+    t0 = time.perf_counter()
+    try:
+        resp = await client.request(method, url, **kw)
+        error = None if resp.status_code == 200 else f"http_{resp.status_code}"
+        body = resp.json() if resp.status_code == 200 else None
+    except httpx.TimeoutException:
+        error, body = "timeout", None
+    except httpx.HTTPError as e:
+        error, body = type(e).__name__, None
+    step.record(kind, time.perf_counter() - t0, error)
+    return body
+
+
+async def conversation(client: httpx.AsyncClient, step: Step, script: Script, rng: random.Random, args) -> None:
+    sid = f"load-{rng.getrandbits(64):016x}"
+    step.conversations_started += 1
+    reply: Optional[dict] = None
+    asked = "age"  # the frontend greets with the first intake question
+    followups = list(script.followups)
+    mode = "intake"
+    for _ in range(MAX_TURNS):
+        if mode == "intake":
+            message = render_answer(rng, script, asked)
+            kind = "results" if reply is not None and reply.get("missing_fields") == [asked] else "intake"
+        elif followups:
+            message, kind = followups.pop(0), "followup"
+        else:
+            step.conversations_done += 1
+            return
+        reply = await _request(client, step, kind, "POST", "/chat", json={"session_id": sid, "message": message})
+        if reply is None:
+            return  # error: the user gives up
+        mode = reply.get("mode", "intake")
+        missing = reply.get("missing_fields") or []
+        if mode == "intake":
+            asked = missing[0] if missing else asked
+        if rng.random() < args.session_poll:
+            await _request(client, step, "session", "GET", f"/session/{sid}")
+        await asyncio.sleep(rng.expovariate(1.0 / args.think_s) if args.think_s > 0 else 0)
+    step.stuck += 1  # e.g. an answer the app never understood
+
+
+async def run_step(rate: float, args, municipalities: List[str], rng: random.Random) -> Step:
+    step = Step(rate)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout_s, limits=limits) as client:
+        tasks = []
+        t_end = time.monotonic() + args.duration
+        while time.monotonic() < t_end:
+            script = make_script(rng, municipalities, args.english, args.followups)
+            tasks.append(asyncio.create_task(conversation(client, step, script, random.Random(rng.random()), args)))
+            await asyncio.sleep(rng.expovariate(rate))
+        # Let started conversations finish (bounded), so the step's tail is measured too
+        if tasks:
+            await asyncio.wait(tasks, timeout=args.drain_s)
+        for t in tasks:
+            t.cancel()
+    return step
+
+
+def summarize(step: Step, wall_s: float) -> Dict[str, Any]:
+    def pct(xs: List[float]) -> Dict[str, Optional[float]]:
+        if not xs:
+            return {"n": 0}
+        ms = np.asarray(xs) * 1000
+        return {
+            "n": len(xs),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        }
+
+    chat = step.latencies["intake"] + step.latencies["results"] + step.latencies["followup"]
+    errors = sum(step.errors.values())
+    return {
+        "offered_conversations_per_s": step.rate,
+        "conversations_started": step.conversations_started,
+        "conversations_completed": step.conversations_done,
+        "conversations_stuck": step.stuck,
+        "completed_requests_per_s": round((step.requests - errors) / wall_s, 2),
+        "error_share": round(errors / step.requests, 4) if step.requests else 0.0,
+        "errors": step.errors,
+        "chat": pct(chat),
+        **{kind: pct(lat) for kind, lat in step.latencies.items()},
+    }
+
+
+# -------------------------
+# Spawned app on the stub LLM
+# -------------------------
+
+def spawn_app(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "GREENPT_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1/",
+        "GREENPT_API_KEY": env.get("GREENPT_API_KEY", "load-test"),
+        # Identical synthetic prompts would otherwise be answered from the cache
+        "LLM_CACHE": "0",
+    })
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", port, "--workers", str(args.workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=str(BACKEND_DIR), env=env)
+    deadline = time.monotonic() + args.ready_timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{args.url}/ready", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            raise SystemExit(f"app exited with {proc.returncode}")
+        time.sleep(0.5)
+    print(f"app not ready after {args.ready_timeout_s}s (see /ready); testing anyway")
+    return proc
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rates", default="0.5,1,2,4", help="offered conversations per second, one step each")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals per step")
+    parser.add_argument("--drain-s", type=float, default=60.0, help="max wait for a step's conversations to finish")
+    parser.add_argument("--english", type=float, default=0.3, help="share of English conversations")
+    parser.add_argument("--followups", type=int, default=2)
+    parser.add_argument("--think-s", type=float, default=2.0, help="mean think time between turns")
+    parser.add_argument("--session-poll", type=float, default=0.5, help="chance of GET /session after a turn")
+    parser.add_argument("--timeout-s", type=float, default=120.0)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="/chat p95 that still counts as healthy")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", type=Path, default=None, help="write the JSON report here")
+    parser.add_argument("--spawn", action="store_true", help="start the app + stub LLM")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--llm-port", type=int, default=8766)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--ready-timeout-s", type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    municipalities = load_municipalities()
+    llm_server = app_proc = None
+    if args.spawn:
+        llm_server = serve(args.llm_port, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+        app_proc = spawn_app(args)
+
+    steps = []
+    try:
+        for rate in (float(r) for r in args.rates.split(",")):
+            t0 = time.perf_counter()
+            step = asyncio.run(run_step(rate, args, municipalities, rng))
+            row = summarize(step, args.duration)
+            row["step_wall_s"] = round(time.perf_counter() - t0, 1)
+            steps.append(row)
+            print(json.dumps({k: row[k] for k in ("offered_conversations_per_s", "completed_requests_per_s", "error_share")}
+                             | {"chat_p95_ms": row["chat"].get("p95_ms")}))
+    finally:
+        if app_proc is not None:
+            app_proc.terminate()
+            app_proc.wait(timeout=30)
+            # Sessions of the synthetic conversations
+            from app.services.session import SESSIONS_DIR
+
+            for p in SESSIONS_DIR.glob("load-*.json"):
+                p.unlink(missing_ok=True)
+        if llm_server is not None:
+            llm_server.shutdown()
+
+    healthy = [s for s in steps if s["error_share"] < 0.01 and (s["chat"].get("p95_ms") or 0) < args.slo_ms]
+    report = {
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "steps": steps,
+        "saturation": {
+            "max_healthy_conversations_per_s": max((s["offered_conversations_per_s"] for s in healthy), default=None),
+            "max_healthy_requests_per_s": max((s["completed_requests_per_s"] for s in healthy), default=None),
+            "slo": f"/chat p95 < {args.slo_ms:.0f} ms, errors < 1%",
+        },
+    }
+    if llm_server is not None:
+        report["stub_llm"] = dict(llm_server.stats)
+    print(json.dumps(report["saturation"], indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
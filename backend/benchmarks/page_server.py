@@ -0,0 +1,101 @@
+"""
+Local stand-in for lokaleregelgeving.overheid.nl that replays recorded pages.
+
+Record once with the real site:
+    python -m app.data.fetch_sources --record benchmarks/recorded_pages
+Then crawl against the replay (no network, reproducible timing):
+    python -m benchmarks.page_server benchmarks/recorded_pages --port 8765 --latency-ms 80 --fail-rate 0.05
+    python -m app.data.fetch_sources --base-url http://127.0.0.1:8765
+
+Unknown paths get a small synthetic regulation page, so a sources.txt can be crawled
+without recordings. --fail-rate answers that share of requests with 503 + Retry-After.
+Every page carries an ETag and If-None-Match is answered with 304, like the real site.
+"""
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote
+
+SYNTHETIC_PAGE = """<html><head><title>{path}</title><script>var x = 1;</script></head>
+<body><header>Lokale regelgeving</header><nav>menu</nav>
+<div id="broodtekst"><h1>Regeling {path}</h1>
+<p>Artikel 1. Begrippen In deze regeling wordt verstaan onder alleenstaande ouder: ...</p>
+<p>Artikel 2. Hoogte De toeslag bedraagt per jaar &euro; 631,- voor een alleenstaande ouder.</p>
+</div><footer>overheid.nl</footer></body></html>"""
+
+
+def make_handler(pages_dir: Path, latency_ms: float, fail_rate: float):
+    stats = {"requests": 0, "failed": 0, "not_modified": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if fail_rate and random.random() < fail_rate:
+                with lock:
+                    stats["failed"] += 1
+                self._send(503, b"busy", {"Retry-After": "0.1"})
+                return
+
+            path = pages_dir / (quote(self.path, safe="") + ".html")
+            if path.exists():
+                body = path.read_bytes()
+            else:
+                body = SYNTHETIC_PAGE.format(path=self.path).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                with lock:
+                    stats["not_modified"] += 1
+                self._send(304, b"", {"ETag": etag})
+                return
+            self._send(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+        def _send(self, status, body, headers):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler, stats
+
+
+def serve(pages_dir: Path, port: int = 8765, latency_ms: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Starts the server on a background thread and returns it (call .shutdown() to stop).
+    """
+    handler, stats = make_handler(pages_dir, latency_ms, fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages_dir", type=Path, nargs="?", default=Path(__file__).resolve().parent / "recorded_pages")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    srv = serve(args.pages_dir, args.port, args.latency_ms, args.fail_rate)
+    print(f"Replaying {args.pages_dir} on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
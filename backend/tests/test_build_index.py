@@ -0,0 +1,28 @@
+from app.services.build_index import KnowledgeIndex, build_index, index_stamp
+
+
+def _pages(d, texts):
+    d.mkdir(exist_ok=True)
+    for f in d.glob("*.txt"):
+        f.unlink()
+    for cvdr, text in texts.items():
+        (d / f"lokaleregelgeving.overheid.nl_CVDR{cvdr}_1.txt").write_text(text, encoding="utf-8")
+
+
+def test_rebuild_replaces_files_under_a_loaded_index(tmp_path):
+    pages, out = tmp_path / "pages", tmp_path / "index"
+    _pages(pages, {"1": "bijzondere bijstand", "2": "leerlingenvervoer school"})
+    build_index(pages, out, full=True)
+    old = KnowledgeIndex(out)
+    stamp = index_stamp(out)
+
+    _pages(pages, {"3": "kindpakket kinderen school", "4": "energietoeslag", "5": "witgoed"})
+    build_index(pages, out, full=True)
+    new = KnowledgeIndex(out)
+
+    # The loaded index keeps reading its own (replaced, still mapped) files
+    assert old.cvdr_ids_with_prefixes(["school"]) == {"2"}
+    assert new.cvdr_ids_with_prefixes(["school"]) == {"3"}
+    assert new.bm25.build_id != old.bm25.build_id
+    assert index_stamp(out) != stamp
+    assert not (out / "bm25.tmp").exists()
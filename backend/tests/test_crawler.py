@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.crawler import CrawlConfig, crawl
+from app.services.extract_eligibility import scrape_urls_from_file
+
+REQUESTS = []
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        status = 404 if self.path == "/gone" else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(f"<html><body>{self.path}</body></html>".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def parse(url, html):
+    return len(html)
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    REQUESTS.clear()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _crawl(urls, state_path):
+    config = CrawlConfig(per_host_interval_s=0.0, max_retries=0, parse_workers=1)
+    return crawl(urls, parse, state_path=state_path, config=config)
+
+
+def test_a_permanent_failure_does_not_freeze_later_refreshes(site, tmp_path):
+    urls = [f"{site}/a", f"{site}/b", f"{site}/gone"]
+    state = tmp_path / "state.json"
+    first = _crawl(urls, state)
+    assert (first.done, first.failed) == (2, 1)
+
+    # The run finished (with one failure): the next refresh fetches everything again
+    REQUESTS.clear()
+    second = _crawl(urls, state)
+    assert second.skipped == 0
+    assert sorted(REQUESTS) == ["/a", "/b", "/gone"]
+
+
+def test_an_interrupted_run_resumes(site, tmp_path):
+    state = tmp_path / "state.json"
+    done = {"status": "done", "attempts": 1, "error": None, "result": {"changed": True, "output": 1}}
+    failed = {"status": "failed", "attempts": 1, "error": "HTTP 404", "result": None}
+    state.write_text(json.dumps({
+        "run": {"id": "r1", "started": 0, "complete": False},
+        "jobs": {f"{site}/a": done, f"{site}/gone": failed},
+    }))
+    stats = _crawl([f"{site}/a", f"{site}/b", f"{site}/gone"], state)
+    # Done and finally failed URLs belong to the interrupted run; only /b was left
+    assert stats.skipped == 2
+    assert REQUESTS == ["/b"]
+    assert json.loads(state.read_text())["run"] == {"id": "r1", "started": 0, "complete": True}
+
+
+def test_scrape_urls_from_file_leaves_the_callers_config_alone(site, tmp_path):
+    urls = tmp_path / "urls.txt"
+    urls.write_text(f"{site}/a\n")
+    config = CrawlConfig(per_host_interval_s=5.0, max_retries=0, parse_workers=1)
+    scrape_urls_from_file(urls, tmp_path / "out.txt", delay=0, config=config)
+    assert config.per_host_interval_s == 5.0
+    assert "/a" in (tmp_path / "out.txt").read_text()
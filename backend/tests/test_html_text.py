@@ -0,0 +1,21 @@
+import pytest
+
+from app.services.html_text import extract_text
+
+PAGE = """<html><head><title>t</title><script>var x = 1;</script></head><body>
+<nav>Menu Zoeken</nav>
+<div id="content"><p>Kop</p>
+  <div class="regeling wetgeving"><h1>Artikel 1</h1><p>Bijzondere   bijstand voor ouders.</p></div>
+</div>
+<footer>Contact</footer></body></html>"""
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_both_parsers_keep_only_the_regulation_body(fast):
+    assert extract_text(PAGE, fast=fast) == "Artikel 1 Bijzondere bijstand voor ouders."
+
+
+def test_without_target_body_both_parsers_keep_the_whole_page():
+    fast = extract_text(PAGE, lines=True, target_body=False)
+    assert "Menu Zoeken" in fast and "Contact" in fast
+    assert extract_text(PAGE, lines=True, target_body=False, fast=False) == fast
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.intake_parser import MunicipalityIndex, display_name, is_ambiguous, parse_intake
+
+
+def test_child_age_is_not_the_children_count():
+    out = parse_intake("My son is 5", asked="children")
+    assert out["children"] is None
+
+
+def test_bare_answer_with_filler_uses_the_asked_field():
+    assert parse_intake("about 2100 a month", asked="monthly_income")["monthly_income"] == 2100
+    assert parse_intake("ongeveer 1800 netto per maand", asked="monthly_income")["monthly_income"] == 1800
+
+
+def test_all_fields_in_one_message():
+    out = parse_intake("Leiden, 2 kids, 34 years old, 1400 netto")
+    assert out == {"age": 34, "municipality": "Leiden", "children": 2, "monthly_income": 1400}
+    assert not is_ambiguous("Leiden, 2 kids, 34 years old, 1400 netto", out)
+
+
+def test_children_ages_are_not_the_parent_age():
+    out = parse_intake("2 kids aged 5 and 7, I'm 40")
+    assert out["children"] == 2
+    assert out["age"] == 40
+    assert parse_intake("kinderen van 15 en 17 jaar")["age"] is None
+
+
+def test_unexplained_number_is_ambiguous():
+    text = "Ik verdien 1800, mijn ex betaalt 300 alimentatie"
+    assert is_ambiguous(text, parse_intake(text, asked="monthly_income"))
+
+
+def test_municipality_capitalisation():
+    assert display_name("DEN HAAG") == "Den Haag"
+    assert display_name("krimpen aan den ijssel") == "Krimpen aan den IJssel"
+    assert display_name("'S-HERTOGENBOSCH") == "'s-Hertogenbosch"
+    assert display_name("Bergen op Zoom") == "Bergen op Zoom"
+
+    index = MunicipalityIndex(["DEN HAAG", "Leiden"])
+    assert index.find("I live in Den Haag") == "Den Haag"
+    assert parse_intake("I live in Den Haag")["municipality"] == "Den Haag"
+
+
+def test_municipality_index_skips_scraped_debris():
+    index = MunicipalityIndex(
+        ["Geen", "Artikel 6", "Alkmaar\nArtikel 9", "Alkmaar", "Coevorden2015", "Coevorden", "Midden",
+         "Midden-Groningen", "Midden-Groningen", "Zaanstad gelezen het voorstel", "Zaanstad", "Zeist"],
+        min_seen=2,
+    )
+    assert sorted(index.canonical) == sorted(
+        ["alkmaar", "midden-groningen", "zaanstad", "the hague", "'s-gravenhage", "s-gravenhage",
+         "den bosch", "s-hertogenbosch", "'s-hertogenbosch"]
+    )
+
+
+@pytest.mark.parametrize(
+    "text, asked",
+    [
+        ("Geen kinderen", "age"),
+        ("Ik ben 32. Geen kinderen.", None),
+        ("Geen idee", None),
+        ("Geen idee", "municipality"),
+        ("geen kinderen", None),
+        ("Artikel", "municipality"),
+        ("delft", "age"),
+    ],
+)
+def test_not_a_municipality(text, asked):
+    assert parse_intake(text, asked)["municipality"] is None
+
+
+def test_municipality_in_an_answer_to_another_question():
+    assert parse_intake("Delft", "age")["municipality"] == "Delft"
+    assert parse_intake("ik woon in delft, 2 kids", "age")["municipality"] == "Delft"
+    assert parse_intake("Ik woon in Reusel-De Mierden", "municipality")["municipality"] == "Reusel-De Mierden"
@@ -0,0 +1,21 @@
+from app.services.rag_lexical import BM25Index, build_bm25
+
+FILLER = " ".join(["bijstand"] * 200)
+
+
+def test_prefix_match_needs_the_minimum_term_frequency(tmp_path):
+    build_bm25(
+        [
+            f"De gezinsleden van belanghebbende. {FILLER}",
+            "Leerlingenvervoer: de school van het kind. Kinderen tot de schoolleeftijd.",
+            "Geen treffer.",
+        ],
+        tmp_path,
+    )
+    index = BM25Index(tmp_path)
+    prefixes = ("kind", "kinderen", "school", "gezins")
+    assert index.docs_matching_prefixes(prefixes).tolist() == [0, 1]
+    # "kinderen" matches both "kind" and "kinderen"; it counts once
+    assert index.docs_matching_prefixes(prefixes, min_tf=4).tolist() == [1]
+    assert index.docs_matching_prefixes(prefixes, min_tf=5).tolist() == []
+    assert index.docs_matching_prefixes(prefixes, min_tf=1, min_share=0.05).tolist() == [1]
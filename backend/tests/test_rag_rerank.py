@@ -0,0 +1,39 @@
+import threading
+import time
+
+from app.services import llm_guard, rag_rerank
+from app.services.rag_rerank import Reranker
+
+HITS = [{"id": 1, "text": "huurtoeslag"}, {"id": 2, "text": "bijzondere bijstand voor ouders"}]
+
+
+def test_overlap_rerank_moves_the_matching_chunk_up():
+    ranked = Reranker("overlap").rerank("bijzondere bijstand", HITS, top_n=2)
+    assert [h["id"] for h in ranked] == [2, 1]
+
+
+def test_a_spent_request_deadline_keeps_retrieval_order():
+    with llm_guard.deadline(0):
+        ranked = Reranker("overlap").rerank("bijzondere bijstand", HITS, top_n=2, budget_ms=1000)
+    assert ranked == HITS
+
+
+def test_concurrent_first_calls_load_one_reranker(monkeypatch):
+    built = []
+
+    class SlowReranker(Reranker):
+        def __init__(self, backend):
+            built.append(backend)
+            time.sleep(0.05)
+            super().__init__(backend)
+
+    monkeypatch.setattr(rag_rerank, "Reranker", SlowReranker)
+    monkeypatch.setattr(rag_rerank, "_reranker", None)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(rag_rerank.get_reranker("overlap"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert built == ["overlap"]
+    assert len({id(r) for r in got}) == 1
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from app.services import llm_guard, single_flight
+
+
+def _guarded(calls, latency_s):
+    def complete(timeout):
+        calls.append(timeout)
+        time.sleep(min(latency_s, timeout))
+        if latency_s > timeout:
+            raise TimeoutError("provider timeout")
+        return "answer"
+
+    return lambda: llm_guard.call("test-model", complete)
+
+
+def test_follower_retries_after_the_leader_runs_out_of_its_deadline():
+    calls = []
+    fn = _guarded(calls, latency_s=0.3)
+    results = {}
+
+    def leader():
+        with llm_guard.deadline(0.1):
+            try:
+                single_flight.do("test", "k1", fn)
+            except llm_guard.ProviderUnavailable as e:
+                results["leader"] = e
+
+    def follower():
+        time.sleep(0.03)
+        with llm_guard.deadline(5.0):
+            results["follower"] = single_flight.do("test", "k1", fn)
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=follower)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert isinstance(results["leader"], llm_guard.DeadlineExceeded)
+    assert results["follower"] == "answer"
+    assert len(calls) == 2
+    assert single_flight.STATS["test"]["retried"] == 1
+
+
+def test_provider_failure_is_shared_with_followers():
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise llm_guard.ProviderUnavailable("LLM call failed")
+
+    errors = []
+
+    def follower():
+        started.wait()
+        try:
+            single_flight.do("test-fail", "k2", lambda: pytest.fail("follower made its own call"))
+        except llm_guard.ProviderUnavailable as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    with pytest.raises(llm_guard.ProviderUnavailable):
+        single_flight.do("test-fail", "k2", failing)
+    t.join()
+    assert len(errors) == 1
+    assert single_flight.STATS["test-fail"] == {"leaders": 1, "followers": 1, "retried": 0}
@@ -0,0 +1,65 @@
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from app.services import speculative
+from app.services.subsidy_ranker import UserProfile
+
+CANDIDATES = pd.DataFrame({"cvdr_id": [101.0, 102.0, 103.0], "title": ["a", "b", "c"]})
+PROFILE = UserProfile(is_single_parent=True, children_u18=2, net_income_monthly_eur=1400, municipality="Delft")
+
+
+def _ranked(ids, income):
+    return {
+        "ranked": [{"rank": i, "cvdr_id": str(c), "income": income} for i, c in enumerate(ids, start=1)],
+        "degraded": False,
+        "candidates_used": len(ids),
+        "candidate_ids": ["101", "102", "103"],
+    }
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    monkeypatch.setattr(speculative, "get_subsidy_df", lambda: CANDIDATES)
+    monkeypatch.setattr(speculative, "prefilter_candidates", lambda df, profile, **kw: (CANDIDATES, []))
+
+
+def _speculate(session_id):
+    speculative.start(session_id, PROFILE, lambda p: _ranked([103, 101, 102], p.net_income_monthly_eur))
+    speculative._jobs[session_id].future.result()
+
+
+def test_final_turn_reranks_the_speculative_top_with_income():
+    _speculate("s1")
+    sent = []
+
+    def rerank(df, profile):
+        sent.append((df["cvdr_id"].tolist(), profile.net_income_monthly_eur))
+        return _ranked([101, 103, 102], profile.net_income_monthly_eur)
+
+    result = speculative.finish("s1", PROFILE, lambda p: pytest.fail("full rank"), max_candidates=60, rerank=rerank)
+    # The speculative order, with the income the speculative run did not have
+    assert sent == [([103.0, 101.0, 102.0], 1400)]
+    assert [r["cvdr_id"] for r in result["ranked"]] == ["101", "103", "102"]
+    assert all(r["income"] == 1400 for r in result["ranked"])
+
+
+def test_unavailable_provider_keeps_the_speculative_order():
+    _speculate("s2")
+    result = speculative.finish(
+        "s2", PROFILE, lambda p: pytest.fail("full rank"), max_candidates=60,
+        rerank=lambda df, p: {**_ranked([101], 1400), "degraded": True},
+    )
+    assert [r["cvdr_id"] for r in result["ranked"]] == ["103", "101", "102"]
+
+
+def test_no_income_reuses_without_rerank():
+    profile = replace(PROFILE, net_income_monthly_eur=None)
+    speculative.start("s3", profile, lambda p: _ranked([102, 101], None))
+    speculative._jobs["s3"].future.result()
+    result = speculative.finish(
+        "s3", profile, lambda p: pytest.fail("full rank"), max_candidates=60,
+        rerank=lambda df, p: pytest.fail("rerank"),
+    )
+    assert [r["cvdr_id"] for r in result["ranked"]] == ["102", "101"]
@@ -0,0 +1,27 @@
+from app.services.structured_eligibility import extract_fields
+
+
+def test_applicant_age_limits():
+    f = extract_fields("De aanvrager is 21 jaar of ouder. U bent jonger dan 65 jaar.")
+    assert f["min_age"] == 21
+    assert f["max_age"] == 65
+    assert f["child_max_age"] is None
+
+    f = extract_fields("Op aanvraag kan aan de belanghebbende van 18 jaar of ouder bijstand worden verleend.")
+    assert f["min_age"] == 18
+
+
+def test_child_age_ranges_are_not_applicant_limits():
+    f = extract_fields(
+        "Een bijdrage voor kinderen in de leeftijd van 4 tot 18 jaar. Jongeren van 18 tot 21 jaar "
+        "kunnen een vergoeding krijgen voor schoolkosten."
+    )
+    assert f["min_age"] is None
+    assert f["max_age"] is None
+    assert f["child_max_age"] == 21
+
+
+def test_child_phrase_after_applicant_belongs_to_the_child():
+    f = extract_fields("De aanvrager heeft kinderen jonger dan 18 jaar.")
+    assert f["max_age"] is None
+    assert f["child_max_age"] == 18